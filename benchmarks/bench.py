@@ -0,0 +1,310 @@
+"""This file contain the performance benchmarks of the octbrowser
+
+All benchmarks run offline, against synthetic pages served by the ``octbrowser.testserver.LocalServer``. Results are written as
+JSON, so the results of two commits can be compared::
+
+    python benchmarks/bench.py run --output before.json
+    python benchmarks/bench.py run --output after.json
+    python benchmarks/bench.py compare before.json after.json --threshold 0.1
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from timeit import default_timer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from octbrowser import __version__  # noqa
+from octbrowser.browser import Browser  # noqa
+from octbrowser.history.cached import CachedHistory  # noqa
+from octbrowser.testserver import LocalServer, make_page  # noqa
+
+#: sizes of the synthetic pages used by the parsing benchmarks
+PAGE_SIZES = (('10k', 10 * 1024), ('100k', 100 * 1024), ('1m', 1024 * 1024), ('10m', 10 * 1024 * 1024))
+
+
+def fake_response(content, url='http://127.0.0.1/page.html'):
+    """Build a response without network, for the parsing benchmarks
+
+    :param content: the body of the response
+    :type content: bytes
+    :param url: the url of the response
+    :type url: str
+    :return: the response
+    :rtype: requests.Response
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = content
+    response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    return response
+
+
+class Benchmarks(object):
+
+    """The benchmarks of the browser hot paths
+
+    Each ``bench_*`` method returns a callable running one operation, the setup is not measured
+
+    :param url: the url of the benchmark server
+    :type url: str
+    :param pages: the synthetic pages, by name
+    :type pages: dict
+    :param tmpdir: a temporary directory for downloaded resources
+    :type tmpdir: str
+    """
+
+    def __init__(self, url, pages, tmpdir):
+        self.url = url
+        self.pages = pages
+        self.tmpdir = tmpdir
+
+    def _browser(self, **kwargs):
+        kwargs.setdefault('history', None)
+        kwargs.setdefault('keep_alive', True)
+        return Browser(base_url=self.url, **kwargs)
+
+    def _opened(self, **kwargs):
+        browser = self._browser(**kwargs)
+        browser.open_url(self.url + '/page/index.html')
+        return browser
+
+    def bench_open_url(self):
+        browser = self._browser()
+        return lambda: browser.open_url(self.url + '/page/index.html')
+
+    def bench_open_url_no_keep_alive(self):
+        browser = self._browser(keep_alive=False)
+        return lambda: browser.open_url(self.url + '/page/index.html')
+
+    def _process_response(self, name):
+        browser = self._browser()
+        content = self.pages[name]
+        return lambda: browser._process_response(fake_response(content))
+
+    def bench_get_form(self):
+        browser = self._opened()
+        return lambda: browser.get_form('#login')
+
+    def bench_submit_form(self):
+        browser = self._opened()
+
+        def run():
+            browser.get_form('#login')
+            browser.form_data['password'] = 'secret'
+            browser.submit_form()
+        return run
+
+    def bench_follow_link(self):
+        browser = self._opened()
+        return lambda: browser.follow_link('#next')
+
+    def bench_follow_link_url_regex(self):
+        browser = self._opened()
+        return lambda: browser.follow_link('a.item', url_regex=r'.*\.php')
+
+    def bench_get_html_elements(self):
+        browser = self._opened()
+        return lambda: browser.get_html_elements('a.item')
+
+    def bench_extract(self):
+        browser = self._opened()
+        fields = {'title': ('title', 'text', True), 'next': ('#next', '@href', True), 'links': ('a.item', '@href'),
+                  'images': ('img.resource', '@src'), 'inputs': ('form#login input', '@name')}
+        return lambda: browser.extract(fields)
+
+    def bench_get_resource(self):
+        browser = self._opened()
+        return lambda: browser.get_resource('img.resource', self.tmpdir)
+
+    def bench_history_back_forward(self):
+        browser = self._browser(history=CachedHistory())
+        for i in range(10):
+            browser.open_url(self.url + '/page/{0}.html'.format(i))
+
+        def run():
+            for i in range(5):
+                browser.back()
+            for i in range(5):
+                browser.forward()
+        return run
+
+    def all(self):
+        """Return all the benchmarks, by name
+
+        :return: a list of (name, factory) tuples
+        :rtype: list
+        """
+        benchmarks = []
+        for name in sorted(dir(self)):
+            if name.startswith('bench_'):
+                benchmarks.append((name[len('bench_'):], getattr(self, name)))
+        for name, size in PAGE_SIZES:
+            benchmarks.append(('process_response_' + name, lambda name=name: self._process_response(name)))
+        return benchmarks
+
+
+def measure(run, min_time=1.0, min_runs=5, max_runs=1000):
+    """Run an operation until min_time is elapsed and return its statistics
+
+    :param run: the operation
+    :type run: callable
+    :param min_time: the minimum measure time, in seconds
+    :type min_time: float
+    :param min_runs: the minimum number of runs
+    :type min_runs: int
+    :param max_runs: the maximum number of runs
+    :type max_runs: int
+    :return: a dict with ``runs``, ``ops_per_sec``, ``mean``, ``median``, ``p90``, ``min`` and ``max`` keys
+    :rtype: dict
+    """
+    run()  # warm up
+    samples = []
+    start = default_timer()
+    while len(samples) < min_runs or (default_timer() - start < min_time and len(samples) < max_runs):
+        t = default_timer()
+        run()
+        samples.append(default_timer() - t)
+    total = sum(samples)
+    samples.sort()
+    return {
+        'runs': len(samples),
+        'ops_per_sec': len(samples) / total if total else None,
+        'mean': total / len(samples),
+        'median': samples[len(samples) // 2],
+        'p90': samples[min(int(len(samples) * 0.9), len(samples) - 1)],
+        'min': samples[0],
+        'max': samples[-1],
+    }
+
+
+def git_revision():
+    """Return the current git revision, or None outside of a git repository
+
+    :rtype: str
+    """
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT,
+                                         cwd=os.path.dirname(os.path.abspath(__file__)))
+        return output.decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names=None, min_time=1.0, output=None):
+    """Run the benchmarks and return the results
+
+    :param names: a regex filtering the benchmarks by name
+    :type names: str
+    :param min_time: the minimum measure time of each benchmark, in seconds
+    :type min_time: float
+    :param output: the path of the JSON file to write
+    :type output: str
+    :return: the results
+    :rtype: dict
+    """
+    pages = dict((name, make_page(size)) for name, size in PAGE_SIZES)
+    results = {
+        'meta': {
+            'octbrowser': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'revision': git_revision(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': {}
+    }
+    tmpdir = tempfile.mkdtemp(prefix='octbrowser-bench-')
+    try:
+        with LocalServer() as server:
+            # serve the same pre-built page for all pages and form submissions
+            server.add_route('/page/.+|/submit', body=pages['10k'])
+            for name, factory in Benchmarks(server.url, pages, tmpdir).all():
+                if names and not re.search(names, name):
+                    continue
+                stats = measure(factory(), min_time)
+                results['results'][name] = stats
+                print('{0:<32} {1:>10.1f} ops/s {2:>10.3f} ms median'.format(name, stats['ops_per_sec'],
+                                                                             stats['median'] * 1000))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return results
+
+
+def compare(before, after, threshold=0.1):
+    """Compare two results files and print the median time change of each benchmark
+
+    :param before: the path of the reference results
+    :type before: str
+    :param after: the path of the new results
+    :type after: str
+    :param threshold: the relative slowdown considered as a regression
+    :type threshold: float
+    :return: the list of regressed benchmarks
+    :rtype: list
+    """
+    with open(before) as f:
+        old = json.load(f)['results']
+    with open(after) as f:
+        new = json.load(f)['results']
+
+    regressions = []
+    for name in sorted(set(old) & set(new)):
+        change = new[name]['median'] / old[name]['median'] - 1
+        flag = ''
+        if change > threshold:
+            flag = 'REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = 'improved'
+        print('{0:<32} {1:>10.3f} ms {2:>10.3f} ms {3:>+8.1%} {4}'.format(
+            name, old[name]['median'] * 1000, new[name]['median'] * 1000, change, flag))
+    for name in sorted(set(old) ^ set(new)):
+        print('{0:<32} only in {1}'.format(name, before if name in old else after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the octbrowser benchmarks')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--output', '-o', help='write the results to this JSON file')
+    run_parser.add_argument('--filter', '-k', help='only run the benchmarks matching this regex')
+    run_parser.add_argument('--min-time', type=float, default=1.0, help='minimum time of each benchmark (seconds)')
+
+    compare_parser = subparsers.add_parser('compare', help='compare two results files')
+    compare_parser.add_argument('before', help='reference results')
+    compare_parser.add_argument('after', help='new results')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='relative slowdown considered as a regression (default 0.1)')
+
+    args = parser.parse_args(argv)
+    if args.command == 'compare':
+        return 1 if compare(args.before, args.after, args.threshold) else 0
+    if args.command == 'run':
+        run_benchmarks(args.filter, args.min_time, args.output)
+        return 0
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
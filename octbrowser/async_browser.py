@@ -0,0 +1,401 @@
+"""This file contain the asyncio counterpart of the browser
+
+The AsyncBrowser keeps the same surface as the Browser, but all methods doing network calls are coroutines. It
+requires the aiohttp package (``pip install octbrowser[async]``)
+"""
+
+import asyncio
+import os
+import time
+from datetime import timedelta
+from urllib.parse import urljoin
+
+import requests
+from http.client import HTTPMessage
+from requests.cookies import MockRequest, MockResponse
+from requests.status_codes import codes
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from octbrowser.browser import Browser
+from octbrowser.exceptions import NoFormWaiting, NoUrlOpen, HistoryIsNone
+from octbrowser.forms import MultipartStream
+from octbrowser.resources import ResourceResult, resource_filenames
+from octbrowser.timing import Timing
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncBrowser(Browser):
+
+    """An asyncio version of the browser, for running thousands of virtual users in a single event loop
+
+    The ``session`` property is still a requests.Session, used for storing headers and cookies and for preparing
+    requests. Requests are sent with an aiohttp.ClientSession, the transport, which can be shared by many browsers.
+    Responses are requests.Response objects, so the history and all parsing methods work like with the Browser.
+
+    Network methods (``open_url``, ``submit_form``, ``follow_link``, ``refresh``, ``get_resource``,
+    ``download_resources``) and history navigation (``back``, ``forward``) are coroutines.
+
+    Takes the same arguments as the Browser, plus:
+
+    :param transport: the aiohttp session used for sending requests. If not set, the browser creates its own
+    :type transport: aiohttp.ClientSession
+    :param parse_in_executor: If set to True, html parsing runs in an executor instead of the event loop thread
+    :type parse_in_executor: bool
+    :param executor: the executor used for parsing, None for the default executor of the loop
+    :type executor: concurrent.futures.Executor
+    """
+
+    def __init__(self, session=None, base_url='', **kwargs):
+        if aiohttp is None:
+            raise ImportError("The aiohttp package is required for using the AsyncBrowser")
+        super(AsyncBrowser, self).__init__(session, base_url, **kwargs)
+        self.transport = kwargs.get('transport')
+        self._own_transport = self.transport is None
+        self._parse_in_executor = kwargs.get('parse_in_executor', False)
+        self._executor = kwargs.get('executor')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """Close the transport if it was created by the browser
+
+        :return: None
+        """
+        if self._own_transport and self.transport is not None:
+            await self.transport.close()
+            self.transport = None
+
+    def _get_transport(self):
+        """Return the transport, creating it if needed. Must be called from a running loop
+
+        :return: the aiohttp session used for sending requests
+        :rtype: aiohttp.ClientSession
+        """
+        if self.transport is None:
+            self.transport = aiohttp.ClientSession(cookie_jar=aiohttp.DummyCookieJar())
+            self._own_transport = True
+        return self.transport
+
+    async def _send(self, prepared, **kwargs):
+        """Send a prepared request with the transport and build a requests.Response from the result
+
+        Redirects are followed by the browser, like with requests: cookies set by each response are stored in the
+        browser session, and each hop is prepared again with the session, so it only sends the cookies of its own
+        url. The ``timing`` property of the response is set, like with the Browser
+
+        Raise:
+            requests.TooManyRedirects
+
+        :param prepared: the request to send
+        :type prepared: requests.PreparedRequest
+        :return: the Response object
+        :rtype: requests.Response
+        """
+        allow_redirects = kwargs.pop('allow_redirects', True)
+        options = {'allow_redirects': False}
+        if 'timeout' in kwargs:
+            options['timeout'] = aiohttp.ClientTimeout(total=kwargs.pop('timeout'))
+        if kwargs.pop('verify', True) is False:
+            options['ssl'] = False
+        if kwargs:
+            raise TypeError("Unsupported arguments for AsyncBrowser: {0}".format(', '.join(kwargs)))
+
+        start = time.time()
+        timing = Timing(start)
+        history = []
+        while True:
+            hop_start = time.time()
+            async with self._get_transport().request(prepared.method, prepared.url, headers=dict(prepared.headers),
+                                                     data=prepared.body, **options) as resp:
+                timing.ttfb = time.time() - start
+                body = await resp.read()
+                timing.download = time.time() - start - timing.ttfb
+                self._extract_cookies(resp)
+
+                response = requests.Response()
+                response.status_code = resp.status
+                response.reason = resp.reason
+                response.headers = CaseInsensitiveDict(resp.headers)
+                response.url = str(resp.url)
+                response.encoding = get_encoding_from_headers(response.headers)
+                response.request = prepared
+                response._content = body
+                response.elapsed = timedelta(seconds=time.time() - hop_start)
+
+            if not allow_redirects or not response.is_redirect:
+                break
+            history.append(response)
+            if len(history) > self.session.max_redirects:
+                raise requests.TooManyRedirects('Exceeded {0} redirects.'.format(self.session.max_redirects),
+                                                response=response)
+            prepared = self._redirect_request(response)
+
+        response.history = history
+        response.timing = timing.finish()
+        return response
+
+    def _redirect_request(self, response):
+        """Prepare the request following a redirect response, with the browser session
+
+        Like with requests, 301, 302 and 303 redirects of POST requests are sent as GET requests without body, and the
+        Authorization header isn't sent to another host
+
+        :param response: the redirect response
+        :type response: requests.Response
+        :return: the next request
+        :rtype: requests.PreparedRequest
+        """
+        previous = response.request
+        url = urljoin(response.url, self.session.get_redirect_target(response))
+        headers = dict(previous.headers)
+        headers.pop('Cookie', None)
+        if self.session.should_strip_auth(previous.url, url):
+            headers.pop('Authorization', None)
+        method, body = previous.method, previous.body
+        if response.status_code not in (codes.temporary_redirect, codes.permanent_redirect):
+            if (response.status_code == codes.see_other and method != 'HEAD') or method == 'POST':
+                method = 'GET'
+            body = None
+            for name in ('Content-Type', 'Content-Length', 'Transfer-Encoding'):
+                headers.pop(name, None)
+        elif hasattr(body, 'seek'):
+            body.seek(0)
+        prepared = self.session.prepare_request(requests.Request(method, url, headers=headers))
+        prepared.body = body
+        return prepared
+
+    def _extract_cookies(self, resp):
+        """Store the cookies of an aiohttp response in the browser session
+
+        :param resp: the aiohttp response
+        :type resp: aiohttp.ClientResponse
+        :return: None
+        """
+        headers = HTTPMessage()
+        for value in resp.headers.getall('Set-Cookie', []):
+            headers['Set-Cookie'] = value
+        request = MockRequest(requests.Request('GET', str(resp.url)).prepare())
+        self.session.cookies.extract_cookies(MockResponse(headers), request)
+
+    async def _request(self, method, url, data=None, **kwargs):
+        """Prepare a request with the browser session and send it
+
+        :param method: the http method
+        :type method: str
+        :param url: the url to access
+        :type url: str
+        :param data: the data to send in the body
+        :return: the Response object
+        :rtype: requests.Response
+        """
+        request = requests.Request(method, url, data=data, headers=kwargs.pop('headers', None),
+                                   params=kwargs.pop('params', None), cookies=kwargs.pop('cookies', None))
+        return await self._send(self.session.prepare_request(request), **kwargs)
+
+    async def _process_response_async(self, response):
+        """Same as `_process_response`, but parsing can run in an executor
+
+        :param response: requests.Response object
+        :return: the updated Response object
+        """
+        if self._parse_in_executor and not self._lazy_parse and not hasattr(response, 'html'):
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(self._executor, self._parse_response, response)
+        return self._process_response(response)
+
+    async def open_url(self, url, data=None, transaction=None, **kwargs):
+        """Open the given url
+
+        :param url: The url to access
+        :type url: str
+        :param data: Data to send. If data is set, the browser will make a POST request
+        :type data: dict
+        :param transaction: the transaction name used by the metrics, default to the name given by the url
+        :type transaction: str
+        :return: The Response object
+        """
+        start = time.time()
+        response = await self._request('POST' if data else 'GET', url, data, **kwargs)
+        response.timing.started = start
+        response = await self._process_response_async(response)
+        self._append_history(response)
+        self._finish_request(response, transaction)
+        return response
+
+    async def submit_form(self, transaction=None):
+        """Submit the form filled with form_data property dict
+
+        Raise:
+            oct.core.exceptions.NoFormWaiting
+
+        :param transaction: the transaction name used by the metrics, default to the name given by the url
+        :type transaction: str
+        :return: Response object after the submit
+        """
+        if not self._form_waiting:
+            raise NoFormWaiting('No form waiting to be send')
+
+        start = time.time()
+        method, url, kwargs = self._form_request()
+        response = await self._request(method, url, **kwargs)
+        response.timing.started = start
+        response = await self._process_response_async(response)
+        return self._form_submitted(response, transaction)
+
+    async def follow_link(self, selector, url_regex=None, transaction=None):
+        """Will access the first link found with the selector
+
+        Raise:
+            oct.core.exceptions.LinkNotFound
+
+        :param selector: a string representing a css selector
+        :type selector: str
+        :param url_regex: regex for finding the url, can represent the href attribute or the link content
+        :type url_regex: str
+        :param transaction: the transaction name used by the metrics, default to the name given by the url
+        :type transaction: str
+        :return: Response object
+        """
+        return await self.open_url(self._find_link(selector, url_regex), transaction=transaction)
+
+    async def back(self):
+        """Go to the previous url in the history
+
+        :return: the Response object
+        :rtype: requests.Response
+        :raises: NoPreviousPage, HistoryIsNone
+        """
+        if self._history is None:
+            raise HistoryIsNone("You must set history if you need to use historic methods")
+        return await self._process_response_async(self._history.back())
+
+    async def forward(self):
+        """Go to the next url in the history
+
+        :return: the Response object
+        :rtype: requests.Response
+        :raises: EndOfHistory, HistoryIsNone
+        """
+        if self._history is None:
+            raise HistoryIsNone("You must set history if you need to use historic methods")
+        return await self._process_response_async(self._history.forward())
+
+    async def refresh(self, transaction=None):
+        """Refresh the current page by resending the request
+
+        :param transaction: the transaction name used by the metrics, default to the name given by the url
+        :type transaction: str
+        :return: the Response object
+        :rtype: requests.Response
+        :raises: NoUrlOpen
+        """
+        if self._response is None:
+            raise NoUrlOpen("Can't perform refresh. No url open")
+        request = self._response.request
+        if isinstance(request.body, MultipartStream):
+            # the body was read by the previous send
+            request.body.seek(0)
+        response = await self._send(request)
+        response = await self._process_response_async(response)
+        self._finish_request(response, transaction)
+        return response
+
+    async def get_resource(self, selector, output_dir, source_attribute='src', workers=1, chunk_size=1024):
+        """Get a specified ressource and write it to the output dir
+
+        Raise:
+            OSError
+
+        :param selector: a string representing a css selector
+        :type selector: str
+        :param output_dir: the directory where the ressources will be wright
+        :type output_dir: str
+        :param source_attribute: the attribute to retreive the url needed for downloading the ressource
+        :type source_attribute: str
+        :param workers: the maximum number of concurrent downloads
+        :type workers: int
+        :param chunk_size: the size of the chunks read from the responses
+        :type chunk_size: int
+        :return: number or resources successfully saved (zero for failure)
+        """
+        results = await self.download_resources(selector, output_dir, source_attribute, workers, chunk_size)
+        return len([r for r in results if r.ok])
+
+    async def download_resources(self, selector, output_dir, source_attribute='src', workers=1, chunk_size=1024):
+        """Download the resources found with the selector and write them to the output dir
+
+        Each url is downloaded once, resources with the same file name get unique names, see
+        `octbrowser.resources.resource_filenames`
+
+        Raise:
+            OSError
+
+        :param selector: a string representing a css selector
+        :type selector: str
+        :param output_dir: the directory where the ressources will be written
+        :type output_dir: str
+        :param source_attribute: the attribute to retreive the url needed for downloading the ressource
+        :type source_attribute: str
+        :param workers: the maximum number of concurrent downloads
+        :type workers: int
+        :param chunk_size: the size of the chunks read from the responses
+        :type chunk_size: int
+        :return: a list of results with status, size and elapsed time for each resource, in document order
+        :rtype: list of octbrowser.resources.ResourceResult
+        """
+        self._check_html()
+        urls = []
+        for elem in self._select(selector, translator='html'):
+            src = self._resolve_link(elem, source_attribute)
+            if src:
+                urls.append(src)
+
+        filenames = resource_filenames(urls)
+        unique_urls = list(filenames)
+        semaphore = asyncio.Semaphore(max(workers, 1))
+
+        async def download(url):
+            async with semaphore:
+                return await self._download_resource(url, output_dir, chunk_size, filenames[url])
+
+        results = dict(zip(unique_urls, await asyncio.gather(*[download(url) for url in unique_urls])))
+        return [results[url] for url in urls]
+
+    async def _download_resource(self, url, output_dir, chunk_size, filename=None):
+        """Download a single resource, see `octbrowser.resources.download_resource`
+
+        :return: the download result
+        :rtype: octbrowser.resources.ResourceResult
+        """
+        result = ResourceResult(url)
+        start = time.time()
+        prepared = self.session.prepare_request(requests.Request('GET', url))
+        try:
+            async with self._get_transport().get(url, headers=dict(prepared.headers)) as resp:
+                result.timing = Timing(start)
+                result.timing.ttfb = time.time() - start
+                self._extract_cookies(resp)
+                result.status_code = resp.status
+                if resp.status < 400:
+                    path = os.path.join(output_dir, filename or os.path.basename(str(resp.url)))
+                    with open(path, 'wb') as f:
+                        async for block in resp.content.iter_chunked(chunk_size):
+                            f.write(block)
+                            result.size += len(block)
+                    result.path = path
+        except aiohttp.ClientError as e:
+            result.error = e
+        result.elapsed = time.time() - start
+        if result.timing is not None:
+            result.timing.download = result.elapsed - result.timing.ttfb
+            result.timing.finish()
+        return result
@@ -3,22 +3,86 @@
 It represent a simple browser object with all methods
 """
 
+import copy
+import functools
+import inspect
 import re
-import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import lxml.html as lh
 import requests
+from lxml import etree
 
-from lxml.cssselect import CSSSelector
-from octbrowser.exceptions import FormNotFoundException, NoUrlOpen, LinkNotFound, NoFormWaiting, HistoryIsNone
+from six.moves.urllib.parse import urljoin
+
+from octbrowser.extractor import Extractor
+from octbrowser.forms import FormIndex, FormInfo, MultipartStream
+from octbrowser.exceptions import (FormNotFoundException, NoUrlOpen, NotHtmlResponse, LinkNotFound, NoFormWaiting,
+                                   HistoryIsNone)
 from octbrowser.history.base import BaseHistory
 from octbrowser.history.cached import CachedHistory
+from octbrowser.transport import BrowserAdapter
+from octbrowser.selector_cache import default_cache
+from octbrowser.resources import download_resource, resource_filenames
+from octbrowser.content import is_html, SNIFF_SIZE
+from octbrowser.timing import Timing
+
+ID_SELECTOR_RE = re.compile(r'^#([\w-]+)$')
+
+
+if hasattr(inspect, 'signature'):
+    def _call_args(func, *args, **kwargs):
+        """Return the arguments of a call by name, including the default values, like `inspect.getcallargs`
+
+        :param func: the called function
+        :type func: function
+        :return: the arguments
+        :rtype: dict
+        """
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        # BoundArguments.apply_defaults is new in python 3.5
+        for param in bound.signature.parameters.values():
+            if param.name not in bound.arguments:
+                if param.kind == param.VAR_POSITIONAL:
+                    bound.arguments[param.name] = ()
+                elif param.kind == param.VAR_KEYWORD:
+                    bound.arguments[param.name] = {}
+                else:
+                    bound.arguments[param.name] = param.default
+        return dict(bound.arguments)
+else:
+    # python 2
+    _call_args = inspect.getcallargs
+
+
+def recorded(extra=None):
+    """Decorator recording the calls of a browser method with the recorder of the browser, if any
+
+    :param extra: a function returning more arguments to record, called with the browser
+    :type extra: function
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if self._recorder is None:
+                return func(self, *args, **kwargs)
+            call_args = _call_args(func, self, *args, **kwargs)
+            call_args.pop('self')
+            call_args.pop('kwargs', None)
+            if extra is not None:
+                call_args.update(extra(self))
+            with self._recorder.action(func.__name__, **call_args):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
 
 
 class Browser(object):
 
-    """This class represent a minimal browser. Build on top of lxml awesome library it let you write script for accessing
-    or testing website with python scripts
+    """This class represent a minimal browser. Build on top of lxml awesome library it let you write script for
+    accessing or testing website with python scripts
 
     :param session: The session object to use. If set to None will use requests.Session
     :type session: requests.Session
@@ -27,11 +91,66 @@ class Browser(object):
     :param history: The history object to use. If set to None no history will be stored.
     :type history: octbrowser.history.BaseHistory
     :type history: octbrowser.history.base.BaseHistory instance
+    :param keep_alive: If set to True, the pooled connection is left open after each request and reused by the next one
+    :type keep_alive: bool
+    :param pool_connections: The number of hosts to keep a connection pool for, used only with keep_alive
+    :type pool_connections: int
+    :param pool_maxsize: The maximum number of connections kept open per host, used only with keep_alive
+    :type pool_maxsize: int
+    :param pool_block: If True, wait for a free connection instead of opening a new one when the pool is full
+    :type pool_block: bool
+    :param adapter: The transport adapter to mount on the session, a new one is created if keep_alive is set
+    :type adapter: octbrowser.transport.BrowserAdapter
+    :param lazy_parse: If set to True, the html of a response is parsed only the first time it's needed
+    :type lazy_parse: bool
+    :param lazy_links: If set to True, links are not made absolute at parse time but only when the browser uses them
+    :type lazy_links: bool
+    :param selector_cache: The cache of compiled css selectors. If not set, the cache shared by all browsers is used
+    :type selector_cache: octbrowser.selector_cache.SelectorCache
+    :param http_cache: The http cache used by open_url and refresh. If set to None no response will be cached
+    :type http_cache: octbrowser.cache.HttpCache
+    :param parse_cache: The cache of parsed trees. If set to None all bodies are parsed
+    :type parse_cache: octbrowser.cache.ParseCache
+    :param stream_parse: If set to True, open_url parses the body while it's downloaded
+    :type stream_parse: bool
+    :param stream_chunk_size: The size of the chunks read from the response in streaming mode
+    :type stream_chunk_size: int
+    :param sniff_content: If set to True, only html bodies are parsed, based on the Content-Type and first bytes
+    :type sniff_content: bool
+    :param max_body_size: The maximum size of a body kept in memory. Bigger bodies are written to a file
+    :type max_body_size: int
+    :param body_sink_dir: The directory for bodies bigger than max_body_size, default to the temporary directory
+    :type body_sink_dir: str
+    :param metrics: The metrics recording the latency of each request. Can be shared by many browsers
+    :type metrics: octbrowser.metrics.Metrics
+    :param seen: The index of the urls opened by the browser. follow_link skips the links already opened
+    :type seen: octbrowser.seen.SeenIndex
+    :param recorder: The recorder of the actions of the browser and of their requests
+    :type recorder: octbrowser.har.HarRecorder
     """
 
     def __init__(self, session=None, base_url='', **kwargs):
         self._sess_bak = session
         self._history = kwargs.get('history', CachedHistory())
+        self._keep_alive = kwargs.get('keep_alive', False)
+        self._adapter = kwargs.get('adapter')
+        self._lazy_parse = kwargs.get('lazy_parse', False)
+        self._lazy_links = kwargs.get('lazy_links', False)
+        self._selector_cache = kwargs.get('selector_cache', default_cache)
+        self._http_cache = kwargs.get('http_cache')
+        self._parse_cache = kwargs.get('parse_cache')
+        self._stream_parse = kwargs.get('stream_parse', False)
+        self._stream_chunk_size = kwargs.get('stream_chunk_size', 16384)
+        self._sniff_content = kwargs.get('sniff_content', True)
+        self._max_body_size = kwargs.get('max_body_size')
+        self._body_sink_dir = kwargs.get('body_sink_dir')
+        self._metrics = kwargs.get('metrics')
+        self._seen = kwargs.get('seen')
+        self._recorder = kwargs.get('recorder')
+        if self._adapter is None and self._keep_alive:
+            self._adapter = BrowserAdapter(pool_connections=kwargs.get('pool_connections', 10),
+                                           pool_maxsize=kwargs.get('pool_maxsize', 10),
+                                           pool_block=kwargs.get('pool_block', False))
 
         # check history class
         if self._history is not None:
@@ -41,7 +160,39 @@ class Browser(object):
         self._base_url = base_url
         self.form = None
         self.form_data = None
-        self.session = session or requests.Session()
+        self._form_info = None
+        self.session = session or self._create_session()
+        self._mount_adapter()
+
+    def _create_session(self):
+        """Create a new session, used if no session was given to the browser
+
+        :return: a new session
+        :rtype: requests.Session
+        """
+        return requests.Session()
+
+    def _mount_adapter(self):
+        """Mount the browser transport adapter, if any, on the current session
+
+        :return: None
+        """
+        if self._adapter is not None:
+            self._adapter.mount_on(self.session)
+
+    @property
+    def connection_stats(self):
+        """Connection reuse counters of the browser transport adapter
+
+        The dict contains the number of ``requests`` sent, the number of ``new_connections`` opened for them
+        and the number of ``reused_connections``. Without adapter, all values are None
+
+        :return: the connection counters
+        :rtype: dict
+        """
+        if self._adapter is None:
+            return {'requests': None, 'new_connections': None, 'reused_connections': None}
+        return self._adapter.stats
 
     def clean_browser(self):
         """Clears browser history, session, current page, and form state
@@ -53,6 +204,7 @@ class Browser(object):
         self._response = None
         self.form = None
         self.form_data = None
+        self._form_info = None
         try:
             self.clear_history()
         except HistoryIsNone:
@@ -97,7 +249,8 @@ class Browser(object):
         :return: None
         """
         del self.session
-        self.session = self._sess_bak or requests.Session()
+        self.session = self._sess_bak or self._create_session()
+        self._mount_adapter()
 
     @property
     def _url(self):
@@ -114,12 +267,31 @@ class Browser(object):
     def _html(self):
         """Parsed html of the current page or None if there isn't any
 
+        If the response hasn't been parsed yet (lazy_parse mode), it will be parsed and memoized on the response
+
         :return: html of current page or None if there isn't any
         """
-        try:
-            return self._response.html
-        except AttributeError:
+        if self._response is None:
             return None
+        if not hasattr(self._response, 'html'):
+            self._parse_response(self._response)
+        return self._response.html
+
+    def _check_html(self):
+        """Check that the current page is a parsed html page
+
+        Raise:
+            * oct.core.exceptions.NoUrlOpen
+            * oct.core.exceptions.NotHtmlResponse
+
+        :return: None
+        """
+        if self._html is None:
+            if self._response is None:
+                raise NoUrlOpen('No url open')
+            headers = getattr(self._response, 'headers', None) or {}
+            raise NotHtmlResponse('The current page is not html (Content-Type: {0})'.format(
+                headers.get('Content-Type')))
 
     @property
     def _form_waiting(self):
@@ -143,27 +315,213 @@ class Browser(object):
 
             lxml.html.tostring(response.html)
 
+        In lazy_parse mode, the html property is only set the first time the browser needs it
+
         :param response: requests.Response or urllib.Response object
         :return: the updated Response object
         """
-        if not hasattr(response, 'html'):
-            try:
-                html = response.content
-            except AttributeError:
-                html = response.read()
-                response.content = html
-            tree = lh.fromstring(html)
-            tree.make_links_absolute(base_url=self._base_url)
-            response.html = tree
+        if not hasattr(response, 'content'):
+            response.content = response.read()
+        if not self._lazy_parse and not hasattr(response, 'html'):
+            self._parse_response(response)
         self._response = response
         return response
 
-    def get_form(self, selector=None, nr=0, at_base=False):
+    def _parse_response(self, response):
+        """Parse the content of the response and set its html property
+
+        If the body isn't html, the html property is set to None
+
+        :param response: requests.Response or urllib.Response object, with a content property
+        :return: the parsed html
+        :rtype: lxml.html.HtmlElement
+        """
+        if not self._is_html(response, response.content):
+            response.html = None
+            return None
+        timing = getattr(response, 'timing', None)
+        start = time.time()
+        absolutize = timing.absolutize if timing is not None else 0.0
+        if self._parse_cache is not None:
+            context = '{0}|{1}'.format(self._base_url, self._lazy_links)
+            tree = self._parse_cache.parse(response.content, lambda c: self._build_tree(c, timing), context)
+        else:
+            tree = self._build_tree(response.content, timing)
+        if timing is not None:
+            timing.parse += time.time() - start - (timing.absolutize - absolutize)
+        response.html = tree
+        return tree
+
+    def _is_html(self, response, head):
+        """Check if the body of the response should be parsed as html
+
+        :param response: requests.Response or urllib.Response object
+        :param head: the first bytes of the body
+        :type head: bytes
+        :return: True if the body should be parsed
+        :rtype: bool
+        """
+        if not self._sniff_content:
+            return True
+        headers = getattr(response, 'headers', None) or {}
+        return is_html(headers.get('Content-Type'), head[:SNIFF_SIZE])
+
+    def _build_tree(self, content, timing=None):
+        """Parse the content and make its links absolute, unless lazy_links is set
+
+        :param content: the html to parse
+        :type content: bytes
+        :param timing: the timing record of the response, updated with the time spent on links
+        :type timing: octbrowser.timing.Timing
+        :return: the parsed html
+        :rtype: lxml.html.HtmlElement
+        """
+        if self._lazy_links:
+            return lh.fromstring(content, base_url=self._base_url or None)
+        tree = lh.fromstring(content)
+        self._make_links_absolute(tree, timing)
+        return tree
+
+    def _make_links_absolute(self, tree, timing=None):
+        """Make the links of the tree absolute, and add the time spent to the timing record
+
+        :param tree: the parsed html
+        :type tree: lxml.html.HtmlElement
+        :param timing: the timing record of the response
+        :type timing: octbrowser.timing.Timing
+        :return: None
+        """
+        start = time.time()
+        tree.make_links_absolute(base_url=self._base_url)
+        if timing is not None:
+            timing.absolutize += time.time() - start
+
+    def _link_base(self):
+        """Return the url used to resolve the links of the current page
+
+        Like ``make_links_absolute``, the href of a ``<base>`` tag takes precedence over the browser base_url.
+        The result is stored on the response
+
+        :return: the base url of the current page
+        :rtype: str
+        """
+        base = getattr(self._response, 'link_base', None)
+        if base is None:
+            base = self._base_url
+            base_tag = self._html.find('.//base[@href]')
+            if base_tag is not None:
+                base = urljoin(base, base_tag.get('href').strip())
+            self._response.link_base = base
+        return base
+
+    def _resolve_link(self, element, attribute):
+        """Return the absolute value of a link attribute of an element of the current page
+
+        In lazy_links mode, the attribute is resolved against the page base url and the absolute value is written
+        back in the element, so each element is only resolved once. Trees shared through a parse cache with
+        ``copy=False`` are never modified. Otherwise links are already absolute.
+
+        :param element: the element holding the link
+        :type element: lxml.html.HtmlElement
+        :param attribute: the name of the link attribute (href, src, action...)
+        :type attribute: str
+        :return: the absolute url or None if the attribute isn't set
+        :rtype: str
+        """
+        value = element.get(attribute)
+        if value is None or not self._lazy_links:
+            return value
+        absolute = urljoin(self._link_base(), value.strip())
+        if absolute != value and not self._shared_tree:
+            element.set(attribute, absolute)
+        return absolute
+
+    @property
+    def _shared_tree(self):
+        """True if the trees of the pages are shared with other responses by the parse cache, and must not be modified
+
+        :rtype: bool
+        """
+        return self._parse_cache is not None and not self._parse_cache.copy
+
+    @property
+    def http_cache(self):
+        """Return the http cache used by the browser
+
+        :return: the _http_cache property
+        :rtype: octbrowser.cache.HttpCache
+        """
+        return self._http_cache
+
+    @property
+    def parse_cache(self):
+        """Return the cache of parsed trees used by the browser
+
+        :return: the _parse_cache property
+        :rtype: octbrowser.cache.ParseCache
+        """
+        return self._parse_cache
+
+    @property
+    def selector_cache(self):
+        """Return the compiled css selectors cache used by the browser
+
+        :return: the _selector_cache property
+        :rtype: octbrowser.selector_cache.SelectorCache
+        """
+        return self._selector_cache
+
+    def _select(self, selector, translator='xml'):
+        """Return the elements of the current page matching the css selector, using the selector cache
+
+        :param selector: a string representing a css selector
+        :type selector: str
+        :param translator: the cssselect translator to use, ``xml`` or ``html``
+        :type translator: str
+        :return: the list of matching elements
+        :rtype: list
+        """
+        return self._selector_cache.select(self._html, selector, translator)
+
+    @property
+    def forms(self):
+        """Return the index of the forms of the current page, built the first time it's needed
+
+        Raise:
+            * oct.core.exceptions.NoUrlOpen
+            * oct.core.exceptions.NotHtmlResponse
+
+        :return: the form index
+        :rtype: octbrowser.forms.FormIndex
+        """
+        self._check_html()
+        index = getattr(self._response, 'form_index', None)
+        if index is None:
+            index = self._response.form_index = FormIndex(self._html, self._form_action)
+        return index
+
+    def _form_action(self, form):
+        """Return the absolute action url of a form of the current page
+
+        :param form: the form element
+        :type form: lxml.html.FormElement
+        :return: the absolute url
+        :rtype: str
+        """
+        return urljoin(self._link_base(), (form.get('action') or '').strip())
+
+    @recorded()
+    def get_form(self, selector=None, nr=0, at_base=False, name=None, action=None):
         """Get the form selected by the selector and / or the nr param
 
+        Forms are found with the form index of the page (see `forms`), a selector like ``#id`` or the name or action
+        of the form don't run any css selector. If no selector is given, the form is found by name and / or action
+        url, or by its position in the page
+
         Raise:
             * oct.core.exceptions.FormNotFoundException
             * oct.core.exceptions.NoUrlOpen
+            * oct.core.exceptions.NotHtmlResponse
 
         :param selector: A css-like selector for finding the form
         :type selector: str
@@ -171,24 +529,47 @@ class Browser(object):
         :type nr: int
         :param at_base: must be set to true in case of form action is on the base_url page
         :type at_base: bool
+        :param name: the name of the form, used if selector is None
+        :type name: str
+        :param action: the action url of the form, used if selector is None
+        :type action: str
         :return: None
         """
-        if self._html is None:
-            raise NoUrlOpen('No url open')
-
+        index = self.forms
+        info = None
         if selector is None:
-            self.form = self._html.forms[nr]
-            self.form_data = dict(self._html.forms[nr].fields)
+            if name is not None or action is not None:
+                action = urljoin(self._link_base(), action) if action is not None else None
+                info = index.get(name=name, action=action)
+            elif -len(index) <= nr < len(index):
+                info = index[nr]
         else:
-            sel = CSSSelector(selector)
-            for el in sel(self._html):
-                if el.forms:
-                    self.form = el.forms[nr]
-                    self.form_data = dict(el.forms[nr].fields)
-
-        if self.form is None:
+            match = ID_SELECTOR_RE.match(selector)
+            if match and nr == 0:
+                info = index.by_id.get(match.group(1))
+            if info is None:
+                for el in self._select(selector):
+                    if -len(el.forms) <= nr < len(el.forms):
+                        form = el.forms[nr]
+                        info = index.info(form) or FormInfo(form, -1)
+
+        if info is None:
             raise FormNotFoundException('Form not found with selector {0} and nr {1}'.format(selector, nr))
 
+        if self._shared_tree:
+            # the action of the form is changed below, on a copy of the form
+            form = copy.deepcopy(info.form)
+            action = self._resolve_link(info.form, 'action')
+            if action is not None:
+                form.set('action', action)
+            info = FormInfo(form, info.position, info.action)
+        else:
+            self._resolve_link(info.form, 'action')
+
+        self._form_info = info
+        self.form = info.form
+        self.form_data = info.form_data()
+
         # common case where action was empty before make_link_absolute call
         if (self.form.action == self._base_url and
                 self._url is not self._base_url and
@@ -203,64 +584,363 @@ class Browser(object):
         """
         if not self._form_waiting:
             raise NoFormWaiting('No form waiting')
+        if self._form_info is not None and self._form_info.form is self.form:
+            return self._form_info.select_values()
         data = {}
         for i in self.form.inputs:
             if isinstance(i, lh.SelectElement):
                 data[i.name] = i.value_options
         return data
 
-    def submit_form(self):
+    @recorded(lambda browser: {'changes': browser._form_changes()})
+    def submit_form(self, transaction=None):
         """Submit the form filled with form_data property dict
 
+        The form is encoded from form_data, see `octbrowser.forms.FormInfo.encode`, and sent with the browser session.
+        Forms with a ``multipart/form-data`` enctype or a file field are sent as a multipart body, streamed with
+        `octbrowser.forms.MultipartStream`: set the value of a file field to a path or a file object and the file is
+        read chunk by chunk while it's sent
+
         Raise:
             oct.core.exceptions.NoFormWaiting
 
+        :param transaction: the transaction name used by the metrics, default to the name given by the url
+        :type transaction: str
         :return: Response object after the submit
         """
         if not self._form_waiting:
             raise NoFormWaiting('No form waiting to be send')
 
-        self.form.fields = self.form_data
-        r = lh.submit_form(self.form, open_http=self._open_session_http)
-        resp = self._process_response(r)
-        if self._history is not None:
-            self._history.append_item(resp)
+        method, url, kwargs = self._form_request()
+        r = self._send_timed(self.session.request, method, url, **kwargs)
+        return self._form_submitted(r, transaction)
+
+    def _form_changes(self):
+        """Return the values of form_data different from the default values of the waiting form
+
+        :return: the changed values
+        :rtype: dict
+        """
+        if not self._form_waiting:
+            return {}
+        info = self._form_info
+        defaults = info.values if info is not None and info.form is self.form else {}
+        return dict((k, v) for k, v in self.form_data.items() if k not in defaults or defaults[k] != v)
+
+    def _form_request(self):
+        """Encode the waiting form
+
+        :return: the method, the url and the keyword arguments of the request
+        :rtype: tuple
+        """
+        info = self._form_info
+        if info is None or info.form is not self.form:
+            info = FormInfo(self.form, -1)
+        fields, files = info.encode(self.form_data)
+        url = self.form.action or self._url
+        if info.method == 'GET':
+            return info.method, url, {'params': fields}
+        if files or info.enctype == 'multipart/form-data':
+            body = MultipartStream(fields, files, chunk_size=self._stream_chunk_size)
+            return info.method, url, {'data': body, 'headers': {'Content-Type': body.content_type}}
+        return info.method, url, {'data': fields}
+
+    def _form_submitted(self, response, transaction=None):
+        """Process the response of a form submission and reset the form state
+
+        :param response: the response of the submission
+        :type response: requests.Response
+        :param transaction: the transaction name used by the metrics
+        :type transaction: str
+        :return: the processed Response object
+        """
+        resp = self._process_response(response)
+        self._append_history(resp)
         self.form_data = None
         self.form = None
+        self._form_info = None
+        self._finish_request(resp, transaction)
         return resp
 
-    def _open_session_http(self, method, url, values):
-        """Custom method for form submission, send to lxml submit form method
+    def _append_history(self, response):
+        """Add the response to the history, if any, and time it
+
+        :param response: the response to add
+        :type response: requests.Response
+        :return: None
+        """
+        if self._history is None:
+            return
+        start = time.time()
+        self._history.append_item(response)
+        timing = getattr(response, 'timing', None)
+        if timing is not None:
+            timing.history += time.time() - start
+
+    def _finish_request(self, response, transaction=None):
+        """Set the total time of the timing record of the response, if any, record it in the metrics and give the
+        response to the recorder
+
+        :param response: the response
+        :type response: requests.Response
+        :param transaction: the transaction name, default to the name given by the requested url
+        :type transaction: str
+        :return: None
+        """
+        timing = getattr(response, 'timing', None)
+        if timing is not None:
+            timing.finish()
+            if self._metrics is not None:
+                if transaction is None:
+                    history = getattr(response, 'history', None)
+                    transaction = self._metrics.transaction_name(history[0].url if history else response.url)
+                self._metrics.record(transaction, timing.total)
+        if self._recorder is not None:
+            self._recorder.add_response(response)
+
+    @property
+    def recorder(self):
+        """Return the recorder of the browser actions
+
+        :return: the _recorder property
+        :rtype: octbrowser.har.HarRecorder
+        """
+        return self._recorder
+
+    @property
+    def seen(self):
+        """Return the index of the urls opened by the browser
+
+        :return: the _seen property
+        :rtype: octbrowser.seen.SeenIndex
+        """
+        return self._seen
+
+    @property
+    def metrics(self):
+        """Return the latency metrics of the browser
+
+        :return: the _metrics property
+        :rtype: octbrowser.metrics.Metrics
+        """
+        return self._metrics
+
+    def _send_timed(self, send, *args, **kwargs):
+        """Call a session method sending a request and set the ``timing`` property of the response
+
+        :param send: the session method (``request``, ``get``, ``post``, ``send``...)
+        :type send: callable
+        :return: the Response object
+        :rtype: requests.Response
+        """
+        start = time.time()
+        response = send(*args, **kwargs)
+        response.timing = Timing.from_response(response, start)
+        return response
+
+    def _cache_fetch(self, fetch, url, send):
+        """Call a fetch method of the http cache and set the ``timing`` property of the returned response
 
-        :param method: the method of the form (POST, GET, PUT, DELETE)
-        :type method: str
-        :param url: the url of the action of the form7
+        When the cached response is returned, its timing is replaced by the timing of the revalidation request or, if
+        no request was sent, by an empty timing
+
+        :param fetch: the cache method, ``fetch`` or ``revalidate``
+        :type fetch: callable
+        :param url: the requested url
         :type url: str
-        :param values: the values of the form
-        :type values: dict
-        :return: Response object from requests.request method
+        :param send: the callable sending the request, given to the cache method
+        :type send: callable
+        :return: the Response object
+        :rtype: requests.Response
         """
-        return self.session.request(method, url, None, values)
+        start = time.time()
+        sent = []
+
+        def _send(headers):
+            r = send(headers)
+            sent.append(r)
+            return r
 
-    def open_url(self, url, data=None, **kwargs):
+        response = fetch(url, _send)
+        if not sent or response is not sent[-1]:
+            response.timing = sent[-1].timing if sent else Timing(start)
+        return response
+
+    @recorded()
+    def open_url(self, url, data=None, stop_selector=None, transaction=None, **kwargs):
         """Open the given url
 
+        The ``timing`` property of the response is an `octbrowser.timing.Timing` object, with the time spent on each
+        step of the request (network, parsing, history...)
+
+        In stream_parse mode, or if a stop_selector is given, the body is parsed while it's downloaded. With a
+        stop_selector the download stops as soon as an element matching the selector has been parsed, the html and
+        content of the response are then partial and its ``stream_stopped`` property is set to True
+
+        If max_body_size is set, bodies bigger than this size are written to a file instead of being kept in memory.
+        The ``body_path`` property of the response is then the path of the file, its content is empty and its html
+        is None
+
         :param url: The url to access
         :type url: str
         :param data: Data to send. If data is set, the browser will make a POST request
         :type data: dict
+        :param stop_selector: a css selector, stop downloading the page once a matching element is found
+        :type stop_selector: str
+        :param transaction: the transaction name used by the metrics, default to the name given by the url
+        :type transaction: str
         :return: The Response object from requests call
         """
+        stream_parse = self._stream_parse or stop_selector is not None
+        streamed = stream_parse or self._max_body_size is not None
+        if streamed:
+            kwargs['stream'] = True
+        start = time.time()
         if data:
-            response = self.session.post(url, data, **kwargs)
+            response = self._send_timed(self.session.post, url, data, **kwargs)
+            if streamed:
+                self._stream_response(response, stop_selector, stream_parse)
+        elif self._http_cache is not None:
+            response = self._cache_fetch(
+                self._http_cache.fetch, url,
+                lambda headers: self._cached_get(url, headers, streamed, stop_selector, **kwargs))
         else:
-            response = self.session.get(url, **kwargs)
+            response = self._get(url, streamed, stop_selector, **kwargs)
+        response.timing.started = start
         response = self._process_response(response)
-        if self._history is not None:
-            self._history.append_item(response)
-        response.connection.close()
+        self._append_history(response)
+        if self._seen is not None:
+            self._seen.add(url)
+            self._seen.add(response.url)
+        if not self._keep_alive:
+            response.connection.close()
+        self._finish_request(response, transaction)
+        return response
+
+    def _get(self, url, streamed=False, stop_selector=None, **kwargs):
+        """Send a GET request, and read the body chunk by chunk if streamed is set
+
+        :param url: The url to access
+        :type url: str
+        :param streamed: if True, the body is read with `_stream_response`
+        :type streamed: bool
+        :param stop_selector: a css selector, stop downloading the page once a matching element is found
+        :type stop_selector: str
+        :return: The Response object from requests call
+        """
+        response = self._send_timed(self.session.get, url, **kwargs)
+        if streamed:
+            self._stream_response(response, stop_selector, self._stream_parse or stop_selector is not None)
         return response
 
+    def _cached_get(self, url, cache_headers, streamed=False, stop_selector=None, **kwargs):
+        """Send a GET request with the given cache headers added to the request headers
+
+        :param url: The url to access
+        :type url: str
+        :param cache_headers: the conditional headers given by the http cache
+        :type cache_headers: dict
+        :param streamed: if True, the body is read with `_stream_response`
+        :type streamed: bool
+        :param stop_selector: a css selector, stop downloading the page once a matching element is found
+        :type stop_selector: str
+        :return: The Response object from requests call
+        """
+        if cache_headers:
+            headers = dict(kwargs.pop('headers', None) or {})
+            headers.update(cache_headers)
+            kwargs['headers'] = headers
+        return self._get(url, streamed, stop_selector, **kwargs)
+
+    def _stream_response(self, response, stop_selector=None, parse=True):
+        """Read the body of a streamed response chunk by chunk and set its content property
+
+        If parse is set, chunks are fed to an incremental parser and the html property is set. Once the body is
+        bigger than max_body_size, it's written to a file and the ``body_path`` property is set
+
+        :param response: a response requested with stream=True
+        :type response: requests.Response
+        :param stop_selector: a css selector, stop downloading the page once a matching element is found
+        :type stop_selector: str
+        :param parse: if True, parse the body while it's downloaded
+        :type parse: bool
+        :return: None
+        """
+        timing = getattr(response, 'timing', None)
+        start = time.time()
+        parse_time = 0.0
+        parser = None
+        sel = self._selector_cache.get(stop_selector, 'html') if stop_selector is not None else None
+        # each parsed element is tested once, instead of searching the whole partial tree after each chunk
+        match = self._selector_cache.matcher(stop_selector, 'html') if stop_selector is not None else None
+
+        chunks = []
+        size = 0
+        sink = None
+        stopped = False
+        skipped = False
+        for chunk in response.iter_content(self._stream_chunk_size):
+            size += len(chunk)
+            if sink is not None:
+                sink.write(chunk)
+                continue
+            chunks.append(chunk)
+
+            if self._max_body_size is not None and size > self._max_body_size:
+                sink = tempfile.NamedTemporaryFile(prefix='octbrowser-', dir=self._body_sink_dir, delete=False)
+                for c in chunks:
+                    sink.write(c)
+                chunks = []
+                parser = None
+                continue
+
+            if parse and parser is None:
+                if not self._is_html(response, chunk):
+                    parse = False
+                    skipped = True
+                    continue
+                base_url = self._base_url or None if self._lazy_links else None
+                parser = etree.HTMLPullParser(events=('end',), base_url=base_url)
+                parser.set_element_class_lookup(lh.HtmlElementClassLookup())
+            if parser is not None:
+                feed_start = time.time()
+                parser.feed(chunk)
+                for event, element in parser.read_events():
+                    if sel is not None and not stopped:
+                        stopped = bool(match(element) if match is not None else sel(element))
+                parse_time += time.time() - feed_start
+                if stopped:
+                    break
+
+        response._content = b''.join(chunks)
+        response._content_consumed = True
+        response.stream_stopped = stopped
+        if stopped:
+            response.close()
+        if timing is not None:
+            timing.download += time.time() - start - parse_time
+            timing.parse += parse_time
+
+        if sink is not None:
+            sink.close()
+            response.body_path = sink.name
+            response.html = None
+        elif parser is not None:
+            close_start = time.time()
+            try:
+                tree = parser.close()
+            except etree.XMLSyntaxError:
+                # empty document, let lxml raise the usual error
+                tree = lh.fromstring(response.content)
+            if timing is not None:
+                timing.parse += time.time() - close_start
+            if not self._lazy_links:
+                self._make_links_absolute(tree, timing)
+            response.html = tree
+        elif skipped:
+            response.html = None
+
+    @recorded()
     def back(self):
         """Go to the previous url in the history
 
@@ -273,6 +953,7 @@ class Browser(object):
         response = self._history.back()
         return self._process_response(response)
 
+    @recorded()
     def forward(self):
         """Go to the next url in the history
 
@@ -285,17 +966,47 @@ class Browser(object):
         response = self._history.forward()
         return self._process_response(response)
 
-    def refresh(self):
+    @recorded()
+    def refresh(self, transaction=None):
         """Refresh the current page by resending the request
 
+        :param transaction: the transaction name used by the metrics, default to the name given by the url
+        :type transaction: str
         :return: the Response object
         :rtype: requests.Response
         :raises: NoUrlOpen
         """
         if self._response is None:
             raise NoUrlOpen("Can't perform refresh. No url open")
-        response = self.session.send(self._response.request)
-        return self._process_response(response)
+        request = self._response.request
+        start = time.time()
+        if self._http_cache is not None and request.method == 'GET':
+            response = self._cache_fetch(self._http_cache.revalidate, request.url,
+                                         lambda headers: self._resend(request, headers))
+        else:
+            response = self._resend(request, None)
+        response.timing.started = start
+        response = self._process_response(response)
+        self._finish_request(response, transaction)
+        return response
+
+    def _resend(self, request, headers):
+        """Send again a prepared request with additional headers
+
+        :param request: the request to send
+        :type request: requests.PreparedRequest
+        :param headers: the headers to add
+        :type headers: dict
+        :return: the Response object
+        :rtype: requests.Response
+        """
+        if headers:
+            request = request.copy()
+            request.headers.update(headers)
+        if isinstance(request.body, MultipartStream):
+            # the body was read by the previous send
+            request.body.seek(0)
+        return self._send_timed(self.session.send, request)
 
     def clear_history(self):
         """Re initialise the history
@@ -325,9 +1036,12 @@ class Browser(object):
         """
         return self._history
 
-    def follow_link(self, selector, url_regex=None):
+    @recorded()
+    def follow_link(self, selector, url_regex=None, transaction=None):
         """Will access the first link found with the selector
 
+        If the browser has a seen index, the links already opened are skipped
+
         Raise:
             oct.core.exceptions.LinkNotFound
 
@@ -335,24 +1049,67 @@ class Browser(object):
         :type selector: str
         :param url_regex: regex for finding the url, can represent the href attribute or the link content
         :type url_regex: str
+        :param transaction: the transaction name used by the metrics, default to the name given by the url
+        :type transaction: str
         :return: Response object
         """
-        sel = CSSSelector(selector)
-        resp = None
+        return self.open_url(self._find_link(selector, url_regex), transaction=transaction)
 
-        if self._html is None:
-            raise NoUrlOpen
+    def _find_link(self, selector, url_regex=None):
+        """Return the url of the first link found with the selector
+
+        Raise:
+            oct.core.exceptions.LinkNotFound
 
-        for e in sel(self._html):
-            if url_regex:
-                r = re.compile(url_regex)
-                if r.match(e.get('href')) or r.match(e.xpath('string()')):
-                    return self.open_url(e.get('href'))
-            else:
-                return self.open_url(e.get('href'))
+        :param selector: a string representing a css selector
+        :type selector: str
+        :param url_regex: regex for finding the url, can represent the href attribute or the link content
+        :type url_regex: str
+        :return: the absolute url of the link
+        :rtype: str
+        """
+        self._check_html()
+
+        r = re.compile(url_regex) if url_regex else None
+        for e in self._select(selector):
+            href = self._resolve_link(e, 'href')
+            if self._seen is not None:
+                try:
+                    if urljoin(self._url, href) in self._seen:
+                        continue
+                except ValueError:
+                    # malformed url, like an invalid port, it can't be opened anyway
+                    continue
+            if r is None or r.match(href) or r.match(e.xpath('string()')):
+                return href
+
+        raise LinkNotFound('Link not found')
+
+    def get_links(self, selector='a[href]', url_regex=None, attribute='href'):
+        """Return the absolute urls of all the links found with the selector, in document order
+
+        Raise:
+            * oct.core.exceptions.NoUrlOpen
+            * oct.core.exceptions.NotHtmlResponse
 
-        if resp is None:
-            raise LinkNotFound('Link not found')
+        :param selector: a string representing a css selector
+        :type selector: str
+        :param url_regex: regex for filtering the urls, can represent the href attribute or the link content
+        :type url_regex: str
+        :param attribute: the attribute holding the url
+        :type attribute: str
+        :return: the list of urls
+        :rtype: list
+        """
+        self._check_html()
+
+        r = re.compile(url_regex) if url_regex else None
+        urls = []
+        for e in self._select(selector):
+            url = self._resolve_link(e, attribute)
+            if url and (r is None or r.match(url) or r.match(e.xpath('string()'))):
+                urls.append(url)
+        return urls
 
     def get_html_element(self, selector):
         """Return a html element as string. The element will be find using the `selector` param
@@ -365,9 +1122,8 @@ class Browser(object):
         :return: a string containing the element, if multiples elements are find, it will concat them
         :rtype: str
         """
-        if self._html is None:
-            raise NoUrlOpen()
-        elements = self._html.cssselect(selector)
+        self._check_html()
+        elements = self._select(selector, translator='html')
         ret = ""
         for elem in elements:
             ret += lh.tostring(elem, encoding='unicode', pretty_print=True)
@@ -381,13 +1137,37 @@ class Browser(object):
         :return: a list of lxml.html.HtmlElement of finded elements
         :rtype: list
         """
-        if self._html is None:
-            raise NoUrlOpen()
-        return self._html.cssselect(selector)
+        self._check_html()
+        return self._select(selector, translator='html')
+
+    def extract(self, fields):
+        """Extract many fields from the current page with a single call
+
+        Each field is given by a css selector and an optional projection (``'text'``, ``'html'``, ``'@attribute'``
+        or a callable), see `octbrowser.extractor.Extractor`. This is faster than calling `get_html_elements` for
+        each selector, attributes are selected without building any element. Attribute values are returned as they
+        are in the page, links are relative in lazy_links mode
+
+        Raise:
+            * oct.core.exceptions.NoUrlOpen
+            * oct.core.exceptions.NotHtmlResponse
+
+        :param fields: a dict of ``name: spec`` or an extractor built once for many pages
+        :type fields: dict
+        :return: a dict of ``name: values``, or ``name: value`` for the fields with first set
+        :rtype: dict
+        """
+        self._check_html()
+        if not isinstance(fields, Extractor):
+            fields = Extractor(fields, cache=self._selector_cache)
+        return fields.extract(self._html)
 
-    def get_resource(self, selector, output_dir, source_attribute='src'):
+    def get_resource(self, selector, output_dir, source_attribute='src', workers=1, chunk_size=1024):
         """Get a specified ressource and write it to the output dir
 
+        Resources are downloaded with the browser session. Set ``workers`` for downloading them concurrently,
+        see `download_resources` if you need the details of each download
+
         Raise:
             OSError
 
@@ -397,36 +1177,58 @@ class Browser(object):
         :type output_dir: str
         :param source_attribute: the attribute to retreive the url needed for downloading the ressource
         :type source_attribute: str
+        :param workers: the maximum number of concurrent downloads
+        :type workers: int
+        :param chunk_size: the size of the chunks read from the responses
+        :type chunk_size: int
         :return: number or resources successfully saved (zero for failure)
         """
-        if self._html is None:
-            raise NoUrlOpen()
-        elements = self._html.cssselect(selector)
+        results = self.download_resources(selector, output_dir, source_attribute, workers, chunk_size)
+        return len([r for r in results if r.ok])
+
+    def download_resources(self, selector, output_dir, source_attribute='src', workers=1, chunk_size=1024):
+        """Download the resources found with the selector and write them to the output dir
 
-        cnt = 0
-        if not elements or len(elements) == 0:
-            return cnt
+        Each url is downloaded once, resources with the same file name get unique names, see
+        `octbrowser.resources.resource_filenames`
 
+        Raise:
+            OSError
+
+        :param selector: a string representing a css selector
+        :type selector: str
+        :param output_dir: the directory where the ressources will be written
+        :type output_dir: str
+        :param source_attribute: the attribute to retreive the url needed for downloading the ressource
+        :type source_attribute: str
+        :param workers: the maximum number of concurrent downloads
+        :type workers: int
+        :param chunk_size: the size of the chunks read from the responses
+        :type chunk_size: int
+        :return: a list of results with status, size and elapsed time for each resource, in document order
+        :rtype: list of octbrowser.resources.ResourceResult
+        """
+        self._check_html()
+        elements = self._select(selector, translator='html')
+
+        urls = []
         for elem in elements:
-            src = elem.get(source_attribute)
-            if not src:
-                continue
+            src = self._resolve_link(elem, source_attribute)
+            if src:
+                urls.append(src)
 
-            response = requests.get(src, stream=True)
-            if not response.ok:
-                continue
+        filenames = resource_filenames(urls)
+        unique_urls = list(filenames)
+
+        def download(url):
+            return download_resource(self.session, url, output_dir, chunk_size, filenames[url])
 
-            # Save resource to file
-            filename = os.path.basename(response.url)
-            path = os.path.join(output_dir, filename)
-            with open(path, 'wb') as f:
-                for block in response.iter_content(1024):
-                    if not block:
-                        break
-                    f.write(block)
-                cnt += 1
-
-        return cnt
+        if workers <= 1 or len(unique_urls) <= 1:
+            results = dict((url, download(url)) for url in unique_urls)
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(unique_urls))) as executor:
+                results = dict(zip(unique_urls, executor.map(download, unique_urls)))
+        return [results[url] for url in urls]
 
     @staticmethod
     def open_in_browser(response):
@@ -0,0 +1,439 @@
+"""This file contain the caches of the browser
+
+The http cache stores GET responses with their parsed html. Fresh responses are reused without any request, stale
+ones are revalidated with If-None-Match / If-Modified-Since headers and reused if the server answers 304.
+
+The parse cache stores parsed trees by content hash, so identical bodies are never parsed twice
+"""
+
+import copy
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_tz, mktime_tz
+
+CACHEABLE_STATUS = (200, 203, 300, 301, 410)
+MAX_AGE_RE = re.compile(r'max-age\s*=\s*"?(\d+)"?', re.I)
+
+
+def parse_http_date(value):
+    """Parse an http date header
+
+    :param value: the header value
+    :type value: str
+    :return: the timestamp or None if the date is invalid
+    :rtype: float
+    """
+    if not value:
+        return None
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    try:
+        return mktime_tz(parsed)
+    except (OverflowError, ValueError):
+        return None
+
+
+def cache_directives(headers):
+    """Return the lower case directives of the Cache-Control header
+
+    :param headers: the response or request headers
+    :type headers: dict
+    :return: the list of directives, with their values
+    :rtype: list
+    """
+    value = headers.get('Cache-Control') or ''
+    return [d.strip().lower() for d in value.split(',') if d.strip()]
+
+
+def freshness_lifetime(headers, now=None):
+    """Compute the time until a response become stale, from Cache-Control max-age or Expires headers
+
+    :param headers: the response headers
+    :type headers: dict
+    :param now: the current timestamp
+    :type now: float
+    :return: the freshness lifetime in seconds, 0 if the response must be revalidated
+    :rtype: float
+    """
+    now = time.time() if now is None else now
+    directives = cache_directives(headers)
+    if 'no-cache' in directives:
+        return 0
+    for directive in directives:
+        match = MAX_AGE_RE.match(directive)
+        if match:
+            age = headers.get('Age')
+            age = int(age) if age and age.isdigit() else 0
+            return max(int(match.group(1)) - age, 0)
+    expires = parse_http_date(headers.get('Expires'))
+    if expires is not None:
+        date = parse_http_date(headers.get('Date')) or now
+        return max(expires - date, 0)
+    return 0
+
+
+class CacheEntry(object):
+
+    """A cached response with its freshness and validators
+
+    :param response: the cached response
+    :type response: requests.Response
+    """
+
+    __slots__ = ('response', 'expires_at', 'etag', 'last_modified', 'size')
+
+    def __init__(self, response):
+        self.response = response
+        self.size = len(response.content or b'')
+        self.update(response.headers)
+
+    def update(self, headers):
+        """Update validators and freshness from response headers (a 304 response for example)
+
+        :param headers: the headers of the response
+        :type headers: dict
+        :return: None
+        """
+        self.etag = headers.get('ETag') or getattr(self, 'etag', None)
+        self.last_modified = headers.get('Last-Modified') or getattr(self, 'last_modified', None)
+        self.expires_at = time.time() + freshness_lifetime(headers)
+
+    def copy_response(self):
+        """Return a copy of the cached response for one browser
+
+        The copy shares the body and headers of the cached response, but not the properties set by the browsers
+        (``timing``, ``link_base``, ``form_index``...). Its html tree, if the cached response was parsed, is a copy
+        too, so browsers sharing the cache never modify each other's pages
+
+        :return: the copied response
+        :rtype: requests.Response
+        """
+        response = self.response
+        copied = response.__class__.__new__(response.__class__)
+        copied.__dict__.update(response.__dict__)
+        for name in ('timing', 'link_base', 'form_index', 'html'):
+            copied.__dict__.pop(name, None)
+        html = getattr(response, 'html', None)
+        if html is not None:
+            copied.html = copy.deepcopy(html)
+        elif hasattr(response, 'html'):
+            copied.html = None
+        return copied
+
+    @property
+    def fresh(self):
+        """True if the entry can be used without revalidation
+
+        :rtype: bool
+        """
+        return time.time() < self.expires_at
+
+    @property
+    def conditional_headers(self):
+        """The headers for revalidating the entry
+
+        :return: a dict with If-None-Match and / or If-Modified-Since headers
+        :rtype: dict
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache(object):
+
+    """A thread safe LRU cache of GET responses, with conditional revalidation
+
+    Only responses with a cacheable status and either a freshness lifetime or a validator (ETag, Last-Modified) are
+    stored. Responses with ``Cache-Control: no-store`` or a ``Vary`` header (except on Accept-Encoding), redirected
+    responses and partial bodies (``stream_stopped`` or ``body_path`` responses) are never stored.
+
+    Entries are keyed by url only, like in a shared proxy cache. User specific responses are never stored: responses
+    with ``Cache-Control: private`` or a ``Set-Cookie`` header, and responses to requests with an ``Authorization``
+    header, unless they're explicitly ``public``.
+
+    Each hit returns a copy of the cached response, see `CacheEntry.copy_response`, so the cache can be shared by
+    many browsers.
+
+    :param max_entries: the maximum number of responses to keep
+    :type max_entries: int
+    :param max_bytes: the maximum total size of the cached bodies, None for no limit
+    :type max_bytes: int
+    """
+
+    def __init__(self, max_entries=256, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, url):
+        """Return the entry stored for the url, or None
+
+        :param url: the requested url
+        :type url: str
+        :return: the cache entry
+        :rtype: CacheEntry
+        """
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is not None:
+                self._entries[url] = entry
+            return entry
+
+    @staticmethod
+    def cacheable(response):
+        """Check if a response can be stored
+
+        :param response: the response to check
+        :type response: requests.Response
+        :return: True if the response can be stored
+        :rtype: bool
+        """
+        if response.request is not None and response.request.method != 'GET':
+            return False
+        if response.status_code not in CACHEABLE_STATUS:
+            return False
+        if getattr(response, 'body_path', None) is not None or getattr(response, 'stream_stopped', False):
+            return False
+        # entries are keyed by the requested url, the final response of a redirection belongs to another url
+        if getattr(response, 'history', None):
+            return False
+        directives = cache_directives(response.headers)
+        if 'no-store' in directives:
+            return False
+        # the cache is shared by browsers with different cookies, user specific responses are never stored
+        if 'private' in directives or 'Set-Cookie' in response.headers:
+            return False
+        if response.request is not None and 'Authorization' in response.request.headers and \
+                not [d for d in directives if d in ('public', 'must-revalidate') or d.startswith('s-maxage')]:
+            return False
+        vary = [v.strip().lower() for v in (response.headers.get('Vary') or '').split(',') if v.strip()]
+        if [v for v in vary if v != 'accept-encoding']:
+            return False
+        return bool(response.headers.get('ETag') or response.headers.get('Last-Modified') or
+                    freshness_lifetime(response.headers) > 0)
+
+    def store(self, url, response):
+        """Store the response for the url if it's cacheable
+
+        :param url: the requested url
+        :type url: str
+        :param response: the response to store
+        :type response: requests.Response
+        :return: the new entry, or None if the response isn't cacheable
+        :rtype: CacheEntry
+        """
+        if not self.cacheable(response):
+            self.discard(url)
+            return None
+        entry = CacheEntry(response)
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[url] = entry
+            self.size += entry.size
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     (self.max_bytes is not None and self.size > self.max_bytes)):
+                self.size -= self._entries.popitem(last=False)[1].size
+        return entry
+
+    def discard(self, url):
+        """Remove the entry stored for the url, if any
+
+        :param url: the requested url
+        :type url: str
+        :return: None
+        """
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is not None:
+                self.size -= entry.size
+
+    def fetch(self, url, send):
+        """Return the response for the url, using the cache when possible
+
+        The ``send`` callable is called with a dict of extra headers (empty or conditional headers) and must return a
+        response for the url.
+
+        :param url: the requested url
+        :type url: str
+        :param send: the callable sending the request
+        :type send: callable
+        :return: the response, a cached one or a new one
+        :rtype: requests.Response
+        """
+        return self._fetch(url, send, False)
+
+    def revalidate(self, url, send):
+        """Same as `fetch`, but the entry is revalidated even if it's still fresh
+
+        :param url: the requested url
+        :type url: str
+        :param send: the callable sending the request
+        :type send: callable
+        :return: the response, a cached one or a new one
+        :rtype: requests.Response
+        """
+        return self._fetch(url, send, True)
+
+    def _fetch(self, url, send, force):
+        entry = self.lookup(url)
+        if entry is not None and entry.fresh and not force:
+            with self._lock:
+                self.hits += 1
+            return entry.copy_response()
+
+        response = send(entry.conditional_headers if entry is not None else {})
+        if entry is not None and response.status_code == 304:
+            entry.update(response.headers)
+            with self._lock:
+                self.revalidations += 1
+            return entry.copy_response()
+
+        with self._lock:
+            self.misses += 1
+        self.store(url, response)
+        return response
+
+    @property
+    def stats(self):
+        """Cache usage counters
+
+        :return: a dict with ``hits``, ``revalidations``, ``misses``, ``entries`` and ``size`` keys
+        :rtype: dict
+        """
+        with self._lock:
+            return {'hits': self.hits, 'revalidations': self.revalidations, 'misses': self.misses,
+                    'entries': len(self._entries), 'size': self.size}
+
+    def clear(self):
+        """Remove all entries and reset counters
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.revalidations = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ParseCache(object):
+
+    """A thread safe LRU cache of parsed html trees, keyed by a hash of the body and the parsing context
+
+    On a hit, a copy of the cached tree is returned, which is much cheaper than parsing the body again. With
+    ``copy=False`` the cached tree itself is returned and must be considered as read only, since it's shared by all
+    responses with the same body.
+
+    :param max_entries: the maximum number of trees to keep
+    :type max_entries: int
+    :param copy: if True, return a copy of the cached tree
+    :type copy: bool
+    """
+
+    def __init__(self, max_entries=64, copy=True):
+        self.max_entries = max_entries
+        self.copy = copy
+        self.hits = 0
+        self.misses = 0
+        self.saved_time = 0.0
+        self._trees = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(content, context=''):
+        """Return the cache key of a body
+
+        :param content: the body to parse
+        :type content: bytes
+        :param context: everything else changing the parsed tree, like the base url
+        :type context: str
+        :return: the cache key
+        :rtype: str
+        """
+        digest = hashlib.sha1(content)
+        digest.update(b'\0')
+        digest.update(context.encode('utf-8'))
+        return digest.hexdigest()
+
+    def parse(self, content, build, context=''):
+        """Return the tree for the body, building it with the ``build`` callable on a miss
+
+        :param content: the body to parse
+        :type content: bytes
+        :param build: callable taking the body and returning the parsed tree
+        :type build: callable
+        :param context: everything else changing the parsed tree, like the base url
+        :type context: str
+        :return: the parsed tree
+        :rtype: lxml.html.HtmlElement
+        """
+        key = self.key(content, context)
+        with self._lock:
+            cached = self._trees.pop(key, None)
+            if cached is not None:
+                self._trees[key] = cached
+
+        if cached is not None:
+            tree, parse_time = cached
+            start = time.time()
+            if self.copy:
+                tree = copy.deepcopy(tree)
+            with self._lock:
+                self.hits += 1
+                self.saved_time += max(parse_time - (time.time() - start), 0)
+            return tree
+
+        start = time.time()
+        tree = build(content)
+        parse_time = time.time() - start
+        stored = copy.deepcopy(tree) if self.copy else tree
+        with self._lock:
+            self.misses += 1
+            self._trees[key] = (stored, parse_time)
+            while len(self._trees) > self.max_entries:
+                self._trees.popitem(last=False)
+        return tree
+
+    @property
+    def stats(self):
+        """Cache usage counters
+
+        :return: a dict with ``hits``, ``misses``, ``entries`` and ``saved_time`` (in seconds) keys
+        :rtype: dict
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._trees),
+                    'saved_time': self.saved_time}
+
+    def clear(self):
+        """Remove all trees and reset counters
+
+        :return: None
+        """
+        with self._lock:
+            self._trees.clear()
+            self.hits = 0
+            self.misses = 0
+            self.saved_time = 0.0
+
+    def __len__(self):
+        return len(self._trees)
@@ -0,0 +1,92 @@
+"""This file contain the content detection helpers of the browser
+
+They decide if a response body is worth parsing as html, from its Content-Type header and its first bytes
+"""
+
+#: Content types always parsed as html
+HTML_TYPES = ('text/html', 'application/xhtml+xml')
+
+#: Content types that don't say anything about the body, the first bytes are sniffed
+GENERIC_TYPES = ('', 'text/plain', 'application/octet-stream', 'application/unknown', 'unknown/unknown')
+
+#: Signatures of common binary formats
+BINARY_SIGNATURES = (
+    b'%PDF-',
+    b'\x89PNG\r\n\x1a\n',
+    b'GIF87a',
+    b'GIF89a',
+    b'\xff\xd8\xff',
+    b'PK\x03\x04',
+    b'\x1f\x8b',
+    b'RIFF',
+    b'OggS',
+    b'ID3',
+    b'wOFF',
+    b'wOF2',
+    b'\x00\x00\x01\x00',
+)
+
+#: Sniffing looks at this number of bytes
+SNIFF_SIZE = 512
+
+
+def media_type(content_type):
+    """Return the lower case media type of a Content-Type header, without parameters
+
+    :param content_type: the Content-Type header value
+    :type content_type: str
+    :return: the media type, empty string if unknown
+    :rtype: str
+    """
+    return (content_type or '').split(';')[0].strip().lower()
+
+
+def looks_binary(head):
+    """Check if the first bytes of a body look like a binary format
+
+    :param head: the first bytes of the body
+    :type head: bytes
+    :return: True if the body is binary
+    :rtype: bool
+    """
+    if head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        # utf-16 byte order marks, text with null bytes
+        return False
+    if head.startswith(BINARY_SIGNATURES):
+        return True
+    return b'\x00' in head[:SNIFF_SIZE]
+
+
+def looks_like_markup(head):
+    """Check if the first bytes of a body look like html or xml
+
+    :param head: the first bytes of the body
+    :type head: bytes
+    :return: True if the body starts with a tag
+    :rtype: bool
+    """
+    head = head[:SNIFF_SIZE]
+    if head.startswith(b'\xef\xbb\xbf'):
+        head = head[3:]
+    return head.lstrip().startswith(b'<')
+
+
+def is_html(content_type, head):
+    """Decide if a body should be parsed as html
+
+    Html and xml content types are always parsed. For generic content types (or no content type at all) the first
+    bytes of the body must look like markup. Everything else (json, images, pdf...) is never parsed
+
+    :param content_type: the Content-Type header value
+    :type content_type: str
+    :param head: the first bytes of the body
+    :type head: bytes
+    :return: True if the body should be parsed
+    :rtype: bool
+    """
+    mtype = media_type(content_type)
+    if mtype in HTML_TYPES or mtype.endswith('/xml') or mtype.endswith('+xml'):
+        return not looks_binary(head)
+    if mtype in GENERIC_TYPES:
+        return not looks_binary(head) and looks_like_markup(head)
+    return False
@@ -0,0 +1,293 @@
+"""This file contain the crawler of the octbrowser
+
+The crawler follows the links of the pages from one or more start urls, with a pool of browsers running in worker
+threads. Results are yielded as soon as pages are fetched
+"""
+
+import re
+import threading
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import six
+from six.moves.urllib.parse import urlsplit, urljoin
+
+from octbrowser.pool import BrowserPool
+from octbrowser.seen import SeenIndex, canonicalize_url
+
+
+def normalize_url(url):
+    """Normalize an absolute url, so the same page always gives the same url
+
+    Same as `octbrowser.seen.canonicalize_url`, but the order of the query parameters is kept
+
+    :param url: the absolute url
+    :type url: str
+    :return: the normalized url
+    :rtype: str
+    """
+    return canonicalize_url(url, sort_query=False)
+
+
+class CrawlResult(object):
+
+    """The result of a crawled page
+
+    :param url: the url of the page
+    :type url: str
+    :param depth: the number of links followed from a start url
+    :type depth: int
+    :param parent: the url of the page where the link was found, None for start urls
+    :type parent: str
+    """
+
+    __slots__ = ('url', 'depth', 'parent', 'response', 'status_code', 'links', 'error', 'elapsed')
+
+    def __init__(self, url, depth, parent=None):
+        self.url = url
+        self.depth = depth
+        self.parent = parent
+        self.response = None
+        self.status_code = None
+        self.links = []
+        self.error = None
+        self.elapsed = 0.0
+
+    @property
+    def ok(self):
+        """True if the page was fetched without error and with a successful status
+
+        :rtype: bool
+        """
+        return self.error is None and self.status_code is not None and self.status_code < 400
+
+    def __repr__(self):
+        return '<CrawlResult {0} [{1}] depth={2}>'.format(self.url, self.status_code, self.depth)
+
+
+class Crawler(object):
+
+    """A concurrent crawler following the links found with a css selector
+
+    The crawl is a generator, pages are fetched by ``workers`` threads and yielded as soon as they're ready, in no
+    particular order. Stopping the iteration stops the crawl. Each worker uses its own browser from a
+    `octbrowser.pool.BrowserPool`, all sharing the same connections.
+
+    Links are normalized (see `normalize_url`) and each url is fetched only once, urls are remembered in a compact
+    `octbrowser.seen.SeenIndex` unless another index (a `octbrowser.seen.BloomFilter` or an index loaded from a
+    previous crawl) is given. Only http and https links to the allowed domains (and their sub domains) are followed.
+
+    All other keyword arguments are given to the browsers (``lazy_links``, ``http_cache``, ``metrics``...)
+
+    :param start_urls: the urls of the first pages
+    :type start_urls: list
+    :param link_selector: the css selector of the links to follow
+    :type link_selector: str
+    :param max_depth: the maximum number of links followed from a start url, None for no limit
+    :type max_depth: int
+    :param max_pages: the maximum number of pages fetched, None for no limit
+    :type max_pages: int
+    :param allowed_domains: the domains of the links to follow, default to the domains of the start urls
+    :type allowed_domains: list
+    :param url_regex: only follow the links whose url match this regex
+    :type url_regex: str
+    :param workers: the number of pages fetched at the same time
+    :type workers: int
+    :param per_host: the maximum number of pages fetched at the same time on a host
+    :type per_host: int
+    :param delay: the minimum time between two requests to the same host, in seconds
+    :type delay: float
+    :param pool: the browser pool used by the workers, a new one is created if not set
+    :type pool: octbrowser.pool.BrowserPool
+    :param seen: the index of the urls already found, with ``add`` and ``in`` support
+    :type seen: octbrowser.seen.SeenIndex
+    """
+
+    def __init__(self, start_urls, link_selector='a[href]', max_depth=2, max_pages=None, allowed_domains=None,
+                 url_regex=None, workers=4, per_host=2, delay=0.0, pool=None, seen=None, **kwargs):
+        if isinstance(start_urls, six.string_types):
+            start_urls = [start_urls]
+        self.start_urls = [normalize_url(url) for url in start_urls]
+        self.link_selector = link_selector
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        if allowed_domains is None:
+            allowed_domains = [urlsplit(url).hostname for url in self.start_urls]
+        self.allowed_domains = [domain.lower() for domain in allowed_domains]
+        self.url_regex = re.compile(url_regex) if url_regex else None
+        self.workers = workers
+        self.per_host = per_host
+        self.delay = delay
+        self._own_pool = pool is None
+        self.pool = pool or BrowserPool(size=workers, pool_maxsize=per_host, history_factory=None, **kwargs)
+        self.seen = SeenIndex() if seen is None else seen
+        self.fetched = 0
+        self.errors = 0
+        self._local = threading.local()
+        self._browsers = []
+        self._lock = threading.Lock()
+
+    def allowed(self, url):
+        """Check if a normalized url can be crawled
+
+        :param url: the normalized url
+        :type url: str
+        :return: True if the url can be crawled
+        :rtype: bool
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            return False
+        host = parts.hostname or ''
+        if not [d for d in self.allowed_domains if host == d or host.endswith('.' + d)]:
+            return False
+        return self.url_regex is None or bool(self.url_regex.match(url))
+
+    def _browser(self):
+        """Return the browser of the current worker thread
+
+        :return: the browser
+        :rtype: octbrowser.browser.Browser
+        """
+        browser = getattr(self._local, 'browser', None)
+        if browser is None:
+            browser = self._local.browser = self.pool.acquire()
+            with self._lock:
+                self._browsers.append(browser)
+        return browser
+
+    def fetch(self, url, depth, parent=None):
+        """Fetch a page and extract its links, called by the workers
+
+        :param url: the url of the page
+        :type url: str
+        :param depth: the depth of the page
+        :type depth: int
+        :param parent: the url of the page where the link was found
+        :type parent: str
+        :return: the result
+        :rtype: CrawlResult
+        """
+        result = CrawlResult(url, depth, parent)
+        browser = self._browser()
+        start = time.time()
+        try:
+            response = browser.open_url(url)
+            result.response = response
+            result.status_code = response.status_code
+            # parsed on demand in lazy_parse mode
+            if browser._html is not None and (self.max_depth is None or depth < self.max_depth):
+                # links are relative if the browsers have no base url
+                result.links = [urljoin(response.url, link) for link in browser.get_links(self.link_selector)]
+        except Exception as e:
+            # a page failing for any reason must not stop the crawl
+            result.error = e
+        result.elapsed = time.time() - start
+        return result
+
+    def crawl(self):
+        """Crawl the pages and yield the results as soon as they're fetched
+
+        :return: a generator of results
+        :rtype: generator
+        """
+        frontier = OrderedDict()
+        active = {}
+        next_request = {}
+
+        def enqueue(url, depth, parent):
+            try:
+                url = normalize_url(url)
+            except ValueError:
+                # invalid link, like a non numeric port
+                return
+            if not self.allowed(url) or not self.seen.add(url):
+                return
+            host = urlsplit(url).netloc
+            frontier.setdefault(host, deque()).append((url, depth, parent))
+
+        for url in self.start_urls:
+            enqueue(url, 0, None)
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        running = {}
+        try:
+            while frontier or running:
+                now = time.time()
+                wake_up = None
+                scheduled = True
+                while scheduled:
+                    # one page per host and per pass, round robin between hosts
+                    scheduled = False
+                    for host in list(frontier):
+                        if len(running) >= self.workers:
+                            break
+                        if self.max_pages is not None and self.fetched + len(running) >= self.max_pages:
+                            break
+                        if active.get(host, 0) >= self.per_host:
+                            continue
+                        if next_request.get(host, 0) > now:
+                            wake_up = min(wake_up or next_request[host], next_request[host])
+                            continue
+                        url, depth, parent = frontier[host].popleft()
+                        if not frontier[host]:
+                            del frontier[host]
+                        else:
+                            frontier[host] = frontier.pop(host)
+                        active[host] = active.get(host, 0) + 1
+                        next_request[host] = now + self.delay
+                        running[executor.submit(self.fetch, url, depth, parent)] = host
+                        scheduled = True
+
+                if not running:
+                    if self.max_pages is not None and self.fetched >= self.max_pages:
+                        break
+                    if wake_up is not None:
+                        time.sleep(max(wake_up - time.time(), 0))
+                    continue
+
+                timeout = max(wake_up - time.time(), 0) if wake_up is not None else None
+                done, pending = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host = running.pop(future)
+                    active[host] -= 1
+                    result = future.result()
+                    self.fetched += 1
+                    if not result.ok:
+                        self.errors += 1
+                    for link in result.links:
+                        enqueue(link, result.depth + 1, result.url)
+                    yield result
+                if self.max_pages is not None and self.fetched >= self.max_pages and not running:
+                    break
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self._release_browsers()
+
+    def __iter__(self):
+        return self.crawl()
+
+    def _release_browsers(self):
+        """Give the browsers of the workers back to the pool
+
+        :return: None
+        """
+        with self._lock:
+            browsers, self._browsers = self._browsers, []
+        for browser in browsers:
+            self.pool.release(browser)
+        self._local = threading.local()
+        if self._own_pool:
+            self.pool.close()
+
+    @property
+    def stats(self):
+        """Crawl counters
+
+        :return: a dict with ``fetched``, ``errors`` and ``seen`` (number of urls found) keys
+        :rtype: dict
+        """
+        return {'fetched': self.fetched, 'errors': self.errors, 'seen': len(self.seen)}
@@ -24,6 +24,12 @@ class NoUrlOpen(Exception):
     pass
 
 
+class NotHtmlResponse(NoUrlOpen):
+    """Raised if a method needing the html of the current page is called but the current response isn't html
+    """
+    pass
+
+
 class LinkNotFound(Exception):
     """
     Raised in case of link not found in current html document
@@ -62,3 +68,9 @@ class HistoryIsNone(Exception):
     """Raised if the ``_history`` property of the browser is set to None and one method using it is called
     """
     pass
+
+
+class PoolExhausted(Exception):
+    """Raised if no browser is available in a ``BrowserPool`` and the caller doesn't want to wait for one
+    """
+    pass
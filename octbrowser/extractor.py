@@ -0,0 +1,130 @@
+"""This file contain the extractor of the browser
+
+An extractor answers many css selectors on a page with a single call. Each selector is translated once to an xpath
+expression, and attribute values are selected by the expression itself, so no element is created for them
+"""
+
+import lxml.html as lh
+import six
+
+from octbrowser.selector_cache import default_cache
+
+
+class Field(object):
+
+    """A field of an extractor
+
+    The projection gives the value extracted for each matching element :
+
+    * None: the element itself
+    * ``'text'``: the text content of the element
+    * ``'html'``: the html source of the element
+    * ``'@name'``: the value of the ``name`` attribute, elements without this attribute are skipped
+    * a callable: the result of the callable, called with the element
+
+    :param selector: a string representing a css selector
+    :type selector: str
+    :param projection: the value extracted for each element
+    :type projection: str
+    :param first: if True, only the first value is extracted, or None if there isn't any
+    :type first: bool
+    """
+
+    __slots__ = ('selector', 'projection', 'first')
+
+    def __init__(self, selector, projection=None, first=False):
+        if not (projection in (None, 'text', 'html') or callable(projection) or
+                (isinstance(projection, six.string_types) and projection.startswith('@') and len(projection) > 1)):
+            raise ValueError('Invalid projection {0!r}'.format(projection))
+        self.selector = selector
+        self.projection = projection
+        self.first = first
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Build a field from a selector string, a (selector, projection[, first]) tuple or a field
+
+        :param spec: the field specification
+        :return: the field
+        :rtype: Field
+        """
+        if isinstance(spec, cls):
+            return spec
+        if isinstance(spec, six.string_types):
+            return cls(spec)
+        return cls(*spec)
+
+    def __repr__(self):
+        return '<Field {0!r} {1!r} first={2}>'.format(self.selector, self.projection, self.first)
+
+
+class Extractor(object):
+
+    """Extract named fields from html trees
+
+    The fields are given as a dict of ``name: spec``, where spec is a css selector, a ``(selector, projection)`` or
+    ``(selector, projection, first)`` tuple, or a `Field`. Build the extractor once and call `extract` on each page :
+
+    .. code-block:: python
+
+        extractor = Extractor({
+            'title': ('h1', 'text', True),
+            'links': ('a.item', '@href'),
+            'prices': ('.price', 'text'),
+        })
+        extractor.extract(tree)
+        # {'title': 'Products', 'links': ['/p/1', '/p/2'], 'prices': ['10', '12']}
+
+    :param fields: the fields to extract
+    :type fields: dict
+    :param translator: the cssselect translator to use, ``xml`` or ``html``
+    :type translator: str
+    :param cache: the cache of compiled selectors and xpath expressions, default to the shared cache
+    :type cache: octbrowser.selector_cache.SelectorCache
+    """
+
+    def __init__(self, fields, translator='html', cache=None):
+        cache = cache or default_cache
+        self.fields = dict((name, Field.from_spec(spec)) for name, spec in fields.items())
+        self._compiled = []
+        for name, field in self.fields.items():
+            expression = cache.get(field.selector, translator).path
+            if isinstance(field.projection, six.string_types) and field.projection.startswith('@'):
+                expression = '({0})/{1}'.format(expression, field.projection)
+            if field.first:
+                expression = '({0})[1]'.format(expression)
+            self._compiled.append((name, field, cache.xpath(expression)))
+
+    @staticmethod
+    def _project(elements, projection):
+        """Apply a projection to a list of elements
+
+        :return: the list of values
+        :rtype: list
+        """
+        if projection is None or isinstance(projection, six.string_types) and projection.startswith('@'):
+            return elements
+        if projection == 'text':
+            return [element.text_content() for element in elements]
+        if projection == 'html':
+            return [lh.tostring(element, encoding='unicode') for element in elements]
+        return [projection(element) for element in elements]
+
+    def extract(self, root):
+        """Extract all the fields from a tree
+
+        :param root: the element to search in
+        :type root: lxml.html.HtmlElement
+        :return: a dict of ``name: values``, or ``name: value`` for the fields with first set
+        :rtype: dict
+        """
+        result = {}
+        for name, field, xpath in self._compiled:
+            values = self._project(xpath(root), field.projection)
+            if field.first:
+                values = values[0] if values else None
+            result[name] = values
+        return result
+
+    def __repr__(self):
+        return '<Extractor {0}>'.format(sorted(self.fields))
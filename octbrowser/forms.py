@@ -0,0 +1,424 @@
+"""This file contain the form index and the form encoder of the browser
+
+The index is built once per page, the first time a form is needed. It gives the forms by position, id, name and action
+url, with the default values, types and options of their fields already computed.
+
+Forms are encoded from the form data of the browser, without writing the values in the tree. Multipart bodies are
+streamed, files are read from disk chunk by chunk while the request is sent
+"""
+
+import io
+import mimetypes
+import os
+import uuid
+from collections import OrderedDict
+
+import lxml.html as lh
+import six
+from six.moves.collections_abc import MutableSet
+
+#: the input types never sent with the form
+SKIPPED_TYPES = frozenset(['submit', 'image', 'reset', 'button'])
+
+
+class FormInfo(object):
+
+    """A form of the page with its precomputed fields
+
+    ``values`` is a dict of the default values of the fields, like ``dict(form.fields)``, but the values of multiple
+    selects and checkbox groups are plain sets. ``types`` gives the type of each field (``text``, ``hidden``,
+    ``select``, ``textarea``, ``radio``, ``checkbox``...), ``options`` the available values of the select fields and
+    ``hidden`` the values of the hidden fields, like csrf tokens. ``disabled`` is the set of the disabled fields, which
+    are never sent.
+
+    :param form: the form element
+    :type form: lxml.html.FormElement
+    :param position: the index of the form in the page
+    :type position: int
+    :param action: the resolved action url of the form
+    :type action: str
+    """
+
+    __slots__ = ('form', 'position', 'id', 'name', 'action', 'method', 'enctype', 'values', 'types', 'options',
+                 'hidden', 'disabled')
+
+    def __init__(self, form, position, action=None):
+        self.form = form
+        self.position = position
+        self.id = form.get('id')
+        self.name = form.get('name')
+        self.action = action if action is not None else form.get('action')
+        self.method = form.method
+        self.enctype = (form.get('enctype') or 'application/x-www-form-urlencoded').lower()
+        self.values = OrderedDict()
+        self.types = {}
+        self.options = {}
+        self.hidden = {}
+        enabled = set()
+        self.disabled = set()
+        inputs = form.inputs
+        for el in inputs:
+            if el.name:
+                (self.disabled if 'disabled' in el.attrib else enabled).add(el.name)
+        self.disabled -= enabled
+        for name in inputs.keys():
+            field = inputs[name]
+            value = field.value
+            if isinstance(field, lh.RadioGroup):
+                self.types[name] = 'radio'
+            elif isinstance(field, lh.CheckboxGroup):
+                self.types[name] = 'checkbox'
+            elif isinstance(field, lh.SelectElement):
+                self.types[name] = 'select'
+                self.options[name] = field.value_options
+            elif isinstance(field, lh.TextareaElement):
+                self.types[name] = 'textarea'
+            else:
+                self.types[name] = field.type
+                if field.type == 'hidden':
+                    self.hidden[name] = value
+            if isinstance(value, MutableSet):
+                # multiple selects and checkbox groups values are bound to the tree
+                value = set(value)
+            self.values[name] = value
+
+    def form_data(self):
+        """Return a new dict of the default values, which can be changed without changing the index
+
+        :return: the values of the fields
+        :rtype: dict
+        """
+        data = self.values.copy()
+        for name, value in data.items():
+            if isinstance(value, set):
+                data[name] = set(value)
+        return data
+
+    def select_values(self):
+        """Return the available values of the select fields
+
+        :return: a dict of ``name: values``
+        :rtype: dict
+        """
+        return dict((name, list(values)) for name, values in self.options.items())
+
+    def encode(self, form_data):
+        """Return the values to send for the given form data, in the order of the fields in the form
+
+        Like a browser, buttons, disabled fields and fields set to None are not sent, and multiple values give one
+        pair each. Keys of the form data that aren't fields of the form are sent after the fields.
+
+        The value of a file field is a path, a file object, a ``(filename, path or file object[, content type])``
+        tuple or None
+
+        :param form_data: the values of the fields
+        :type form_data: dict
+        :return: a list of ``(name, value)`` pairs and a list of ``(name, file)`` pairs
+        :rtype: tuple
+        """
+        fields = []
+        files = []
+        names = list(self.values) + [name for name in form_data if name not in self.types]
+        for name in names:
+            if name not in form_data or name in self.disabled:
+                continue
+            field_type = self.types.get(name)
+            if field_type in SKIPPED_TYPES:
+                continue
+            value = form_data[name]
+            if field_type == 'file':
+                files.append((name, value))
+            elif value is None:
+                continue
+            elif isinstance(value, (set, frozenset)):
+                options = self.options.get(name)
+                values = [v for v in options if v in value] if options is not None else sorted(value)
+                fields.extend((name, v) for v in values)
+            elif isinstance(value, (list, tuple)):
+                fields.extend((name, v) for v in value)
+            else:
+                fields.append((name, value))
+        return fields, files
+
+    def __repr__(self):
+        return '<FormInfo {0} id={1!r} name={2!r} action={3!r}>'.format(self.position, self.id, self.name,
+                                                                          self.action)
+
+
+class FormIndex(object):
+
+    """The forms of a page, indexed by position, id, name and action url
+
+    When many forms have the same id, name or action, the first one is indexed
+
+    :param tree: the parsed page
+    :type tree: lxml.html.HtmlElement
+    :param resolve_action: a function returning the absolute action url of a form element
+    :type resolve_action: function
+    """
+
+    def __init__(self, tree, resolve_action=None):
+        self.forms = []
+        self.by_id = {}
+        self.by_name = {}
+        self.by_action = {}
+        self._by_element = {}
+        for position, form in enumerate(tree.forms):
+            info = FormInfo(form, position, resolve_action(form) if resolve_action is not None else None)
+            self.forms.append(info)
+            self._by_element[form] = info
+            if info.id is not None:
+                self.by_id.setdefault(info.id, info)
+            if info.name is not None:
+                self.by_name.setdefault(info.name, info)
+            if info.action is not None:
+                self.by_action.setdefault(info.action, info)
+
+    def get(self, form_id=None, name=None, action=None):
+        """Return the first form matching all the given criteria
+
+        :param form_id: the id of the form
+        :type form_id: str
+        :param name: the name of the form
+        :type name: str
+        :param action: the resolved action url of the form
+        :type action: str
+        :return: the form or None if there isn't any
+        :rtype: FormInfo
+        """
+        criteria = [(attribute, value) for attribute, value in (('id', form_id), ('name', name), ('action', action))
+                    if value is not None]
+        if not criteria:
+            return self.forms[0] if self.forms else None
+        attribute, value = criteria[0]
+        info = getattr(self, 'by_' + attribute).get(value)
+        if info is None:
+            return None
+        if all(getattr(info, a) == v for a, v in criteria):
+            return info
+        # the first form with this attribute doesn't match the other criteria
+        for info in self.forms:
+            if all(getattr(info, a) == v for a, v in criteria):
+                return info
+        return None
+
+    def info(self, form):
+        """Return the index entry of a form element
+
+        :param form: the form element
+        :type form: lxml.html.FormElement
+        :return: the form or None if the element isn't indexed
+        :rtype: FormInfo
+        """
+        return self._by_element.get(form)
+
+    def __getitem__(self, position):
+        return self.forms[position]
+
+    def __len__(self):
+        return len(self.forms)
+
+    def __iter__(self):
+        return iter(self.forms)
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if not isinstance(value, six.string_types):
+        value = six.text_type(value)
+    return value.encode('utf-8')
+
+
+def _quote(value):
+    """Escape a name or filename of a Content-Disposition header, like browsers do
+
+    :rtype: bytes
+    """
+    value = _to_bytes(value)
+    return value.replace(b'\r', b'%0D').replace(b'\n', b'%0A').replace(b'"', b'%22')
+
+
+class MultipartStream(io.RawIOBase):
+
+    """A multipart/form-data body, read chunk by chunk
+
+    The length of the body is known in advance, so requests sends it with a Content-Length header. Files given by
+    path are only opened when the stream reaches them, and closed once read. The stream can be rewound with
+    ``seek(0)``, for example to send it again after a redirection
+
+    A file is a path, a file object, a ``(filename, path or file object[, content type])`` tuple or None for an empty
+    file field
+
+    :param fields: the ``(name, value)`` pairs of the fields
+    :type fields: list
+    :param files: the ``(name, file)`` pairs of the file fields
+    :type files: list
+    :param boundary: the boundary of the parts, a random one is generated if not set
+    :type boundary: str
+    :param chunk_size: the maximum size of the chunks read from the files
+    :type chunk_size: int
+    """
+
+    def __init__(self, fields=(), files=(), boundary=None, chunk_size=65536):
+        super(MultipartStream, self).__init__()
+        self.boundary = boundary or uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self._segments = []
+        self._starts = {}
+        #: the fields and files of the body, in the HAR postData format
+        self.params = []
+        delimiter = b'--' + _to_bytes(self.boundary) + b'\r\n'
+        for name, value in fields:
+            self.params.append({'name': name, 'value': _to_bytes(value).decode('utf-8')})
+            self._segments.append(delimiter + b'Content-Disposition: form-data; name="' + _quote(name) + b'"\r\n\r\n' +
+                                  _to_bytes(value) + b'\r\n')
+        for name, spec in files:
+            filename, source, content_type = self._file_spec(spec)
+            self.params.append({'name': name, 'fileName': filename, 'contentType': content_type})
+            self._segments.append(delimiter + b'Content-Disposition: form-data; name="' + _quote(name) +
+                                  b'"; filename="' + _quote(filename) + b'"\r\nContent-Type: ' +
+                                  _to_bytes(content_type) + b'\r\n\r\n')
+            if source is not None:
+                self._segments.append(source)
+            self._segments.append(b'\r\n')
+        self._segments.append(b'--' + _to_bytes(self.boundary) + b'--\r\n')
+        self.length = sum(self._size(segment) for segment in self._segments)
+        self._index = 0
+        self._offset = 0
+        self._position = 0
+        self._file = None
+
+    def _file_spec(self, spec):
+        """Return the filename, source and content type of a file field
+
+        :return: a tuple, the source is a path, a file object or None
+        :rtype: tuple
+        """
+        content_type = None
+        if spec is None:
+            return '', None, 'application/octet-stream'
+        if isinstance(spec, tuple):
+            filename, source = spec[:2]
+            if len(spec) > 2:
+                content_type = spec[2]
+        else:
+            source = spec
+            filename = os.path.basename(source if isinstance(source, six.string_types) else
+                                        getattr(source, 'name', None) or '')
+        if not isinstance(source, six.string_types):
+            self._starts[id(source)] = source.tell()
+        content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        return filename, source, content_type
+
+    def _size(self, segment):
+        """Return the size of a segment, without reading files
+
+        :rtype: int
+        """
+        if isinstance(segment, bytes):
+            return len(segment)
+        if isinstance(segment, six.string_types):
+            return os.path.getsize(segment)
+        try:
+            return os.fstat(segment.fileno()).st_size - self._starts[id(segment)]
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            segment.seek(0, os.SEEK_END)
+            size = segment.tell() - self._starts[id(segment)]
+            segment.seek(self._starts[id(segment)])
+            return size
+
+    @property
+    def content_type(self):
+        """The value of the Content-Type header of the body
+
+        :rtype: str
+        """
+        return 'multipart/form-data; boundary={0}'.format(self.boundary)
+
+    def __len__(self):
+        return self.length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """Rewind the stream, only ``seek(0)`` and seeking to the current position are supported
+
+        :return: the new position
+        :rtype: int
+        """
+        if whence == os.SEEK_END:
+            offset += self.length
+        elif whence == os.SEEK_CUR:
+            offset += self._position
+        if offset == self._position:
+            return offset
+        if offset != 0:
+            raise io.UnsupportedOperation('MultipartStream can only be rewound')
+        self._close_file()
+        self._index = self._offset = self._position = 0
+        return 0
+
+    def _close_file(self):
+        if self._file is not None and isinstance(self._segments[self._index], six.string_types):
+            self._file.close()
+        self._file = None
+
+    def _read_segment(self, size):
+        """Read at most size bytes from the current segment
+
+        :rtype: bytes
+        """
+        segment = self._segments[self._index]
+        if isinstance(segment, bytes):
+            data = segment[self._offset:self._offset + size]
+        else:
+            if self._file is None:
+                if isinstance(segment, six.string_types):
+                    self._file = open(segment, 'rb')
+                else:
+                    self._file = segment
+                    segment.seek(self._starts[id(segment)])
+            data = self._file.read(min(size, self.chunk_size))
+        if not data:
+            self._close_file()
+            self._index += 1
+            self._offset = 0
+            return None
+        self._offset += len(data)
+        return data
+
+    def read(self, size=-1):
+        """Read at most size bytes, or all the remaining body if size is negative
+
+        :rtype: bytes
+        """
+        chunks = []
+        remaining = size if size is not None and size >= 0 else self.length - self._position
+        while remaining > 0 and self._index < len(self._segments):
+            data = self._read_segment(remaining)
+            if data is None:
+                continue
+            chunks.append(data)
+            remaining -= len(data)
+            self._position += len(data)
+            if size is not None and size >= 0:
+                # short reads, one segment at a time
+                break
+        return b''.join(chunks)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._close_file()
+        super(MultipartStream, self).close()
@@ -0,0 +1,529 @@
+"""This file contain the record and replay of browser scenarios, with the HAR format
+
+A ``HarRecorder`` given to the browser records each action (``open_url``, ``follow_link``, ``get_form``,
+``submit_form``, ``back``, ``forward``, ``refresh``) with the requests and responses it made, and exports them as a
+HAR 1.2 log. The actions are stored in the ``_actions`` field of the log.
+
+A ``Replayer`` runs a recorded scenario again, or the requests of a HAR captured by a real browser, as fast as
+possible or at the recorded pace. Dynamic values, like csrf tokens, are extracted from the replayed responses
+"""
+
+import calendar
+import json
+import re
+import time
+from contextlib import contextmanager
+
+import six
+from six.moves.urllib.parse import urlsplit, parse_qsl, urlencode
+
+from octbrowser import __version__
+from octbrowser.browser import Browser
+from octbrowser.forms import FormIndex, MultipartStream
+from octbrowser.selector_cache import default_cache
+
+HAR_VERSION = '1.2'
+
+#: request headers not replayed, they are set by the session
+SKIPPED_HEADERS = frozenset(['host', 'content-length', 'cookie', 'connection', 'accept-encoding'])
+
+PLACEHOLDER_RE = re.compile(r'{{\s*(\w+)\s*}}')
+DATETIME_RE = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d+))?(Z|[+-]\d\d:?\d\d)?')
+
+
+def format_time(timestamp):
+    """Return the ISO 8601 representation of a timestamp, in UTC
+
+    :param timestamp: the timestamp
+    :type timestamp: float
+    :rtype: str
+    """
+    millis = int(round((timestamp % 1) * 1000)) % 1000
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(timestamp)) + '.{0:03d}Z'.format(millis)
+
+
+def parse_time(value):
+    """Return the timestamp of an ISO 8601 date, like the startedDateTime of HAR entries
+
+    Raise:
+        ValueError
+
+    :param value: the date
+    :type value: str
+    :rtype: float
+    """
+    match = DATETIME_RE.match(value)
+    if match is None:
+        raise ValueError('Invalid date {0!r}'.format(value))
+    fields = [int(v) for v in match.groups()[:6]]
+    timestamp = calendar.timegm(fields) + float('0.' + (match.group(7) or '0'))
+    zone = match.group(8)
+    if zone and zone != 'Z':
+        zone = zone.replace(':', '')
+        offset = int(zone[1:3]) * 3600 + int(zone[3:5]) * 60
+        timestamp -= offset if zone[0] == '+' else -offset
+    return timestamp
+
+
+def load_har(path):
+    """Read a HAR file
+
+    :param path: the path of the file
+    :type path: str
+    :return: the HAR log
+    :rtype: dict
+    """
+    with open(path, 'rb') as f:
+        return json.loads(f.read().decode('utf-8'))
+
+
+def _text(body):
+    if isinstance(body, bytes):
+        return body.decode('utf-8', 'replace')
+    return body
+
+
+def _json_value(value):
+    """Return a value that can be written in a json document
+
+    Sets become sorted lists and files their path or name
+    """
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, tuple):
+        return _json_value(value[0])
+    if isinstance(value, dict):
+        return dict((k, _json_value(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_json_value(v) for v in value]
+    if value is None or isinstance(value, (six.string_types, bool, int, float)):
+        return value
+    return getattr(value, 'name', None) or six.text_type(value)
+
+
+class HarRecorder(object):
+
+    """Record the actions of a browser and the requests they made
+
+    Give the recorder to the browser with the ``recorder`` argument. Bodies of the responses are only kept with
+    ``content`` set, up to ``max_content_size`` bytes each
+
+    :param content: if True, the text of the responses is recorded
+    :type content: bool
+    :param max_content_size: the maximum size of a recorded body
+    :type max_content_size: int
+    """
+
+    def __init__(self, content=False, max_content_size=1024 * 1024):
+        self.content = content
+        self.max_content_size = max_content_size
+        self.actions = []
+        self.entries = []
+        self.pages = []
+        self._depth = 0
+
+    @contextmanager
+    def action(self, method, **args):
+        """Record an action, the requests sent until the end of the block belong to it
+
+        Nested actions, like the ``open_url`` of a ``follow_link``, are part of the outermost action. Actions raising
+        an exception without sending any request are not recorded
+
+        :param method: the name of the browser method
+        :type method: str
+        """
+        action = None
+        if self._depth == 0:
+            action = {'action': method, 'args': _json_value(args), 'started': format_time(time.time()),
+                      'entries': []}
+            self.actions.append(action)
+        self._depth += 1
+        try:
+            yield
+        except Exception:
+            if action is not None and not action['entries']:
+                self.actions.remove(action)
+            raise
+        finally:
+            self._depth -= 1
+
+    def add_response(self, response):
+        """Record a response and its redirections
+
+        :param response: the response, with its timing
+        :type response: requests.Response
+        :return: None
+        """
+        timing = getattr(response, 'timing', None)
+        started = timing.started if timing is not None else time.time()
+        page_id = 'page_{0}'.format(len(self.pages) + 1)
+        self.pages.append({'startedDateTime': format_time(started), 'id': page_id, 'title': response.url,
+                           'pageTimings': {'onContentLoad': -1,
+                                           'onLoad': round(timing.total * 1000, 3) if timing is not None else -1}})
+        for hop in list(getattr(response, 'history', None) or []) + [response]:
+            entry = self._entry(hop, started, page_id, timing if hop is response else None)
+            started += entry['time'] / 1000.0
+            if self.actions and self._depth:
+                self.actions[-1]['entries'].append(len(self.entries))
+            self.entries.append(entry)
+
+    def _entry(self, response, started, page_id, timing=None):
+        """Build the HAR entry of a response
+
+        :return: the entry
+        :rtype: dict
+        """
+        request = response.request
+        acquire = getattr(response, 'acquire_time', None)
+        connect = getattr(response, 'connect_time', None)
+        elapsed = response.elapsed.total_seconds() if getattr(response, 'elapsed', None) is not None else 0.0
+        timings = {
+            'blocked': round(acquire * 1000, 3) if acquire is not None else -1,
+            'dns': -1,
+            'connect': round(connect * 1000, 3) if connect is not None else -1,
+            'ssl': -1,
+            'send': 0,
+            'wait': round(max(elapsed - (acquire or 0.0) - (connect or 0.0), 0.0) * 1000, 3),
+            'receive': round(timing.download * 1000, 3) if timing is not None else 0,
+        }
+        content = response.content or b''
+        headers = response.headers or {}
+        response_content = {'size': len(content), 'mimeType': headers.get('Content-Type', '')}
+        if self.content and len(content) <= self.max_content_size:
+            response_content['text'] = _text(content)
+        raw_version = getattr(getattr(response, 'raw', None), 'version', 11)
+        entry = {
+            'pageref': page_id,
+            'startedDateTime': format_time(started),
+            'time': sum(v for v in timings.values() if v > 0),
+            'request': {
+                'method': request.method,
+                'url': request.url,
+                'httpVersion': 'HTTP/1.0' if raw_version == 10 else 'HTTP/1.1',
+                'cookies': [],
+                'headers': [{'name': k, 'value': v} for k, v in request.headers.items()],
+                'queryString': [{'name': k, 'value': v}
+                                for k, v in parse_qsl(urlsplit(request.url).query, keep_blank_values=True)],
+                'headersSize': -1,
+                'bodySize': -1,
+            },
+            'response': {
+                'status': response.status_code,
+                'statusText': response.reason or '',
+                'httpVersion': 'HTTP/1.0' if raw_version == 10 else 'HTTP/1.1',
+                'cookies': [],
+                'headers': [{'name': k, 'value': v} for k, v in headers.items()],
+                'content': response_content,
+                'redirectURL': headers.get('Location', ''),
+                'headersSize': -1,
+                'bodySize': len(content),
+            },
+            'cache': {},
+            'timings': timings,
+        }
+        if timing is not None:
+            entry['_browser'] = {'parse': round(timing.parse * 1000, 3),
+                                 'absolutize': round(timing.absolutize * 1000, 3),
+                                 'history': round(timing.history * 1000, 3),
+                                 'total': round(timing.total * 1000, 3)}
+        post_data = self._post_data(request)
+        if post_data is not None:
+            entry['request']['postData'] = post_data
+            entry['request']['bodySize'] = len(request.body) if not isinstance(request.body, MultipartStream) else -1
+        return entry
+
+    def _post_data(self, request):
+        """Build the postData of a request, None if the request has no body
+
+        :rtype: dict
+        """
+        body = request.body
+        if not body:
+            return None
+        mime_type = request.headers.get('Content-Type', '')
+        if isinstance(body, MultipartStream):
+            return {'mimeType': mime_type, 'params': body.params, 'text': ''}
+        text = _text(body)
+        post_data = {'mimeType': mime_type, 'text': text}
+        if mime_type.startswith('application/x-www-form-urlencoded'):
+            post_data['params'] = [{'name': k, 'value': v} for k, v in parse_qsl(text, keep_blank_values=True)]
+        return post_data
+
+    def to_har(self):
+        """Return the recorded scenario as a HAR log
+
+        :rtype: dict
+        """
+        return {'log': {
+            'version': HAR_VERSION,
+            'creator': {'name': 'octbrowser', 'version': __version__},
+            'pages': list(self.pages),
+            'entries': list(self.entries),
+            '_actions': list(self.actions),
+        }}
+
+    def save(self, path):
+        """Write the HAR log to a file
+
+        :param path: the path of the file
+        :type path: str
+        :return: None
+        """
+        with open(path, 'wb') as f:
+            f.write(json.dumps(self.to_har(), indent=2).encode('utf-8'))
+
+    def clear(self):
+        """Remove all recorded actions and entries
+
+        :return: None
+        """
+        self.actions = []
+        self.entries = []
+        self.pages = []
+
+
+class ReplayResult(object):
+
+    """The result of a replayed action or request
+
+    Times are in milliseconds
+
+    :param name: the action, or the method and url of the request
+    :type name: str
+    :param response: the response, None for actions without request
+    :type response: requests.Response
+    :param expected_status: the recorded status, None if unknown
+    :type expected_status: int
+    :param recorded_time: the recorded time
+    :type recorded_time: float
+    :param time: the replay time
+    :type time: float
+    """
+
+    __slots__ = ('name', 'response', 'expected_status', 'recorded_time', 'time')
+
+    def __init__(self, name, response=None, expected_status=None, recorded_time=None, time=0.0):
+        self.name = name
+        self.response = response
+        self.expected_status = expected_status
+        self.recorded_time = recorded_time
+        self.time = time
+
+    @property
+    def status_code(self):
+        """The status of the replayed response, None for actions without request
+
+        :rtype: int
+        """
+        return self.response.status_code if self.response is not None else None
+
+    @property
+    def ok(self):
+        """True if the replay gave the recorded status
+
+        :rtype: bool
+        """
+        return self.expected_status is None or self.status_code == self.expected_status
+
+    def __repr__(self):
+        return '<ReplayResult {0} [{1}] {2:.1f}ms>'.format(self.name, self.status_code, self.time)
+
+
+class Replayer(object):
+
+    """Replay a HAR log with a browser
+
+    Logs recorded by a `HarRecorder` are replayed action by action, so forms are taken from the replayed pages with
+    their fresh hidden values and only the fields changed by the recorded scenario are set. Other logs are replayed
+    request by request, redirections included, and the values of the hidden fields of the replayed html pages
+    replace the recorded values of the parameters with the same name.
+
+    ``extractors`` give other dynamic values, as a dict of ``name: extractor`` where the extractor is a regex (the
+    first group of its first match in the body), a ``(css selector, attribute)`` tuple or a callable taking the
+    response. Extracted values replace the parameters and form fields with the same name, and the ``{{name}}``
+    placeholders in urls, form values and bodies.
+
+    :param har: the HAR log or the path of a HAR file
+    :type har: dict
+    :param browser: the browser used for the replay, a new one is created with the other keyword arguments if not set
+    :type browser: octbrowser.browser.Browser
+    :param extractors: the dynamic values extractors
+    :type extractors: dict
+    :param speed: None for replaying as fast as possible, or a factor of the recorded pace (1.0 is the recorded pace)
+    :type speed: float
+    :param url_regex: for logs without actions, only replay the requests whose url match this regex
+    :type url_regex: str
+    """
+
+    def __init__(self, har, browser=None, extractors=None, speed=None, url_regex=None, **kwargs):
+        if isinstance(har, six.string_types):
+            har = load_har(har)
+        self.log = har.get('log', har)
+        self.browser = browser or Browser(**kwargs)
+        self.extractors = extractors or {}
+        self.speed = speed
+        self.url_regex = re.compile(url_regex) if url_regex else None
+        self.variables = {}
+
+    def _extract(self, response):
+        """Update the variables with the values extracted from a response
+
+        :return: None
+        """
+        if response is None:
+            return
+        html = getattr(response, 'html', None)
+        if html is not None and not self.log.get('_actions'):
+            for info in FormIndex(html):
+                self.variables.update((k, v) for k, v in info.hidden.items() if v is not None)
+        for name, extractor in self.extractors.items():
+            value = None
+            if callable(extractor):
+                value = extractor(response)
+            elif isinstance(extractor, tuple):
+                if html is not None:
+                    elements = default_cache.select(html, extractor[0], 'html')
+                    value = elements[0].get(extractor[1]) if elements else None
+            else:
+                match = re.search(extractor, response.text)
+                value = match.group(1) if match else None
+            if value is not None:
+                self.variables[name] = value
+
+    def substitute(self, value):
+        """Replace the ``{{name}}`` placeholders of a string by the values of the variables
+
+        :param value: the string
+        :type value: str
+        :rtype: str
+        """
+        if not isinstance(value, six.string_types):
+            return value
+        return PLACEHOLDER_RE.sub(lambda m: six.text_type(self.variables.get(m.group(1), m.group(0))), value)
+
+    def _wait(self, started, first, recorded):
+        """Sleep until the recorded offset of a step, scaled by the speed
+
+        :return: None
+        """
+        if self.speed is None or recorded is None or first is None:
+            return
+        delay = (recorded - first) / self.speed - (time.time() - started)
+        if delay > 0:
+            time.sleep(delay)
+
+    def run(self):
+        """Replay the log
+
+        :return: the results, one per action or request
+        :rtype: list
+        """
+        if self.log.get('_actions'):
+            return self._replay_actions(self.log['_actions'])
+        return self._replay_entries(self.log.get('entries', []))
+
+    def _replay_actions(self, actions):
+        entries = self.log.get('entries', [])
+        results = []
+        started = time.time()
+        first = parse_time(actions[0]['started']) if actions and actions[0].get('started') else None
+        for action in actions:
+            name, args = action['action'], action.get('args', {})
+            self._wait(started, first, parse_time(action['started']) if action.get('started') else None)
+            recorded = [entries[i] for i in action.get('entries', []) if i < len(entries)]
+            start = time.time()
+            response = self._run_action(name, args)
+            self._extract(response)
+            results.append(ReplayResult(
+                name, response, recorded[-1]['response']['status'] if recorded else None,
+                sum(e.get('time', 0) for e in recorded) if recorded else None, (time.time() - start) * 1000))
+        return results
+
+    def _run_action(self, name, args):
+        """Call the browser method of an action
+
+        :return: the response, None for get_form
+        """
+        browser = self.browser
+        if name == 'open_url':
+            data = args.get('data')
+            if isinstance(data, dict):
+                data = dict((k, self.variables.get(k, self.substitute(v))) for k, v in data.items())
+            return browser.open_url(self.substitute(args['url']), data=data, transaction=args.get('transaction'))
+        if name == 'follow_link':
+            return browser.follow_link(args['selector'], args.get('url_regex'), transaction=args.get('transaction'))
+        if name == 'get_form':
+            browser.get_form(args.get('selector'), args.get('nr', 0), args.get('at_base', False), args.get('name'),
+                             args.get('action'))
+            for key in browser.form_data:
+                if key in self.variables:
+                    browser.form_data[key] = self.variables[key]
+            return None
+        if name == 'submit_form':
+            for key, value in args.get('changes', {}).items():
+                if isinstance(value, list):
+                    value = set(value)
+                browser.form_data[key] = self.variables.get(key, self.substitute(value))
+            return browser.submit_form(transaction=args.get('transaction'))
+        if name == 'refresh':
+            return browser.refresh(transaction=args.get('transaction'))
+        if name in ('back', 'forward'):
+            getattr(browser, name)()
+            return None
+        raise ValueError('Unknown action {0!r}'.format(name))
+
+    def _replay_entries(self, entries):
+        results = []
+        started = time.time()
+        first = None
+        for entry in entries:
+            request = entry['request']
+            url = self._entry_url(request)
+            if self.url_regex is not None and not self.url_regex.match(url):
+                continue
+            recorded = parse_time(entry['startedDateTime']) if entry.get('startedDateTime') else None
+            if first is None:
+                first = recorded
+            self._wait(started, first, recorded)
+            start = time.time()
+            response = self._send_entry(request, url)
+            self._extract(response)
+            results.append(ReplayResult('{0} {1}'.format(request['method'], url), response,
+                                        entry.get('response', {}).get('status'), entry.get('time'),
+                                        (time.time() - start) * 1000))
+        return results
+
+    def _entry_url(self, request):
+        """Return the url of a recorded request, with the current values of its query parameters
+
+        :rtype: str
+        """
+        url = self.substitute(request['url'])
+        params = request.get('queryString') or []
+        if params and any(p['name'] in self.variables for p in params):
+            query = urlencode([(p['name'], self.variables.get(p['name'], p['value'])) for p in params])
+            url = url.split('?', 1)[0] + '?' + query
+        return url
+
+    def _send_entry(self, request, url):
+        """Send a recorded request with the browser
+
+        :return: the response
+        :rtype: requests.Response
+        """
+        headers = dict((h['name'], self.substitute(h['value'])) for h in request.get('headers', [])
+                       if h['name'].lower() not in SKIPPED_HEADERS and not h['name'].startswith(':'))
+        post_data = request.get('postData')
+        data = None
+        if post_data:
+            params = post_data.get('params')
+            if params and post_data.get('mimeType', '').startswith('application/x-www-form-urlencoded'):
+                data = [(p['name'], self.variables.get(p['name'], self.substitute(p.get('value', ''))))
+                        for p in params]
+            else:
+                data = self.substitute(post_data.get('text', '')).encode('utf-8')
+        method = request['method'].upper()
+        if method == 'GET' or (method == 'POST' and data):
+            return self.browser.open_url(url, data=data, headers=headers, allow_redirects=False)
+        # other methods don't open a page
+        return self.browser.session.request(method, url, data=data, headers=headers, allow_redirects=False)
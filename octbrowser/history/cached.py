@@ -4,26 +4,63 @@ All history management are present here
 """
 
 import requests
-from octbrowser.exceptions import EndOfHistory, NoPreviousPage
+from octbrowser.exceptions import EndOfHistory, NoPreviousPage, HistoryIsEmpty
 from octbrowser.history.base import BaseHistory
+from octbrowser.history.record import HistoryRecord
 from collections import deque
 
 
 class CachedHistory(BaseHistory):
 
     """A browser hisory that caches the history items
+
+    In compact mode, responses are stored as ``HistoryRecord`` objects with a compressed body, and rebuilt only when
+    the history reaches them. The html of rebuilt responses is parsed again by the browser.
     """
 
-    def __init__(self, maxlen=None):
+    def __init__(self, maxlen=None, max_bytes=None, compact=False):
         """Initialize CachedHistory object
 
         :param maxlen: the max len of history items to cache
         :type maxlen: int or None
+        :param max_bytes: the max size of cached items, oldest items are dropped when the budget is exceeded
+        :type max_bytes: int or None
+        :param compact: if set to True, store compact records instead of full responses
+        :type compact: bool
         :return: None
         """
         self.current = 0
         self.history = deque(maxlen=maxlen)
         self._maxlen = maxlen
+        self.max_bytes = max_bytes
+        self.compact = compact
+        self.size = 0
+
+    @staticmethod
+    def _item_size(item):
+        """Return the approximate size of an history item
+
+        :param item: the history item
+        :type item: requests.Response or octbrowser.history.record.HistoryRecord
+        :return: the size in bytes
+        :rtype: int
+        """
+        if isinstance(item, HistoryRecord):
+            return item.size
+        return len(item.content or b'')
+
+    @staticmethod
+    def _load(item):
+        """Return the response represented by an history item
+
+        :param item: the history item
+        :type item: requests.Response or octbrowser.history.record.HistoryRecord
+        :return: the response
+        :rtype: requests.Response
+        """
+        if isinstance(item, HistoryRecord):
+            return item.to_response()
+        return item
 
     def append_item(self, item):
         """Add a new item to the history
@@ -36,11 +73,31 @@ class CachedHistory(BaseHistory):
         # Remove all items in front of the current item
         if self.current < (len(self.history) - 1):
             for i in range(len(self.history) - 1 - self.current):
-                self.history.pop()  # deque doesn't support slicing
+                self.size -= self._item_size(self.history.pop())  # deque doesn't support slicing
+        if self._maxlen is not None and len(self.history) == self._maxlen:
+            self.size -= self._item_size(self.history.popleft())
         # Append the new item
+        if self.compact:
+            item = HistoryRecord.from_response(item)
         self.history.append(item)
+        self.size += self._item_size(item)
+        # Drop oldest items until we fit in the budget, the new item is always kept
+        if self.max_bytes is not None:
+            while self.size > self.max_bytes and len(self.history) > 1:
+                self.size -= self._item_size(self.history.popleft())
         self.current = len(self.history) - 1
 
+    def get_current_item(self):
+        """Simply return the current item
+
+        :return: the current item
+        :rtype: requests.Response
+        """
+        try:
+            return self._load(self.history[self.current])
+        except IndexError:
+            raise HistoryIsEmpty()
+
     def forward(self):
         """Return the next element in comparision with the current element
         If the history doesn't have a next element, the method will raise an ``EndOfHistory`` exception
@@ -54,7 +111,7 @@ class CachedHistory(BaseHistory):
             self.current += 1
         except IndexError:
             raise EndOfHistory()
-        return item
+        return self._load(item)
 
     def back(self):
         """Return the previous element in comparision with the current element
@@ -71,7 +128,7 @@ class CachedHistory(BaseHistory):
             self.current -= 1
         except IndexError:
             raise NoPreviousPage()
-        return item
+        return self._load(item)
 
     def clear_history(self):
         """Delete the current history and re initialise all values
@@ -79,3 +136,4 @@ class CachedHistory(BaseHistory):
         del self.history
         self.history = deque(maxlen=self._maxlen)
         self.current = 0
+        self.size = 0
@@ -0,0 +1,221 @@
+"""This file contain the class for the disk backed history of the browser
+
+Items are stored in a sqlite database, only a small window of responses around the current item is kept in memory
+"""
+
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.hooks import default_hooks
+
+from octbrowser.exceptions import EndOfHistory, NoPreviousPage, HistoryIsEmpty
+from octbrowser.history.base import BaseHistory
+from octbrowser.history.record import HistoryRecord
+
+
+class DiskHistorySequence(object):
+
+    """Read only sequence view of the items stored by a ``DiskHistory``
+
+    :param history: the disk history
+    :type history: DiskHistory
+    """
+
+    def __init__(self, history):
+        self._history = history
+
+    def __len__(self):
+        return self._history.length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return self._history._get(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._history._get(index)
+
+
+class DiskHistory(BaseHistory):
+
+    """A browser history storing its items on disk
+
+    Responses are stored as compact records in a sqlite database. The responses around the current item (the hot
+    window) are kept in memory, with their parsed html, so going back and forward stays fast.
+
+    The database is a scratch file, not a persistent store: it's written without syncing to the disk, and the
+    ``history`` table of an existing database given with ``path`` is emptied when the history is created.
+
+    :param path: the path of the sqlite database. If not set, a temporary file is used and removed by ``close``
+    :type path: str
+    :param hot_window: the number of responses kept in memory before and after the current item
+    :type hot_window: int
+    """
+
+    def __init__(self, path=None, hot_window=1):
+        self._temporary = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='octbrowser-history-', suffix='.sqlite')
+            os.close(fd)
+        self.path = path
+        self.hot_window = hot_window
+        self._lock = threading.RLock()
+        self._hot = OrderedDict()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # the history is emptied on creation, durability would only cost a sync of the file on each page
+        self._db.execute('PRAGMA synchronous = OFF')
+        self._db.execute('PRAGMA journal_mode = MEMORY')
+        self._db.execute('CREATE TABLE IF NOT EXISTS history (position INTEGER PRIMARY KEY, record BLOB)')
+        self._db.execute('DELETE FROM history')
+        self._db.commit()
+        self.current = 0
+        self.length = 0
+        self.history = DiskHistorySequence(self)
+
+    @staticmethod
+    def _dump(response):
+        """Serialize a response as a compact record
+
+        :param response: the response to store
+        :type response: requests.Response
+        :return: the serialized record
+        :rtype: bytes
+        """
+        record = HistoryRecord.from_response(response)
+        if record.request is not None:
+            # hooks may contain functions that can't be pickled
+            record.request = record.request.copy()
+            record.request.hooks = default_hooks()
+        return pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+
+    def _get(self, position):
+        """Return the response stored at the given position
+
+        :param position: the position of the item
+        :type position: int
+        :return: the response
+        :rtype: requests.Response
+        :raises: IndexError
+        """
+        with self._lock:
+            if position in self._hot:
+                return self._hot[position]
+            row = self._db.execute('SELECT record FROM history WHERE position = ?', (position,)).fetchone()
+            if row is None:
+                raise IndexError(position)
+            return pickle.loads(bytes(row[0])).to_response()
+
+    def _move_to(self, position):
+        """Set the current position, keep its response in the hot window and return it
+
+        :param position: the new current position
+        :type position: int
+        :return: the response at this position
+        :rtype: requests.Response
+        """
+        response = self._get(position)
+        self.current = position
+        self._hot[position] = response
+        self._trim_hot_window()
+        return response
+
+    def _trim_hot_window(self):
+        """Drop responses outside of the hot window from memory
+
+        :return: None
+        """
+        for position in list(self._hot):
+            if abs(position - self.current) > self.hot_window:
+                del self._hot[position]
+
+    def append_item(self, item):
+        """Add a new item to the history
+
+        :param item: the item to add in the history list
+        :type item: requests.Response
+        :return: None
+        """
+        assert isinstance(item, requests.Response)
+        with self._lock:
+            # Remove all items in front of the current item
+            if self.current < self.length - 1:
+                self._db.execute('DELETE FROM history WHERE position > ?', (self.current,))
+                for position in list(self._hot):
+                    if position > self.current:
+                        del self._hot[position]
+                self.length = self.current + 1
+            self._db.execute('INSERT INTO history (position, record) VALUES (?, ?)',
+                             (self.length, sqlite3.Binary(self._dump(item))))
+            self._db.commit()
+            self.current = self.length
+            self.length += 1
+            self._hot[self.current] = item
+            self._trim_hot_window()
+
+    def get_current_item(self):
+        """Simply return the current item
+
+        :return: the current item
+        :rtype: requests.Response
+        """
+        try:
+            return self._get(self.current)
+        except IndexError:
+            raise HistoryIsEmpty()
+
+    def forward(self):
+        """Return the next element in comparision with the current element
+        If the history doesn't have a next element, the method will raise an ``EndOfHistory`` exception
+
+        :return: the next element
+        :rtype: requests.Response
+        :raises: EndOfHistory
+        """
+        with self._lock:
+            try:
+                return self._move_to(self.current + 1)
+            except IndexError:
+                raise EndOfHistory()
+
+    def back(self):
+        """Return the previous element in comparision with the current element
+        If the history doesn't have a previous element, the method must raise an ``NoPreviousPage`` exception
+
+        :return: the previous element
+        :rtype: requests.Response
+        :raises: NoPreviousPage
+        """
+        with self._lock:
+            if self.current == 0:
+                raise NoPreviousPage()
+            try:
+                return self._move_to(self.current - 1)
+            except IndexError:
+                raise NoPreviousPage()
+
+    def clear_history(self):
+        """Delete the current history and re initialise all values
+        """
+        with self._lock:
+            self._db.execute('DELETE FROM history')
+            self._db.commit()
+            self._hot.clear()
+            self.current = 0
+            self.length = 0
+
+    def close(self):
+        """Close the database, and remove it if it's a temporary file
+
+        :return: None
+        """
+        with self._lock:
+            self._hot.clear()
+            self._db.close()
+            if self._temporary and os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,104 @@
+"""This file contain the compact history record
+
+A record keeps only what is needed for rebuilding a response (url, status, headers and compressed body), without
+the raw connection objects and the parsed html
+"""
+
+import zlib
+from datetime import timedelta
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class HistoryRecord(object):
+
+    """A compact representation of a requests.Response stored in the history
+
+    :param url: the url of the response
+    :type url: str
+    :param status_code: the status code of the response
+    :type status_code: int
+    :param reason: the reason phrase of the response
+    :type reason: str
+    :param headers: the headers of the response
+    :type headers: dict
+    :param body: the zlib compressed content of the response
+    :type body: bytes
+    :param encoding: the encoding of the response
+    :type encoding: str
+    :param request: the request that generated the response, needed for refreshing the page
+    :type request: requests.PreparedRequest
+    :param elapsed: the elapsed time of the request, in seconds
+    :type elapsed: float
+    """
+
+    __slots__ = ('url', 'status_code', 'reason', 'headers', 'body', 'encoding', 'request', 'elapsed', 'size')
+
+    #: zlib compression level used for bodies, favour speed over ratio
+    compress_level = 1
+
+    def __init__(self, url, status_code, reason, headers, body, encoding=None, request=None, elapsed=0.0):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.encoding = encoding
+        self.request = request
+        self.elapsed = elapsed
+        self.size = self._compute_size()
+
+    def __getstate__(self):
+        return dict((slot, getattr(self, slot)) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    def _compute_size(self):
+        """Approximate the memory used by the record
+
+        :return: the size in bytes
+        :rtype: int
+        """
+        size = len(self.body) + len(self.url or '')
+        for name, value in self.headers.items():
+            size += len(name) + len(value)
+        if self.request is not None and self.request.body is not None:
+            size += len(self.request.body)
+        return size
+
+    @classmethod
+    def from_response(cls, response):
+        """Build a record from a response
+
+        :param response: the response to store
+        :type response: requests.Response
+        :return: the record
+        :rtype: HistoryRecord
+        """
+        elapsed = response.elapsed.total_seconds() if response.elapsed is not None else 0.0
+        return cls(response.url, response.status_code, response.reason, dict(response.headers),
+                   zlib.compress(response.content or b'', cls.compress_level), response.encoding,
+                   response.request, elapsed)
+
+    def to_response(self):
+        """Rebuild a response from the record. The html property isn't set, the browser will parse it again
+
+        :return: the rebuilt response
+        :rtype: requests.Response
+        """
+        response = requests.Response()
+        response.url = self.url
+        response.status_code = self.status_code
+        response.reason = self.reason
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        response.request = self.request
+        response.elapsed = timedelta(seconds=self.elapsed)
+        response._content = zlib.decompress(self.body)
+        return response
+
+    def __repr__(self):
+        return '<HistoryRecord {0} [{1}]>'.format(self.url, self.status_code)
@@ -0,0 +1,422 @@
+"""This file contain the multi process load driver
+
+Parsing pages holds the GIL, so one python process can't use more than one core. The load driver runs virtual users
+in a pool of worker processes, each worker running its users in threads with a `octbrowser.pool.BrowserPool`, and
+streams the latency histograms of each transaction back to the parent process
+"""
+
+import argparse
+import importlib
+import multiprocessing
+import signal
+import sys
+import threading
+import time
+import traceback
+
+from six.moves import queue
+
+from octbrowser.metrics import Metrics
+from octbrowser.pool import BrowserPool
+
+#: name of the transaction recording the time of whole script iterations
+ITERATION = 'iteration'
+
+
+class WorkerStats(object):
+
+    """Counters of a worker process, sent to the parent with the metrics of each interval
+
+    :param worker: the index of the worker
+    :type worker: int
+    """
+
+    __slots__ = ('worker', 'users', 'iterations', 'errors')
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.users = 0
+        self.iterations = 0
+        self.errors = {}
+
+    def add_error(self, error):
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class Worker(object):
+
+    """The virtual users of one worker process
+
+    :param index: the index of the worker
+    :type index: int
+    :param script: the script of the virtual users, called with a browser and the user number
+    :type script: callable
+    :param users: the numbers of the users run by this worker
+    :type users: list
+    :param settings: the settings of the load test, see `LoadDriver`
+    :type settings: dict
+    :param results: the queue of the results
+    :type results: multiprocessing.Queue
+    :param stop_event: the event set for stopping the users
+    :type stop_event: multiprocessing.Event
+    """
+
+    def __init__(self, index, script, users, settings, results, stop_event):
+        self.index = index
+        self.script = script
+        self.users = users
+        self.settings = settings
+        self.results = results
+        self.stop_event = stop_event
+        self.metrics = Metrics(**settings['metrics'])
+        self.stats = WorkerStats(index)
+        self._lock = threading.Lock()
+
+    def run(self):
+        """Run the users until the end of the test and report the results at each interval
+
+        :return: None
+        """
+        settings = self.settings
+        pool = BrowserPool(size=len(self.users), metrics=self.metrics, **settings['browser'])
+        threads = [threading.Thread(target=self.run_user, args=(pool, user)) for user in self.users]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        next_report = time.time() + settings['report_interval']
+        try:
+            while threads:
+                threads[0].join(max(next_report - time.time(), 0))
+                threads = [thread for thread in threads if thread.is_alive()]
+                if time.time() >= next_report:
+                    self.report()
+                    next_report += settings['report_interval']
+        finally:
+            self.report()
+            pool.close()
+
+    def report(self):
+        """Send the metrics and counters of the last interval to the parent
+
+        :return: None
+        """
+        with self._lock:
+            stats, self.stats = self.stats, WorkerStats(self.index)
+        self.results.put(('report', self.index, (self.metrics.drain(), stats)))
+
+    def run_user(self, pool, user):
+        """Run the script of a user in a loop, until the end of the test
+
+        :param pool: the browser pool of the worker
+        :type pool: octbrowser.pool.BrowserPool
+        :param user: the number of the user
+        :type user: int
+        :return: None
+        """
+        settings = self.settings
+        stop_event = self.stop_event
+        start = settings['start'] + settings['ramp_up'] * user / float(settings['users'])
+        if stop_event.wait(max(start - time.time(), 0)):
+            return
+        deadline = settings['start'] + settings['duration'] if settings['duration'] is not None else None
+        iterations = settings['iterations']
+        with self._lock:
+            self.stats.users += 1
+        browser = pool.acquire()
+        try:
+            done = 0
+            while not stop_event.is_set() and (deadline is None or time.time() < deadline) and \
+                    (iterations is None or done < iterations):
+                started = time.time()
+                try:
+                    self.script(browser, user)
+                except Exception as e:
+                    with self._lock:
+                        self.stats.add_error(e)
+                else:
+                    self.metrics.record(ITERATION, time.time() - started)
+                with self._lock:
+                    self.stats.iterations += 1
+                done += 1
+                if settings['think_time'] and stop_event.wait(settings['think_time']):
+                    break
+        finally:
+            pool.release(browser)
+
+
+def _worker_main(index, script, users, settings, results, stop_event):
+    """Entry point of the worker processes
+
+    :return: None
+    """
+    # the parent handles ctrl-c and stops the workers gracefully
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        Worker(index, script, users, settings, results, stop_event).run()
+    except Exception:
+        results.put(('failed', index, traceback.format_exc()))
+    else:
+        results.put(('done', index, None))
+
+
+class LoadDriver(object):
+
+    """Run virtual users in a pool of processes and aggregate their metrics
+
+    The script is called in a loop for each virtual user, with a browser and the number of the user, until the end of
+    the test. Its requests are recorded by transaction in the `metrics` of the driver (see `octbrowser.metrics`), and
+    each successful call is recorded as an ``iteration`` transaction. The script must be importable by the worker
+    processes, so it must be a module level function :
+
+    .. code-block:: python
+
+        def user(browser, number):
+            browser.open_url('http://localhost/index.html', transaction='home')
+            browser.follow_link('a.product', transaction='product')
+
+        driver = LoadDriver(user, users=200, ramp_up=30, duration=300, base_url='http://localhost')
+        metrics = driver.run()
+
+    Users are started linearly during ``ramp_up`` seconds and spread over the processes. Each process shares one
+    `octbrowser.pool.BrowserPool` between its users, all other keyword arguments are given to the pools. Browsers keep
+    their cookies between the iterations of a user.
+
+    The test ends after ``duration`` seconds, once each user has run ``iterations`` times or when `stop` is called.
+    Stopping is graceful: users finish their current iteration, processes still running ``stop_timeout`` seconds
+    later are terminated. Ctrl-c stops the test the same way.
+
+    :param script: the script of the virtual users, called with a browser and the user number
+    :type script: callable
+    :param users: the number of virtual users
+    :type users: int
+    :param processes: the number of worker processes, default to the number of cores
+    :type processes: int
+    :param ramp_up: the time to start all users, in seconds
+    :type ramp_up: float
+    :param duration: the duration of the test in seconds, None for no limit
+    :type duration: float
+    :param iterations: the number of iterations of each user, None for no limit
+    :type iterations: int
+    :param think_time: the time waited by a user between two iterations, in seconds
+    :type think_time: float
+    :param report_interval: the time between two reports of a worker, in seconds
+    :type report_interval: float
+    :param on_report: a callable called with the driver after each report
+    :type on_report: callable
+    :param stop_timeout: the time given to the workers to stop, in seconds
+    :type stop_timeout: float
+    :param metrics: the arguments of the `octbrowser.metrics.Metrics` objects (``templates``, ``highest``...)
+    :type metrics: dict
+    """
+
+    def __init__(self, script, users=1, processes=None, ramp_up=0, duration=None, iterations=None, think_time=0,
+                 report_interval=1.0, on_report=None, stop_timeout=30, metrics=None, **kwargs):
+        if duration is None and iterations is None:
+            raise ValueError('A duration or a number of iterations is required')
+        self.script = script
+        self.users = users
+        self.processes = max(min(processes or multiprocessing.cpu_count(), users), 1)
+        self.ramp_up = ramp_up
+        self.duration = duration
+        self.iterations = iterations
+        self.think_time = think_time
+        self.report_interval = report_interval
+        self.on_report = on_report
+        self.stop_timeout = stop_timeout
+        self.metrics_settings = metrics or {}
+        self.browser_settings = kwargs
+        self.metrics = Metrics(**self.metrics_settings)
+        self.iteration_count = 0
+        self.errors = {}
+        self.active_users = 0
+        self.failures = {}
+        self.started = None
+        self._stop_event = multiprocessing.Event()
+        self._stopping = None
+
+    def stop(self):
+        """Stop the test gracefully, can be called from another thread or from ``on_report``
+
+        :return: None
+        """
+        if self._stopping is None:
+            self._stopping = time.time()
+        self._stop_event.set()
+
+    def _aggregate(self, metrics, stats):
+        """Add the report of a worker to the results
+
+        :return: None
+        """
+        self.metrics.merge(metrics)
+        self.iteration_count += stats.iterations
+        self.active_users += stats.users
+        for name, count in stats.errors.items():
+            self.errors[name] = self.errors.get(name, 0) + count
+
+    def run(self):
+        """Run the test and wait for its end
+
+        :return: the metrics of all transactions
+        :rtype: octbrowser.metrics.Metrics
+        """
+        results = multiprocessing.Queue()
+        self.started = time.time()
+        settings = {
+            'start': self.started, 'users': self.users, 'ramp_up': self.ramp_up, 'duration': self.duration,
+            'iterations': self.iterations, 'think_time': self.think_time, 'report_interval': self.report_interval,
+            'metrics': self.metrics_settings, 'browser': self.browser_settings,
+        }
+        workers = {}
+        for index in range(self.processes):
+            users = list(range(index, self.users, self.processes))
+            process = multiprocessing.Process(target=_worker_main,
+                                              args=(index, self.script, users, settings, results, self._stop_event))
+            process.daemon = True
+            process.start()
+            workers[index] = process
+        running = set(workers)
+        try:
+            while running:
+                try:
+                    self._collect(results, running, workers)
+                except KeyboardInterrupt:
+                    self.stop()
+                if self._stopping is not None and time.time() - self._stopping > self.stop_timeout:
+                    break
+        finally:
+            for index in running:
+                workers[index].terminate()
+            for process in workers.values():
+                process.join()
+        return self.metrics
+
+    def _collect(self, results, running, workers):
+        """Read the messages of the workers until they all finished
+
+        :return: None
+        """
+        while running:
+            try:
+                self._handle(results.get(timeout=0.5), running)
+            except queue.Empty:
+                dead = [index for index in running if not workers[index].is_alive()]
+                if dead:
+                    # the last messages of a worker can arrive just before its exit
+                    self._drain(results, running)
+                for index in dead:
+                    if index in running:
+                        running.discard(index)
+                        if workers[index].exitcode != 0:
+                            self.failures[index] = 'exit code {0}'.format(workers[index].exitcode)
+                if self._stopping is not None and time.time() - self._stopping > self.stop_timeout:
+                    return
+
+    def _drain(self, results, running):
+        """Handle the messages already in the queue, without waiting
+
+        :return: None
+        """
+        while True:
+            try:
+                self._handle(results.get_nowait(), running)
+            except queue.Empty:
+                return
+
+    def _handle(self, message, running):
+        """Handle a message of a worker
+
+        :param message: a ``(kind, worker index, payload)`` tuple
+        :type message: tuple
+        :param running: the indexes of the running workers
+        :type running: set
+        :return: None
+        """
+        kind, index, payload = message
+        if kind == 'report':
+            self._aggregate(*payload)
+            if self.on_report is not None:
+                self.on_report(self)
+        else:
+            running.discard(index)
+            if kind == 'failed':
+                self.failures[index] = payload
+
+    @property
+    def stats(self):
+        """Test counters
+
+        :return: a dict with ``users`` (started), ``iterations``, ``errors`` (by exception class name), ``failures``
+                 (the workers that failed) and ``elapsed`` keys
+        :rtype: dict
+        """
+        return {'users': self.active_users, 'iterations': self.iteration_count, 'errors': dict(self.errors),
+                'failures': dict(self.failures), 'elapsed': time.time() - self.started if self.started else 0.0}
+
+
+def load_script(path):
+    """Import a script given as ``module:function``
+
+    :param path: the module and the name of the function
+    :type path: str
+    :return: the function
+    :rtype: callable
+    """
+    module, _, name = path.partition(':')
+    return getattr(importlib.import_module(module), name or 'user')
+
+
+def main(argv=None):
+    """Command line entry point : ``python -m octbrowser.load module:function --users 100 --duration 60``
+
+    SIGTERM stops the test gracefully, like ctrl-c
+
+    :return: the exit status
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(description='Run a load test with octbrowser')
+    parser.add_argument('script', help='the virtual user script, as module:function')
+    parser.add_argument('--base-url', default='', help='the base url of the browsers')
+    parser.add_argument('--users', type=int, default=1, help='the number of virtual users')
+    parser.add_argument('--processes', type=int, help='the number of processes, default to the number of cores')
+    parser.add_argument('--ramp-up', type=float, default=0, help='the time to start all users, in seconds')
+    parser.add_argument('--duration', type=float, help='the duration of the test, in seconds')
+    parser.add_argument('--iterations', type=int, help='the number of iterations of each user')
+    parser.add_argument('--think-time', type=float, default=0, help='the time between two iterations, in seconds')
+    args = parser.parse_args(argv)
+    if args.duration is None and args.iterations is None:
+        parser.error('--duration or --iterations is required')
+    sys.path.insert(0, '')
+
+    def progress(driver):
+        stats = driver.stats
+        sys.stderr.write('\r{0:.0f}s users={1} iterations={2} errors={3}'.format(
+            stats['elapsed'], stats['users'], stats['iterations'], sum(stats['errors'].values())))
+
+    driver = LoadDriver(load_script(args.script), users=args.users, processes=args.processes, ramp_up=args.ramp_up,
+                        duration=args.duration, iterations=args.iterations, think_time=args.think_time,
+                        on_report=progress, base_url=args.base_url)
+    signal.signal(signal.SIGTERM, lambda signum, frame: driver.stop())
+    metrics = driver.run()
+    sys.stderr.write('\n')
+    print('{0:<40} {1:>8} {2:>10} {3:>10} {4:>10} {5:>10}'.format('transaction', 'count', 'mean', 'p50', 'p99',
+                                                                  'max'))
+    for name, summary in sorted(metrics.summary().items()):
+        print('{0:<40} {1:>8} {2:>10.4f} {3:>10.4f} {4:>10.4f} {5:>10.4f}'.format(
+            name, summary['count'], summary['mean'], summary['p50'], summary['p99'], summary['max']))
+    stats = driver.stats
+    if stats['errors']:
+        print('errors: {0}'.format(', '.join('{0}={1}'.format(k, v) for k, v in sorted(stats['errors'].items()))))
+    return 1 if stats['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""This file contain the latency metrics of the browser
+
+Latencies are recorded in fixed size log-linear histograms, one per transaction name. Memory doesn't grow with the
+number of requests, and histograms from many browsers, threads or processes can be merged
+"""
+
+import copy
+import math
+import re
+import threading
+import time
+
+from six.moves.urllib.parse import urlparse
+
+#: percentiles given by the summaries
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+
+TEMPLATE_VAR_RE = re.compile(r'{[^}/]*}')
+
+
+class LatencyHistogram(object):
+
+    """A log-linear histogram of latencies
+
+    Values are stored in microseconds. Each power of two is split in ``2 ** (precision_bits - 1)`` linear buckets, so
+    the relative error of the reported values is lower than ``2 ** (1 - precision_bits)`` (0.8% with the default of 8
+    bits). Values bigger than ``highest`` are counted as ``highest``.
+
+    Histograms aren't thread safe, use one per thread and merge them, or use a `Metrics` object.
+
+    :param highest: the highest trackable latency, in seconds
+    :type highest: float
+    :param precision_bits: the number of bits of precision of the buckets
+    :type precision_bits: int
+    """
+
+    def __init__(self, highest=3600, precision_bits=8):
+        self.highest = highest
+        self.precision_bits = precision_bits
+        self._highest_us = int(highest * 1000000)
+        self._sub_count = 1 << precision_bits
+        self._half_count = self._sub_count >> 1
+        exponents = max(self._highest_us.bit_length() - precision_bits, 0)
+        self.counts = [0] * (self._sub_count + exponents * self._half_count)
+        self.reset()
+
+    def reset(self):
+        """Remove all recorded values
+
+        :return: None
+        """
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.count = 0
+        self.samples = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.first = None
+        self.last = None
+
+    def _index(self, value):
+        """Return the bucket index of a value in microseconds
+
+        :param value: the value
+        :type value: int
+        :return: the index of the bucket
+        :rtype: int
+        """
+        if value < self._sub_count:
+            return value
+        exponent = value.bit_length() - self.precision_bits
+        return self._sub_count + (exponent - 1) * self._half_count + (value >> exponent) - self._half_count
+
+    def _bucket_value(self, index):
+        """Return the highest value in microseconds counted by a bucket
+
+        :param index: the index of the bucket
+        :type index: int
+        :return: the value
+        :rtype: int
+        """
+        if index < self._sub_count:
+            return index
+        exponent, sub = divmod(index - self._sub_count, self._half_count)
+        exponent += 1
+        return ((sub + self._half_count + 1) << exponent) - 1
+
+    def record(self, latency, count=1, expected_interval=None):
+        """Record a latency
+
+        If ``expected_interval`` is set, the latency is corrected for coordinated omission: requests that should have
+        been sent while this one was waiting are recorded too, with linearly decreasing latencies
+
+        :param latency: the latency in seconds
+        :type latency: float
+        :param count: the number of times the latency was observed
+        :type count: int
+        :param expected_interval: the expected time between two requests, in seconds
+        :type expected_interval: float
+        :return: None
+        """
+        now = time.time()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.samples += count
+        self._record_value(int(latency * 1000000), count)
+        if expected_interval:
+            interval = int(expected_interval * 1000000)
+            missing = int(latency * 1000000) - interval
+            while interval > 0 and missing >= interval:
+                self._record_value(missing, count)
+                missing -= interval
+
+    def _record_value(self, value, count):
+        value = min(max(value, 0), self._highest_us)
+        self.counts[self._index(value)] += count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percentile):
+        """Return the latency at the given percentile
+
+        :param percentile: the percentile, between 0 and 100
+        :type percentile: float
+        :return: the latency in seconds, None if nothing was recorded
+        :rtype: float
+        """
+        if not self.count:
+            return None
+        target = max(int(math.ceil(self.count * percentile / 100.0)), 1)
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen >= target:
+                return min(max(self._bucket_value(index), self.min), self.max) / 1000000.0
+        return self.max / 1000000.0
+
+    @property
+    def mean(self):
+        """The mean latency in seconds, None if nothing was recorded
+
+        :rtype: float
+        """
+        if not self.count:
+            return None
+        return self.total / float(self.count) / 1000000.0
+
+    @property
+    def throughput(self):
+        """The number of requests per second, between the first and the last record
+
+        :rtype: float
+        """
+        if self.first is None or self.last <= self.first:
+            return 0.0
+        return self.samples / (self.last - self.first)
+
+    def merge(self, other):
+        """Add the values of another histogram to this one
+
+        Raise:
+            ValueError
+
+        :param other: the histogram to merge, with the same highest value and precision
+        :type other: LatencyHistogram
+        :return: this histogram
+        :rtype: LatencyHistogram
+        """
+        if other.highest != self.highest or other.precision_bits != self.precision_bits:
+            raise ValueError('Histograms with different highest value or precision can not be merged')
+        for index, bucket in enumerate(other.counts):
+            if bucket:
+                self.counts[index] += bucket
+        self.count += other.count
+        self.samples += other.samples
+        self.total += other.total
+        for name, pick in (('min', min), ('max', max), ('first', min), ('last', max)):
+            value = getattr(other, name)
+            if value is not None:
+                current = getattr(self, name)
+                setattr(self, name, value if current is None else pick(current, value))
+        return self
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        """Return the main values of the histogram
+
+        :param percentiles: the percentiles to compute
+        :type percentiles: tuple
+        :return: a dict with ``count``, ``throughput``, ``min``, ``mean``, ``max`` keys and a ``pXX`` key per
+                 percentile, latencies are in seconds
+        :rtype: dict
+        """
+        data = {
+            'count': self.samples,
+            'throughput': self.throughput,
+            'min': self.min / 1000000.0 if self.min is not None else None,
+            'mean': self.mean,
+            'max': self.max / 1000000.0 if self.max is not None else None,
+        }
+        for percentile in percentiles:
+            data['p{0:g}'.format(percentile)] = self.percentile(percentile)
+        return data
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return '<LatencyHistogram count={0} p50={1} p99={2}>'.format(self.count, self.percentile(50),
+                                                                    self.percentile(99))
+
+
+def compile_template(template):
+    """Compile an url template like ``/users/{id}/edit`` to a regex matching the paths of the urls
+
+    :param template: the url template, each ``{name}`` part matches a single path segment
+    :type template: str
+    :return: the compiled regex
+    :rtype: re.RegexObject
+    """
+    parts = TEMPLATE_VAR_RE.split(template)
+    return re.compile('^' + '[^/]+'.join(re.escape(part) for part in parts) + '$')
+
+
+class Metrics(object):
+
+    """Thread safe latency histograms, aggregated per transaction name
+
+    Transactions are named by the caller (``transaction`` argument of the browser methods) or by the first url
+    template matching the path of the url. Without matching template, the path of the url is used.
+
+    :param templates: url templates like ``/users/{id}``, used as transaction names
+    :type templates: list
+    :param expected_interval: the expected time between two requests of a browser, in seconds. If set, latencies
+                              are corrected for coordinated omission
+    :type expected_interval: float
+    :param highest: the highest trackable latency, in seconds
+    :type highest: float
+    :param precision_bits: the number of bits of precision of the histograms buckets
+    :type precision_bits: int
+    """
+
+    def __init__(self, templates=None, expected_interval=None, highest=3600, precision_bits=8):
+        self.templates = [(template, compile_template(template)) for template in templates or []]
+        self.expected_interval = expected_interval
+        self.highest = highest
+        self.precision_bits = precision_bits
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def transaction_name(self, url):
+        """Return the transaction name of an url
+
+        :param url: the url
+        :type url: str
+        :return: the first matching template or the path of the url
+        :rtype: str
+        """
+        path = urlparse(url).path or '/'
+        for template, regex in self.templates:
+            if regex.match(path):
+                return template
+        return path
+
+    def _histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = LatencyHistogram(self.highest, self.precision_bits)
+        return histogram
+
+    def record(self, name, latency, expected_interval=None):
+        """Record a latency for a transaction
+
+        :param name: the transaction name
+        :type name: str
+        :param latency: the latency in seconds
+        :type latency: float
+        :param expected_interval: override the ``expected_interval`` of the metrics for this record
+        :type expected_interval: float
+        :return: None
+        """
+        if expected_interval is None:
+            expected_interval = self.expected_interval
+        with self._lock:
+            self._histogram(name).record(latency, expected_interval=expected_interval)
+
+    def record_scheduled(self, name, scheduled, finished=None):
+        """Record the latency of a request sent by an open loop scheduler
+
+        The latency is measured from the time the request was scheduled, not from the time it was actually sent,
+        so the time spent waiting for a free browser is counted (no coordinated omission)
+
+        :param name: the transaction name
+        :type name: str
+        :param scheduled: the timestamp at which the request should have been sent
+        :type scheduled: float
+        :param finished: the timestamp of the end of the request, default to now
+        :type finished: float
+        :return: None
+        """
+        finished = time.time() if finished is None else finished
+        with self._lock:
+            self._histogram(name).record(max(finished - scheduled, 0))
+
+    def histogram(self, name):
+        """Return a copy of the histogram of a transaction
+
+        :param name: the transaction name
+        :type name: str
+        :return: the histogram, empty if the transaction has no records
+        :rtype: LatencyHistogram
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                return LatencyHistogram(self.highest, self.precision_bits)
+            return copy.deepcopy(histogram)
+
+    @property
+    def names(self):
+        """The sorted list of recorded transaction names
+
+        :rtype: list
+        """
+        with self._lock:
+            return sorted(self._histograms)
+
+    def total(self):
+        """Return a histogram merging all transactions
+
+        :return: the merged histogram
+        :rtype: LatencyHistogram
+        """
+        merged = LatencyHistogram(self.highest, self.precision_bits)
+        with self._lock:
+            for histogram in self._histograms.values():
+                merged.merge(histogram)
+        return merged
+
+    def merge(self, other):
+        """Add the histograms of another metrics object to this one
+
+        :param other: the metrics to merge
+        :type other: Metrics
+        :return: this metrics object
+        :rtype: Metrics
+        """
+        with other._lock:
+            histograms = copy.deepcopy(other._histograms)
+        with self._lock:
+            for name, histogram in histograms.items():
+                self._histogram(name).merge(histogram)
+        return self
+
+    def drain(self):
+        """Return the recorded histograms and reset this metrics object, atomically
+
+        Used for sending the records of an interval to an aggregator, no record is lost or counted twice
+
+        :return: a new metrics object with the recorded histograms
+        :rtype: Metrics
+        """
+        drained = copy.copy(self)
+        drained._lock = threading.Lock()
+        with self._lock:
+            drained._histograms, self._histograms = self._histograms, {}
+        return drained
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        """Return the summary of each transaction
+
+        :param percentiles: the percentiles to compute
+        :type percentiles: tuple
+        :return: a dict with the summary of each transaction name, see `LatencyHistogram.summary`
+        :rtype: dict
+        """
+        with self._lock:
+            return dict((name, histogram.summary(percentiles)) for name, histogram in self._histograms.items())
+
+    def reset(self):
+        """Remove all histograms
+
+        :return: None
+        """
+        with self._lock:
+            self._histograms.clear()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -0,0 +1,175 @@
+"""This file contain the browser pool
+
+The pool hands out browsers with isolated cookies, headers, history and form state, all sharing the same transport
+adapter, so thousands of virtual users don't need thousands of connection pools
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from octbrowser.browser import Browser
+from octbrowser.exceptions import PoolExhausted
+from octbrowser.history.cached import CachedHistory
+from octbrowser.transport import BrowserAdapter
+
+
+class BrowserPool(object):
+
+    """A thread safe pool of browsers sharing one bounded transport adapter
+
+    Browsers are created on demand and given back to the pool with the ``release`` method. Released browsers are
+    cleaned with ``clean_browser`` and reused by the next ``acquire`` call.
+
+    All other keyword arguments are given to the browser class when creating a new browser.
+
+    :param size: the maximum number of browsers in use at the same time, None for no limit
+    :type size: int
+    :param base_url: the base url of all browsers
+    :type base_url: str
+    :param pool_connections: the number of hosts to keep a connection pool for
+    :type pool_connections: int
+    :param pool_maxsize: the maximum number of connections kept open per host, shared by all browsers
+    :type pool_maxsize: int
+    :param pool_block: if True, wait for a free connection when the pool is full instead of opening a new one
+    :type pool_block: bool
+    :param history_factory: callable returning a new history object for each browser, None for no history
+    :type history_factory: callable
+    :param browser_class: the class of the browsers to create
+    :type browser_class: type
+    """
+
+    def __init__(self, size=None, base_url='', pool_connections=10, pool_maxsize=10, pool_block=True,
+                 history_factory=CachedHistory, browser_class=Browser, **kwargs):
+        self.size = size
+        self.base_url = base_url
+        self.adapter = BrowserAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                      pool_block=pool_block)
+        self._history_factory = history_factory
+        self._browser_class = browser_class
+        self._browser_kwargs = kwargs
+        self._idle = []
+        self._in_use = 0
+        self._created = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size) if size else None
+
+    def _new_browser(self):
+        """Create a new browser using the shared adapter
+
+        :return: a new browser
+        :rtype: octbrowser.browser.Browser
+        """
+        history = self._history_factory() if self._history_factory is not None else None
+        browser = self._browser_class(base_url=self.base_url, history=history, keep_alive=True,
+                                      adapter=self.adapter, **self._browser_kwargs)
+        browser.pool = self
+        return browser
+
+    def acquire(self, block=True, timeout=None):
+        """Get a browser from the pool
+
+        Raise:
+            octbrowser.exceptions.PoolExhausted
+
+        :param block: if True, wait for a browser to be released when the pool is full
+        :type block: bool
+        :param timeout: the maximum time to wait for a browser, in seconds
+        :type timeout: float
+        :return: a clean browser
+        :rtype: octbrowser.browser.Browser
+        """
+        if self._slots is not None:
+            if not block:
+                acquired = self._slots.acquire(False)
+            elif timeout is None:
+                acquired = self._slots.acquire()
+            else:
+                acquired = self._acquire_slot(timeout)
+            if not acquired:
+                raise PoolExhausted('No browser available in the pool (size {0})'.format(self.size))
+
+        with self._lock:
+            self._in_use += 1
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self._new_browser()
+        except Exception:
+            # give the slot back, or a failing constructor would exhaust the pool
+            with self._lock:
+                self._in_use -= 1
+                self._created -= 1
+            if self._slots is not None:
+                self._slots.release()
+            raise
+
+    def _acquire_slot(self, timeout):
+        """Wait for a free slot, python 2 semaphores don't take a timeout
+
+        :param timeout: the maximum time to wait, in seconds
+        :type timeout: float
+        :return: True if a slot was acquired
+        :rtype: bool
+        """
+        try:
+            return self._slots.acquire(timeout=timeout)
+        except TypeError:
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                if self._slots.acquire(False):
+                    return True
+                time.sleep(0.01)
+            return False
+
+    def release(self, browser):
+        """Give a browser back to the pool. The browser is cleaned and will be reused by the next acquire
+
+        :param browser: a browser created by this pool
+        :type browser: octbrowser.browser.Browser
+        :return: None
+        """
+        assert getattr(browser, 'pool', None) is self, "The browser doesn't belong to this pool"
+        browser.clean_browser()
+        with self._lock:
+            self._in_use -= 1
+            self._idle.append(browser)
+        if self._slots is not None:
+            self._slots.release()
+
+    @contextmanager
+    def browser(self, block=True, timeout=None):
+        """Context manager acquiring a browser and releasing it on exit
+
+        :param block: if True, wait for a browser to be released when the pool is full
+        :type block: bool
+        :param timeout: the maximum time to wait for a browser, in seconds
+        :type timeout: float
+        """
+        browser = self.acquire(block, timeout)
+        try:
+            yield browser
+        finally:
+            self.release(browser)
+
+    @property
+    def stats(self):
+        """Pool usage counters, including the connection counters of the shared adapter
+
+        :return: a dict with ``created``, ``in_use``, ``idle`` keys and the adapter stats
+        :rtype: dict
+        """
+        with self._lock:
+            stats = {'created': self._created, 'in_use': self._in_use, 'idle': len(self._idle)}
+        stats.update(self.adapter.stats)
+        return stats
+
+    def close(self):
+        """Drop idle browsers and close all pooled connections
+
+        :return: None
+        """
+        with self._lock:
+            del self._idle[:]
+        self.adapter.close()
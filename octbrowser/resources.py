@@ -0,0 +1,127 @@
+"""This file contain the resources download helpers of the browser
+
+Resources (images, scripts, stylesheets...) are downloaded with the browser session, so they share its cookies,
+headers and pooled connections
+"""
+
+import hashlib
+import os
+import time
+
+import requests
+
+from octbrowser.timing import Timing
+
+
+class ResourceResult(object):
+
+    """Represent the result of a resource download
+
+    The ``timing`` attribute is an `octbrowser.timing.Timing` object, None if the request failed
+
+    :param url: the url of the resource
+    :type url: str
+    """
+
+    __slots__ = ('url', 'path', 'status_code', 'size', 'elapsed', 'error', 'timing')
+
+    def __init__(self, url):
+        self.url = url
+        self.path = None
+        self.status_code = None
+        self.size = 0
+        self.elapsed = 0.0
+        self.error = None
+        self.timing = None
+
+    @property
+    def ok(self):
+        """True if the resource was successfully saved
+
+        :rtype: bool
+        """
+        return self.path is not None
+
+    def __repr__(self):
+        return '<ResourceResult {0} [{1}] {2} bytes>'.format(self.url, self.status_code, self.size)
+
+
+def resource_filenames(urls):
+    """Return the file names of resources downloaded together in the same directory
+
+    Resources are named after the last part of their url. When different urls end with the same part, like
+    ``/static/1/logo.png`` and ``/static/2/logo.png``, a hash of the url is added to their name so they don't overwrite
+    each other
+
+    :param urls: the urls of the resources
+    :type urls: list
+    :return: the file name of each url, None if the resource can be named after its final url
+    :rtype: dict
+    """
+    by_name = {}
+    for url in urls:
+        by_name.setdefault(os.path.basename(url), set()).add(url)
+    filenames = {}
+    for name, same_name in by_name.items():
+        for url in same_name:
+            if len(same_name) == 1:
+                filenames[url] = None
+            else:
+                root, ext = os.path.splitext(name)
+                filenames[url] = '{0}-{1}{2}'.format(root, hashlib.md5(url.encode('utf-8')).hexdigest()[:8], ext)
+    return filenames
+
+
+def download_resource(session, url, output_dir, chunk_size=1024, filename=None):
+    """Download a resource with the given session and write it to the output dir
+
+    The file is named after the last part of the final url of the resource, unless ``filename`` is set. Network
+    errors are not raised but stored in the ``error`` attribute of the result.
+
+    Raise:
+        OSError
+
+    :param session: the session used for the request
+    :type session: requests.Session
+    :param url: the url of the resource
+    :type url: str
+    :param output_dir: the directory where the resource will be written
+    :type output_dir: str
+    :param chunk_size: the size of the chunks read from the response and written to the file
+    :type chunk_size: int
+    :param filename: the name of the written file
+    :type filename: str
+    :return: the download result
+    :rtype: ResourceResult
+    """
+    result = ResourceResult(url)
+    start = time.time()
+    try:
+        response = session.get(url, stream=True)
+    except requests.RequestException as e:
+        result.error = e
+        result.elapsed = time.time() - start
+        return result
+
+    result.timing = Timing.from_response(response, start)
+    try:
+        result.status_code = response.status_code
+        if not response.ok:
+            return result
+
+        path = os.path.join(output_dir, filename or os.path.basename(response.url))
+        with open(path, 'wb') as f:
+            for block in response.iter_content(chunk_size):
+                if not block:
+                    break
+                f.write(block)
+                result.size += len(block)
+        result.path = path
+    except requests.RequestException as e:
+        result.error = e
+    finally:
+        response.close()
+        result.elapsed = time.time() - start
+        result.timing.download += time.time() - start - result.timing.total
+        result.timing.finish()
+    return result
@@ -0,0 +1,356 @@
+"""This file contain the open loop scheduler of the browser
+
+Virtual users running in a loop send their next request only when the previous one is finished, so the load drops
+when the server slows down and the latencies hide the time requests would have waited. The scheduler starts
+transactions at a target arrival rate instead, whatever their response time, and measures latencies from the time
+each transaction should have started
+"""
+
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from octbrowser.metrics import LatencyHistogram, Metrics
+from octbrowser.pool import BrowserPool
+
+
+class RateProfile(object):
+
+    """A target arrival rate changing over time
+
+    The profile is a list of ``(duration, start_rate, end_rate)`` segments, the rate changing linearly from start_rate
+    to end_rate during each segment. Rates are in transactions per second, durations in seconds :
+
+    .. code-block:: python
+
+        # ramp from 0 to 50/s in 30 seconds, then 50/s during 5 minutes
+        profile = RateProfile([(30, 0, 50), (300, 50, 50)])
+
+    :param segments: the segments of the profile
+    :type segments: list
+    """
+
+    def __init__(self, segments):
+        self.segments = []
+        for segment in segments:
+            duration, start_rate, end_rate = segment
+            if duration < 0 or start_rate < 0 or end_rate < 0:
+                raise ValueError('Invalid segment {0!r}'.format(segment))
+            self.segments.append((float(duration), float(start_rate), float(end_rate)))
+
+    @classmethod
+    def constant(cls, rate, duration):
+        """A constant rate
+
+        :param rate: the rate, in transactions per second
+        :type rate: float
+        :param duration: the duration, in seconds
+        :type duration: float
+        :rtype: RateProfile
+        """
+        return cls([(duration, rate, rate)])
+
+    @classmethod
+    def steps(cls, steps):
+        """Constant rates one after the other
+
+        :param steps: a list of ``(duration, rate)`` tuples
+        :type steps: list
+        :rtype: RateProfile
+        """
+        return cls([(duration, rate, rate) for duration, rate in steps])
+
+    @classmethod
+    def ramp(cls, start_rate, end_rate, duration):
+        """A rate changing linearly
+
+        :param start_rate: the rate at the start
+        :type start_rate: float
+        :param end_rate: the rate at the end
+        :type end_rate: float
+        :param duration: the duration, in seconds
+        :type duration: float
+        :rtype: RateProfile
+        """
+        return cls([(duration, start_rate, end_rate)])
+
+    def __add__(self, other):
+        return RateProfile(self.segments + other.segments)
+
+    @property
+    def duration(self):
+        """The total duration of the profile, in seconds
+
+        :rtype: float
+        """
+        return sum(segment[0] for segment in self.segments)
+
+    @property
+    def count(self):
+        """The expected number of transactions
+
+        :rtype: float
+        """
+        return sum(duration * (start_rate + end_rate) / 2 for duration, start_rate, end_rate in self.segments)
+
+    def rate(self, offset):
+        """Return the target rate at a time
+
+        :param offset: the time from the start of the profile, in seconds
+        :type offset: float
+        :return: the rate, 0 after the end of the profile
+        :rtype: float
+        """
+        for duration, start_rate, end_rate in self.segments:
+            if offset < duration:
+                return start_rate + (end_rate - start_rate) * offset / duration
+            offset -= duration
+        return 0.0
+
+    def time_at(self, count):
+        """Return the time at which the expected number of transactions reaches count
+
+        :param count: the number of transactions, not necessarily an integer
+        :type count: float
+        :return: the time from the start of the profile, in seconds, None after the end of the profile
+        :rtype: float
+        """
+        elapsed = 0.0
+        for duration, start_rate, end_rate in self.segments:
+            segment_count = duration * (start_rate + end_rate) / 2
+            if count <= segment_count and segment_count > 0:
+                if start_rate == end_rate:
+                    return elapsed + count / start_rate
+                slope = (end_rate - start_rate) / duration
+                # solve start_rate * t + slope * t ** 2 / 2 = count
+                return elapsed + (math.sqrt(max(start_rate ** 2 + 2 * slope * count, 0)) - start_rate) / slope
+            count -= segment_count
+            elapsed += duration
+        return None
+
+    def arrivals(self, poisson=False, seed=None):
+        """Generate the start times of the transactions
+
+        Evenly spaced at the target rate by default. With ``poisson`` set, arrivals are a Poisson process following
+        the target rate: inter-arrival times are random, with the same average rate
+
+        :param poisson: if True, arrivals are random
+        :type poisson: bool
+        :param seed: the seed of the random generator
+        :type seed: int
+        :return: a generator of times from the start of the profile, in seconds
+        :rtype: generator
+        """
+        rand = random.Random(seed)
+        count = 0.0
+        while True:
+            count += rand.expovariate(1) if poisson else 1
+            offset = self.time_at(count)
+            if offset is None:
+                return
+            yield offset
+
+    def __repr__(self):
+        return '<RateProfile {0!r}>'.format(self.segments)
+
+
+class ScheduledResult(object):
+
+    """The result of a scheduled transaction
+
+    :param name: the transaction name
+    :type name: str
+    :param intended: the timestamp at which the transaction should have started
+    :type intended: float
+    """
+
+    __slots__ = ('name', 'intended', 'started', 'finished', 'error')
+
+    def __init__(self, name, intended):
+        self.name = name
+        self.intended = intended
+        self.started = None
+        self.finished = None
+        self.error = None
+
+    @property
+    def lag(self):
+        """The time between the intended start and the actual start, in seconds
+
+        :rtype: float
+        """
+        return max(self.started - self.intended, 0.0)
+
+    @property
+    def service_time(self):
+        """The time taken by the transaction once started, in seconds
+
+        :rtype: float
+        """
+        return self.finished - self.started
+
+    @property
+    def latency(self):
+        """The time between the intended start and the end of the transaction, in seconds
+
+        :rtype: float
+        """
+        return max(self.finished - self.intended, 0.0)
+
+    @property
+    def ok(self):
+        """True if the transaction didn't raise an exception
+
+        :rtype: bool
+        """
+        return self.error is None
+
+    def __repr__(self):
+        return '<ScheduledResult {0} lag={1:.4f} latency={2:.4f}>'.format(self.name, self.lag, self.latency)
+
+
+class Scheduler(object):
+
+    """Start transactions at a target arrival rate, with a bounded number of transactions in flight
+
+    The transaction is a callable taking a browser. It is started at the times given by the profile, whether the
+    previous transactions are finished or not. At most ``max_in_flight`` transactions run at the same time, each with
+    a browser from a `octbrowser.pool.BrowserPool`; when they're all busy, the next transactions start late and their
+    lag is recorded :
+
+    .. code-block:: python
+
+        def search(browser):
+            browser.open_url('http://localhost/search?q=octopus')
+
+        scheduler = Scheduler(search, RateProfile.constant(100, 60), max_in_flight=50, poisson=True)
+        scheduler.run()
+        print(scheduler.metrics.summary()['search'], scheduler.lag.percentile(99))
+
+    Latencies are recorded in `metrics` with `octbrowser.metrics.Metrics.record_scheduled`, from the intended start
+    to the end of the transaction, and the start lags in the `lag` histogram. All other keyword arguments are given
+    to the browser pool.
+
+    :param transaction: the transaction, called with a browser
+    :type transaction: callable
+    :param profile: the target arrival rate
+    :type profile: RateProfile
+    :param max_in_flight: the maximum number of transactions running at the same time
+    :type max_in_flight: int
+    :param poisson: if True, arrivals are a Poisson process instead of being evenly spaced
+    :type poisson: bool
+    :param seed: the seed of the random arrivals
+    :type seed: int
+    :param name: the transaction name, default to the name of the callable
+    :type name: str
+    :param metrics: the metrics recording the latencies, a new one is created if not set
+    :type metrics: octbrowser.metrics.Metrics
+    :param on_result: a callable called with the `ScheduledResult` of each transaction, from the worker threads
+    :type on_result: callable
+    :param pool: the browser pool, a new one is created if not set
+    :type pool: octbrowser.pool.BrowserPool
+    """
+
+    def __init__(self, transaction, profile, max_in_flight=100, poisson=False, seed=None, name=None, metrics=None,
+                 on_result=None, pool=None, **kwargs):
+        self.transaction = transaction
+        self.profile = profile
+        self.max_in_flight = max_in_flight
+        self.poisson = poisson
+        self.seed = seed
+        self.name = name or getattr(transaction, '__name__', 'transaction')
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.lag = LatencyHistogram(self.metrics.highest, self.metrics.precision_bits)
+        self.on_result = on_result
+        self._own_pool = pool is None
+        self.pool = pool or BrowserPool(size=max_in_flight, pool_maxsize=max_in_flight, history_factory=None,
+                                        **kwargs)
+        self.scheduled = 0
+        self.completed = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_reached = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """Stop starting new transactions, `run` returns when the running ones are finished
+
+        :return: None
+        """
+        self._stop_event.set()
+
+    def run(self):
+        """Start the transactions of the profile and wait for their end
+
+        :return: the metrics
+        :rtype: octbrowser.metrics.Metrics
+        """
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        start = time.time()
+        try:
+            for offset in self.profile.arrivals(self.poisson, self.seed):
+                intended = start + offset
+                delay = intended - time.time()
+                if delay > 0 and self._stop_event.wait(delay):
+                    break
+                # waiting for a slot delays the start of the transaction, the lag is recorded
+                slots.acquire()
+                if self._stop_event.is_set():
+                    slots.release()
+                    break
+                with self._lock:
+                    self.scheduled += 1
+                    self.in_flight += 1
+                    self.max_reached = max(self.max_reached, self.in_flight)
+                executor.submit(self._execute, ScheduledResult(self.name, intended), slots)
+        finally:
+            executor.shutdown(wait=True)
+            if self._own_pool:
+                self.pool.close()
+        return self.metrics
+
+    def _execute(self, result, slots):
+        """Run a transaction with a browser of the pool and record its result
+
+        :param result: the result of the transaction, with its intended start
+        :type result: ScheduledResult
+        :param slots: the semaphore bounding the transactions in flight
+        :type slots: threading.BoundedSemaphore
+        :return: None
+        """
+        try:
+            result.started = time.time()
+            try:
+                with self.pool.browser() as browser:
+                    self.transaction(browser)
+            except Exception as e:
+                result.error = e
+            result.finished = time.time()
+            self.metrics.record_scheduled(result.name, result.intended, result.finished)
+            with self._lock:
+                self.lag.record(result.lag)
+                self.completed += 1
+                if result.error is not None:
+                    self.errors += 1
+            if self.on_result is not None:
+                self.on_result(result)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            slots.release()
+
+    @property
+    def stats(self):
+        """Scheduler counters
+
+        :return: a dict with ``scheduled``, ``completed``, ``errors``, ``in_flight`` and ``max_in_flight`` (the
+                 highest number of transactions in flight reached) keys
+        :rtype: dict
+        """
+        with self._lock:
+            return {'scheduled': self.scheduled, 'completed': self.completed, 'errors': self.errors,
+                    'in_flight': self.in_flight, 'max_in_flight': self.max_reached}
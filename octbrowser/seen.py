@@ -0,0 +1,349 @@
+"""This file contain the seen urls indexes of the browser
+
+Long crawls visit millions of urls, keeping all of them in a set of strings costs gigabytes. These indexes only keep a
+64 bits hash of each canonical url, in a flat array, or a few bits per url in a bloom filter
+"""
+
+import hashlib
+import math
+import re
+import string
+import struct
+import sys
+import threading
+from array import array
+
+from six.moves.urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+try:
+    array('Q')
+    TYPECODE = 'Q'
+except ValueError:
+    # python 2, unsigned long is 64 bits on most 64 bits platforms
+    TYPECODE = 'L'
+
+UNRESERVED = frozenset(string.ascii_letters + string.digits + '-._~')
+ESCAPE_RE = re.compile(r'%([0-9a-fA-F]{2})')
+
+
+def _normalize_escape(match):
+    char = chr(int(match.group(1), 16))
+    return char if char in UNRESERVED else '%' + match.group(1).upper()
+
+
+def canonicalize_url(url, sort_query=True):
+    """Return the canonical form of an absolute url
+
+    The scheme and host are lower cased, default ports and fragments are removed, an empty path becomes ``/`` and
+    percent escapes are normalized (unreserved characters are decoded, other escapes are upper cased). If sort_query
+    is set, the query parameters are sorted
+
+    Raise:
+        ValueError if the port of the url isn't valid
+
+    :param url: the absolute url
+    :type url: str
+    :param sort_query: if True, sort the query parameters
+    :type sort_query: bool
+    :return: the canonical url
+    :rtype: str
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        # ipv6 address
+        host = '[{0}]'.format(host)
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        host = '{0}:{1}'.format(host, parts.port)
+    if parts.username is not None:
+        userinfo = parts.username + (':' + parts.password if parts.password is not None else '')
+        host = userinfo + '@' + host
+    path = ESCAPE_RE.sub(_normalize_escape, parts.path)
+    query = ESCAPE_RE.sub(_normalize_escape, parts.query)
+    if sort_query and query:
+        query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path or '/', query, ''))
+
+
+def url_hash(url):
+    """Return a 64 bits hash of an url, never 0
+
+    :param url: the url
+    :type url: str
+    :return: the hash
+    :rtype: int
+    """
+    if not isinstance(url, bytes):
+        url = url.encode('utf-8')
+    return struct.unpack('<Q', hashlib.sha1(url).digest()[:8])[0] or 1
+
+
+class SeenIndex(object):
+
+    """A set of urls storing a 64 bits hash of each canonical url in an open addressing hash table
+
+    Each url costs 16 to 32 bytes, whatever its length. Two different urls have a negligible probability (about
+    ``n / 2 ** 64``) to be considered as the same url.
+
+    :param capacity: the number of urls expected, the index grows when needed
+    :type capacity: int
+    :param canonicalize: if True, urls are canonicalized with `canonicalize_url` before being hashed
+    :type canonicalize: bool
+    """
+
+    magic = b'OCTSEEN1'
+
+    def __init__(self, capacity=1024, canonicalize=True):
+        self.canonicalize = canonicalize
+        size = 16
+        while size < capacity * 2:
+            size *= 2
+        self._table = array(TYPECODE, b'\0' * (size * 8))
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def key(self, url):
+        """Return the hash of an url, as stored in the index
+
+        :param url: the url
+        :type url: str
+        :return: the hash
+        :rtype: int
+        """
+        return url_hash(canonicalize_url(url) if self.canonicalize else url)
+
+    def _slot(self, table, key):
+        """Return the slot of the key in the table, or the empty slot where it should be inserted
+
+        :return: the slot index
+        :rtype: int
+        """
+        mask = len(table) - 1
+        slot = key & mask
+        while table[slot] and table[slot] != key:
+            slot = (slot + 1) & mask
+        return slot
+
+    def _grow(self):
+        """Double the size of the table
+
+        :return: None
+        """
+        old = self._table
+        table = array(TYPECODE, b'\0' * (len(old) * 16))
+        for key in old:
+            if key:
+                table[self._slot(table, key)] = key
+        self._table = table
+
+    def add(self, url):
+        """Add an url to the index
+
+        :param url: the url
+        :type url: str
+        :return: True if the url wasn't in the index yet
+        :rtype: bool
+        """
+        key = self.key(url)
+        with self._lock:
+            slot = self._slot(self._table, key)
+            if self._table[slot]:
+                return False
+            self._table[slot] = key
+            self._count += 1
+            if self._count * 3 > len(self._table) * 2:
+                self._grow()
+            return True
+
+    def __contains__(self, url):
+        key = self.key(url)
+        with self._lock:
+            return bool(self._table[self._slot(self._table, key)])
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        """The memory used by the table, in bytes
+
+        :rtype: int
+        """
+        return len(self._table) * self._table.itemsize
+
+    def clear(self):
+        """Remove all urls
+
+        :return: None
+        """
+        with self._lock:
+            self._table = array(TYPECODE, b'\0' * (16 * 8))
+            self._count = 0
+
+    def save(self, path):
+        """Write the index to a file
+
+        :param path: the path of the file
+        :type path: str
+        :return: None
+        """
+        with self._lock:
+            with open(path, 'wb') as f:
+                f.write(self.magic)
+                f.write(struct.pack('<QQ?', self._count, len(self._table), self.canonicalize))
+                table = self._table
+                if sys.byteorder != 'little':
+                    table = array(TYPECODE, table)
+                    table.byteswap()
+                f.write(table.tostring() if not hasattr(table, 'tobytes') else table.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by `save`
+
+        Raise:
+            ValueError
+
+        :param path: the path of the file
+        :type path: str
+        :return: the index
+        :rtype: SeenIndex
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(cls.magic)) != cls.magic:
+                raise ValueError('{0} is not a seen urls index'.format(path))
+            count, size, canonicalize = struct.unpack('<QQ?', f.read(struct.calcsize('<QQ?')))
+            index = cls(canonicalize=canonicalize)
+            index._table = array(TYPECODE, f.read(size * 8))
+        if len(index._table) != size:
+            raise ValueError('{0} is truncated'.format(path))
+        if sys.byteorder != 'little':
+            index._table.byteswap()
+        index._count = count
+        return index
+
+
+class BloomFilter(object):
+
+    """A bloom filter of canonical urls
+
+    Much smaller than a `SeenIndex` (about 1.2 byte per url for a 1% error rate) but urls that were never added can
+    be considered as seen, with the given probability, as long as the filter holds less urls than its capacity.
+    The filter doesn't grow.
+
+    :param capacity: the maximum number of urls
+    :type capacity: int
+    :param error_rate: the false positive probability when the filter is full
+    :type error_rate: float
+    :param canonicalize: if True, urls are canonicalized with `canonicalize_url` before being hashed
+    :type canonicalize: bool
+    """
+
+    magic = b'OCTBLOOM'
+
+    def __init__(self, capacity=1000000, error_rate=0.001, canonicalize=True):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.canonicalize = canonicalize
+        self.bits = max(int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))), 8)
+        self.hashes = max(int(round(self.bits / float(capacity) * math.log(2))), 1)
+        self._array = bytearray((self.bits + 7) // 8)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, url):
+        """Return the bit positions of an url, with double hashing
+
+        :param url: the url
+        :type url: str
+        :return: the list of positions
+        :rtype: list
+        """
+        if self.canonicalize:
+            url = canonicalize_url(url)
+        digest = hashlib.sha1(url.encode('utf-8') if not isinstance(url, bytes) else url).digest()
+        first, second = struct.unpack('<QQ', digest[:16])
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, url):
+        """Add an url to the filter
+
+        :param url: the url
+        :type url: str
+        :return: True if the url wasn't in the filter yet
+        :rtype: bool
+        """
+        added = False
+        with self._lock:
+            for position in self._positions(url):
+                byte, bit = divmod(position, 8)
+                if not self._array[byte] & (1 << bit):
+                    self._array[byte] |= 1 << bit
+                    added = True
+            if added:
+                self._count += 1
+        return added
+
+    def __contains__(self, url):
+        array_ = self._array
+        return all(array_[position // 8] & (1 << (position % 8)) for position in self._positions(url))
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        """The memory used by the filter, in bytes
+
+        :rtype: int
+        """
+        return len(self._array)
+
+    def clear(self):
+        """Remove all urls
+
+        :return: None
+        """
+        with self._lock:
+            self._array = bytearray(len(self._array))
+            self._count = 0
+
+    def save(self, path):
+        """Write the filter to a file
+
+        :param path: the path of the file
+        :type path: str
+        :return: None
+        """
+        with self._lock:
+            with open(path, 'wb') as f:
+                f.write(self.magic)
+                f.write(struct.pack('<QdQ?', self.capacity, self.error_rate, self._count, self.canonicalize))
+                f.write(bytes(self._array))
+
+    @classmethod
+    def load(cls, path):
+        """Read a filter written by `save`
+
+        Raise:
+            ValueError
+
+        :param path: the path of the file
+        :type path: str
+        :return: the filter
+        :rtype: BloomFilter
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(cls.magic)) != cls.magic:
+                raise ValueError('{0} is not a bloom filter'.format(path))
+            capacity, error_rate, count, canonicalize = struct.unpack('<QdQ?', f.read(struct.calcsize('<QdQ?')))
+            bloom = cls(capacity, error_rate, canonicalize)
+            data = bytearray(f.read())
+        if len(data) != len(bloom._array):
+            raise ValueError('{0} is truncated'.format(path))
+        bloom._array = data
+        bloom._count = count
+        return bloom
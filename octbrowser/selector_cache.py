@@ -0,0 +1,219 @@
+"""This file contain the compiled css selectors cache of the browser
+
+Translating a css selector to xpath is done each time a ``CSSSelector`` is created, the cache avoid doing it more
+than once for the same selector
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+import cssselect
+from cssselect.parser import CombinedSelector
+from lxml import etree
+from lxml.cssselect import CSSSelector, LxmlTranslator, LxmlHTMLTranslator
+
+WHITESPACE_RE = re.compile(r'[ \t\r\n\f]')
+
+#: the axis testing the left part of each combinator, from the element matching the right part
+COMBINATOR_AXES = {' ': 'ancestor::', '>': 'parent::', '~': 'preceding-sibling::',
+                   '+': 'preceding-sibling::*[1]/self::'}
+
+
+class ClassTestMixin(object):
+
+    """Translate the ``.class`` and ``[attr~=value]`` selectors to a faster xpath test
+
+    Most elements have a single class, comparing the attribute to the value is much faster than the normalize-space
+    and concat calls of the default translation, which are only done when the attribute contains the value
+    """
+
+    def xpath_attrib_includes(self, xpath, name, value):
+        if not value or WHITESPACE_RE.search(value):
+            return super(ClassTestMixin, self).xpath_attrib_includes(xpath, name, value)
+        xpath.add_condition("{0} = {1} or (contains({0}, {1}) and contains(concat(' ', normalize-space({0}), ' '), "
+                            "{2}))".format(name, self.xpath_literal(value), self.xpath_literal(' ' + value + ' ')))
+        return xpath
+
+
+class Translator(ClassTestMixin, LxmlTranslator):
+    """The ``xml`` translator"""
+
+
+class HTMLTranslator(ClassTestMixin, LxmlHTMLTranslator):
+    """The ``html`` translator"""
+
+
+TRANSLATORS = {'xml': Translator(), 'html': HTMLTranslator()}
+
+
+def _match_step(tree, axis, translator):
+    """Translate a parsed selector to an xpath step on the given axis, with the combinators as predicates
+
+    Raise:
+        cssselect.ExpressionError
+
+    :rtype: str
+    """
+    if isinstance(tree, CombinedSelector):
+        if tree.combinator not in COMBINATOR_AXES:
+            raise cssselect.ExpressionError('Unsupported combinator {0!r}'.format(tree.combinator))
+        return '{0}[{1}]'.format(_match_step(tree.subselector, axis, translator),
+                                 _match_step(tree.selector, COMBINATOR_AXES[tree.combinator], translator))
+    xpath = translator.xpath(tree)
+    if xpath.path:
+        raise cssselect.ExpressionError('Unsupported selector {0!r}'.format(tree))
+    step = axis + xpath.element
+    if xpath.condition:
+        step += '[{0}]'.format(xpath.condition)
+    return step
+
+
+def match_xpath(selector, translator='html'):
+    """Translate a css selector to an xpath expression testing the context element itself
+
+    The expression returns the context element if it matches the selector, whatever the size of the tree, so
+    elements can be tested one by one while a document is parsed. Ancestors and previous siblings are tested by
+    the predicates, ``div > p`` becomes ``self::p[parent::div]``
+
+    Raise:
+        cssselect.ExpressionError if the selector can't be tested on an element (pseudo elements)
+
+    :param selector: a string representing a css selector
+    :type selector: str
+    :param translator: the cssselect translator to use, ``xml`` or ``html``
+    :type translator: str
+    :return: the xpath expression
+    :rtype: str
+    """
+    translator = TRANSLATORS.get(translator, translator)
+    expressions = []
+    for parsed in cssselect.parse(selector):
+        if parsed.pseudo_element is not None:
+            raise cssselect.ExpressionError('Pseudo elements can not be matched')
+        expressions.append(_match_step(parsed.parsed_tree, 'self::', translator))
+    return ' | '.join(expressions)
+
+
+class SelectorCache(object):
+
+    """A bounded LRU cache of compiled css selectors, safe to share across threads
+
+    Selectors are cached by translator, so the same expression compiled with the ``xml`` or the ``html`` translator
+    are two different entries. Raw xpath expressions, compiled with `xpath`, share the same cache
+
+    :param maxsize: the maximum number of compiled selectors to keep
+    :type maxsize: int
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._selectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key, compile_func):
+        """Return the cached object for the key, creating it with compile_func if needed
+
+        :return: the compiled object
+        """
+        with self._lock:
+            compiled = self._selectors.pop(key, None)
+            if compiled is not None:
+                self.hits += 1
+                self._selectors[key] = compiled
+                return compiled
+            self.misses += 1
+
+        compiled = compile_func()
+
+        with self._lock:
+            self._selectors[key] = compiled
+            while len(self._selectors) > self.maxsize:
+                self._selectors.popitem(last=False)
+        return compiled
+
+    def get(self, selector, translator='xml'):
+        """Return the compiled selector, compiling it if needed
+
+        :param selector: a string representing a css selector
+        :type selector: str
+        :param translator: the cssselect translator to use, ``xml`` or ``html``
+        :type translator: str
+        :return: the compiled selector
+        :rtype: lxml.cssselect.CSSSelector
+        """
+        return self._get((translator, selector),
+                         lambda: CSSSelector(selector, translator=TRANSLATORS.get(translator, translator)))
+
+    def xpath(self, expression):
+        """Return the compiled xpath expression, compiling it if needed
+
+        The expression returns plain strings instead of lxml "smart" strings, they are faster to build and don't keep
+        a reference to the tree
+
+        :param expression: the xpath expression
+        :type expression: str
+        :return: the compiled expression
+        :rtype: lxml.etree.XPath
+        """
+        return self._get(('xpath', expression), lambda: etree.XPath(expression, smart_strings=False))
+
+    def matcher(self, selector, translator='html'):
+        """Return the compiled expression testing if an element matches the selector, see `match_xpath`
+
+        :param selector: a string representing a css selector
+        :type selector: str
+        :param translator: the cssselect translator to use, ``xml`` or ``html``
+        :type translator: str
+        :return: the compiled expression, None if the selector can't be tested on an element
+        :rtype: lxml.etree.XPath
+        """
+        def compile_matcher():
+            try:
+                return etree.XPath(match_xpath(selector, translator))
+            except cssselect.ExpressionError:
+                return False
+        return self._get(('match', translator, selector), compile_matcher) or None
+
+    def select(self, root, selector, translator='xml'):
+        """Return the elements of root matching the selector
+
+        :param root: the element to search in
+        :type root: lxml.html.HtmlElement
+        :param selector: a string representing a css selector
+        :type selector: str
+        :param translator: the cssselect translator to use, ``xml`` or ``html``
+        :type translator: str
+        :return: the list of matching elements
+        :rtype: list
+        """
+        return self.get(selector, translator)(root)
+
+    @property
+    def stats(self):
+        """Cache usage counters
+
+        :return: a dict with ``hits``, ``misses`` and ``size`` keys
+        :rtype: dict
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._selectors)}
+
+    def clear(self):
+        """Remove all compiled selectors and reset counters
+
+        :return: None
+        """
+        with self._lock:
+            self._selectors.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._selectors)
+
+
+#: The cache shared by all browsers that don't define their own
+default_cache = SelectorCache()
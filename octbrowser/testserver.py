@@ -0,0 +1,625 @@
+"""This file contain a local http server for testing and benchmarking the browser
+
+The server is threaded, keeps connections alive and serves generated pages, forms, redirections, cookies,
+conditional (304) responses and large bodies. Each route can be slowed down with a time to first byte, a delay and a
+throughput limit, and the server counts the connections opened and the requests served
+"""
+
+import os
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from email.utils import formatdate
+
+try:
+    # Python 2
+    import SocketServer as socketserver
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from Cookie import SimpleCookie
+except ImportError:
+    # Python 3
+    import socketserver
+    from http.server import BaseHTTPRequestHandler
+    from http.cookies import SimpleCookie
+
+from six.moves.urllib.parse import urlsplit, parse_qsl
+
+try:
+    from html import escape
+except ImportError:
+    from cgi import escape
+
+BOUNDARY_RE = re.compile(r'multipart/form-data;.*boundary=("[^"]+"|[^;\s]+)')
+DISPOSITION_RE = re.compile(r'(\w+)="([^"]*)"')
+
+#: a minimal png image, served for static resources
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 1024
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.htm': 'text/html; charset=utf-8',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.css': 'text/css',
+    '.js': 'application/javascript',
+    '.json': 'application/json',
+    '.txt': 'text/plain',
+}
+
+
+def make_page(size=0, title='Test page', name='index'):
+    """Build an html page with links, images and a form, filled up to the given size
+
+    :param size: the minimum size of the page in bytes
+    :type size: int
+    :param title: the title of the page
+    :type title: str
+    :param name: the name of the page, used by the links
+    :type name: str
+    :return: the page
+    :rtype: bytes
+    """
+    head = ('<!DOCTYPE html>\n<html>\n<head><meta charset="UTF-8"><title>{0}</title></head>\n<body>\n'
+            '<div id="content">\n'
+            '<img class="resource" src="/static/logo.png">\n'
+            '<img class="resource" src="/static/banner.png">\n'
+            '<a href="/page/{1}-next" id="next">Next page</a>\n'
+            '<form action="/submit" method="post" id="login">\n'
+            '<input type="text" name="login" value="user"/>\n'
+            '<input type="password" name="password" value=""/>\n'
+            '<select name="lang"><option value="en" selected>en</option><option value="fr">fr</option></select>\n'
+            '</form>\n</div>\n').format(escape(title), escape(name))
+    tail = '<a href="/page/last.php" class="item">Last item</a>\n</body>\n</html>\n'
+    block = ('<div class="item"><p class="text">Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do '
+             'eiusmod tempor incididunt ut labore et dolore magna aliqua.</p>'
+             '<a href="/page/{0}-{1}" class="item">Item {1}</a></div>\n')
+    parts = [head]
+    length = len(head) + len(tail)
+    i = 0
+    while length < size:
+        part = block.format(escape(name), i)
+        parts.append(part)
+        length += len(part)
+        i += 1
+    parts.append(tail)
+    return ''.join(parts).encode('utf-8')
+
+
+class ServerRequest(object):
+
+    """A request received by the server, given to the route handlers
+
+    :param method: the http method
+    :type method: str
+    :param path: the path of the url, without query
+    :type path: str
+    :param query: the query parameters
+    :type query: dict
+    :param headers: the request headers
+    :param body: the raw body of the request
+    :type body: bytes
+    :param match: the regex match of the route
+    """
+
+    def __init__(self, method, path, query, headers, body, match=None):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.match = match
+
+    @property
+    def form(self):
+        """The url encoded or multipart fields of the body, without the files
+
+        :rtype: dict
+        """
+        if not self.body:
+            return {}
+        if self._boundary() is not None:
+            return self._multipart()[0]
+        return dict(parse_qsl(self.body.decode('utf-8'), keep_blank_values=True))
+
+    @property
+    def files(self):
+        """The files of a multipart body, as ``name: (filename, content type, content)``
+
+        :rtype: dict
+        """
+        if not self.body or self._boundary() is None:
+            return {}
+        return self._multipart()[1]
+
+    def _boundary(self):
+        match = BOUNDARY_RE.search(self.headers.get('Content-Type') or '')
+        return match.group(1).strip('"').encode('ascii') if match else None
+
+    def _multipart(self):
+        """Parse the multipart body
+
+        :return: the fields and the files
+        :rtype: tuple
+        """
+        fields = {}
+        files = {}
+        for part in self.body.split(b'--' + self._boundary())[1:]:
+            if part.startswith(b'--'):
+                break
+            head, _, content = part[2:-2].partition(b'\r\n\r\n')
+            headers = dict(line.split(b':', 1) for line in head.split(b'\r\n') if b':' in line)
+            disposition = dict(DISPOSITION_RE.findall(headers.get(b'Content-Disposition', b'').decode('utf-8')))
+            if 'filename' in disposition:
+                content_type = headers.get(b'Content-Type', b'').decode('ascii').strip()
+                files[disposition['name']] = (disposition['filename'], content_type, content)
+            else:
+                fields[disposition['name']] = content.decode('utf-8')
+        return fields, files
+
+    @property
+    def cookies(self):
+        """The cookies sent with the request
+
+        :rtype: dict
+        """
+        cookie = SimpleCookie()
+        cookie.load(self.headers.get('Cookie') or '')
+        return dict((name, morsel.value) for name, morsel in cookie.items())
+
+    def __repr__(self):
+        return '<ServerRequest {0} {1}>'.format(self.method, self.path)
+
+
+class Route(object):
+
+    """A route of the server, with its shaping settings
+
+    The handler is called with a `ServerRequest` and returns the body, or a ``(status, headers, body)`` tuple. The
+    body can be bytes or an iterable of bytes, in which case a Content-Length header must be given.
+
+    :param pattern: the regex matching the path of the requests
+    :type pattern: str
+    :param handler: the callable building the response
+    :type handler: callable
+    :param methods: the accepted methods, None for all methods
+    :type methods: tuple
+    :param ttfb: seconds waited before sending the status line and headers
+    :type ttfb: float
+    :param delay: seconds waited between the headers and the body
+    :type delay: float
+    :param throughput: maximum body throughput, in bytes per second
+    :type throughput: int
+    """
+
+    def __init__(self, pattern, handler, methods=None, ttfb=None, delay=None, throughput=None):
+        self.pattern = pattern
+        self.regex = re.compile('^' + pattern + '$')
+        self.handler = handler
+        self.methods = methods
+        self.ttfb = ttfb
+        self.delay = delay
+        self.throughput = throughput
+
+
+class LocalServerHandler(BaseHTTPRequestHandler):
+
+    """HTTP/1.1 handler dispatching the requests to the routes of the server
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # headers and small bodies are sent in one write, avoiding delayed ack stalls on kept alive connections
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.local_server._count('connections')
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        local = self.server.local_server
+        parts = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        request = ServerRequest(self.command, parts.path, dict(parse_qsl(parts.query, keep_blank_values=True)),
+                                self.headers, body)
+        local._log(request)
+        local._count('requests')
+
+        route = local.find_route(request)
+        if route is None:
+            status, headers, content = local.static_response(request)
+        else:
+            status, headers, content = local.call_route(route, request)
+
+        ttfb = local._setting(route, 'ttfb')
+        if ttfb:
+            time.sleep(ttfb)
+        self.send_response(status)
+        headers = list(headers)
+        names = [name.lower() for name, value in headers]
+        if isinstance(content, bytes) and 'content-length' not in names:
+            headers.append(('Content-Length', str(len(content))))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.flush()
+
+        delay = local._setting(route, 'delay')
+        if delay:
+            time.sleep(delay)
+        if self.command != 'HEAD':
+            self._write_body(content, local._setting(route, 'throughput'))
+
+    def _write_body(self, content, throughput):
+        """Write the body, at the given throughput if set
+
+        :param content: the body, bytes or iterable of bytes
+        :param throughput: the maximum throughput in bytes per second
+        :type throughput: int
+        :return: None
+        """
+        if isinstance(content, bytes):
+            content = [content]
+        start = time.time()
+        sent = 0
+        for chunk in content:
+            if throughput:
+                step = max(int(throughput / 20), 1)
+                for i in range(0, len(chunk), step):
+                    part = chunk[i:i + step]
+                    sent += len(part)
+                    wait = start + sent / float(throughput) - time.time()
+                    if wait > 0:
+                        time.sleep(wait)
+                    self.wfile.write(part)
+                    self.wfile.flush()
+            else:
+                self.wfile.write(chunk)
+                sent += len(chunk)
+        self.server.local_server._count('bytes_sent', sent)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = do_PATCH = _handle
+
+
+class LocalServer(object):
+
+    """A threaded local http server for tests and benchmarks
+
+    The server listens on a free port of the loopback interface (unless a port is given), its ``url`` property gives
+    the base url. Built-in routes:
+
+    * ``/page/<name>``: a generated page with links, images and a form, ``?size=<bytes>`` for bigger pages
+    * ``/submit``: echoes the submitted form fields, ``<dd id="field-<name>">`` elements, and the uploaded files,
+      ``<dd id="file-<name>" data-size="<bytes>">`` elements
+    * ``/redirect/<n>``: redirects n times before reaching ``/page/index``, ``?status=301`` to change the status
+    * ``/cookies/set?name=value``: sets the given cookies and redirects to ``/cookies``
+    * ``/cookies/delete?name``: deletes the given cookies and redirects to ``/cookies``
+    * ``/cookies``: lists the received cookies, ``<li id="cookie-<name>">`` elements
+    * ``/cache/<name>``: a page with ETag and Last-Modified validators, answering 304 to conditional requests.
+      ``?max_age=<seconds>`` for a freshness lifetime. `touch` changes the page
+    * ``/large/<bytes>``: a generated html body of the given size, streamed in chunks. ``?binary=1`` for binary data
+    * ``/status/<code>``: an empty response with the given status
+    * ``/static/<file>``: a small png image
+
+    Other paths are served from ``static_dir`` if set.
+
+    :param host: the address to listen on
+    :type host: str
+    :param port: the port to listen on, 0 for a free port
+    :type port: int
+    :param static_dir: a directory of files served when no route matches
+    :type static_dir: str
+    :param ttfb: default seconds waited before sending the headers
+    :type ttfb: float
+    :param delay: default seconds waited between the headers and the body
+    :type delay: float
+    :param throughput: default maximum body throughput, in bytes per second
+    :type throughput: int
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, static_dir=None, ttfb=0, delay=0, throughput=None):
+        self.static_dir = static_dir
+        self.ttfb = ttfb
+        self.delay = delay
+        self.throughput = throughput
+        self.routes = []
+        self.history = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._cache_versions = {}
+        self._last_modified = formatdate(time.time() - 3600, usegmt=True)
+        self.reset_stats()
+        self._add_default_routes()
+
+        server_class = type('Server', (socketserver.ThreadingMixIn, socketserver.TCPServer),
+                            {'allow_reuse_address': True, 'daemon_threads': True})
+        self.httpd = server_class((host, port), LocalServerHandler)
+        self.httpd.local_server = self
+        self.host, self.port = self.httpd.server_address[:2]
+        self.url = 'http://{0}:{1}'.format(host, self.port)
+        self._thread = None
+
+    def start(self):
+        """Start serving in a background thread
+
+        :return: the server
+        :rtype: LocalServer
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and close its socket
+
+        :return: None
+        """
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def add_route(self, pattern, handler=None, body=b'', status=200, headers=None, methods=None, ttfb=None,
+                  delay=None, throughput=None):
+        """Add a route, checked before the existing ones
+
+        Without handler, the route serves the given status, headers and body
+
+        :param pattern: the regex matching the path of the requests
+        :type pattern: str
+        :param handler: the callable building the response, see `Route`
+        :type handler: callable
+        :param body: the body of a static route
+        :type body: bytes
+        :param status: the status of a static route
+        :type status: int
+        :param headers: the headers of a static route
+        :type headers: dict
+        :param methods: the accepted methods, None for all methods
+        :type methods: tuple
+        :param ttfb: seconds waited before sending the headers, default to the server setting
+        :type ttfb: float
+        :param delay: seconds waited between the headers and the body, default to the server setting
+        :type delay: float
+        :param throughput: maximum body throughput in bytes per second, default to the server setting
+        :type throughput: int
+        :return: the route
+        :rtype: Route
+        """
+        if handler is None:
+            static_headers = list((headers or {'Content-Type': 'text/html; charset=utf-8'}).items())
+
+            def handler(request):
+                return status, static_headers, body
+        route = Route(pattern, handler, methods, ttfb, delay, throughput)
+        with self._lock:
+            self.routes.insert(0, route)
+        return route
+
+    def shape(self, pattern, ttfb=None, delay=None, throughput=None):
+        """Change the shaping settings of the routes with the given pattern
+
+        :param pattern: the pattern of the routes, as given to `add_route` or listed in the class documentation
+        :type pattern: str
+        :param ttfb: seconds waited before sending the headers
+        :type ttfb: float
+        :param delay: seconds waited between the headers and the body
+        :type delay: float
+        :param throughput: maximum body throughput, in bytes per second
+        :type throughput: int
+        :return: None
+        :raises: KeyError if no route has this pattern
+        """
+        routes = [route for route in self.routes if route.pattern == pattern]
+        if not routes:
+            raise KeyError(pattern)
+        for route in routes:
+            route.ttfb = ttfb
+            route.delay = delay
+            route.throughput = throughput
+
+    def find_route(self, request):
+        """Return the route matching the request, and set the match of the request
+
+        :param request: the received request
+        :type request: ServerRequest
+        :return: the route or None
+        :rtype: Route
+        """
+        for route in self.routes:
+            match = route.regex.match(request.path)
+            if match and (route.methods is None or request.method in route.methods):
+                request.match = match
+                return route
+        return None
+
+    def call_route(self, route, request):
+        """Call the handler of the route and return a normalized response
+
+        :param route: the route
+        :type route: Route
+        :param request: the received request
+        :type request: ServerRequest
+        :return: a (status, headers, body) tuple, headers as a list of tuples
+        :rtype: tuple
+        """
+        try:
+            result = route.handler(request)
+        except Exception:
+            result = (500, [('Content-Type', 'text/plain')], traceback.format_exc().encode('utf-8'))
+        if not isinstance(result, tuple):
+            result = (200, [('Content-Type', 'text/html; charset=utf-8')], result)
+        status, headers, content = result
+        if isinstance(headers, dict):
+            headers = list(headers.items())
+        self._count(route.pattern, stats='routes')
+        return status, headers, content
+
+    def static_response(self, request):
+        """Serve a file of the static directory, or a 404 response
+
+        :param request: the received request
+        :type request: ServerRequest
+        :return: a (status, headers, body) tuple
+        :rtype: tuple
+        """
+        not_found = (404, [('Content-Type', 'text/html; charset=utf-8')], b'<html><body>Not found</body></html>')
+        if self.static_dir is None:
+            return not_found
+        root = os.path.abspath(self.static_dir)
+        path = os.path.abspath(os.path.join(root, request.path.lstrip('/')))
+        if path != root and not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return not_found
+        with open(path, 'rb') as f:
+            content = f.read()
+        content_type = CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+        return 200, [('Content-Type', content_type)], content
+
+    def _setting(self, route, name):
+        value = getattr(route, name, None) if route is not None else None
+        return getattr(self, name) if value is None else value
+
+    def _count(self, name, value=1, stats=None):
+        with self._lock:
+            if stats is None:
+                self._stats[name] += value
+            else:
+                self._stats[stats][name] = self._stats[stats].get(name, 0) + value
+
+    def _log(self, request):
+        with self._lock:
+            self.history.append(request)
+
+    @property
+    def stats(self):
+        """Server counters
+
+        :return: a dict with ``connections`` (opened), ``requests`` (received), ``bytes_sent``, ``not_modified``
+                 (304 responses) and ``routes`` (requests by route pattern) keys
+        :rtype: dict
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['routes'] = dict(self._stats['routes'])
+            return stats
+
+    def reset_stats(self):
+        """Reset the counters and the history of received requests
+
+        :return: None
+        """
+        with self._lock:
+            self._stats = {'connections': 0, 'requests': 0, 'bytes_sent': 0, 'not_modified': 0, 'routes': {}}
+            self.history.clear()
+
+    def touch(self, name):
+        """Change the content and validators of a ``/cache/<name>`` page
+
+        :param name: the name of the cached page
+        :type name: str
+        :return: None
+        """
+        with self._lock:
+            self._cache_versions[name] = self._cache_versions.get(name, 0) + 1
+            self._last_modified = formatdate(usegmt=True)
+
+    def _add_default_routes(self):
+        html = [('Content-Type', 'text/html; charset=utf-8')]
+
+        def page(request):
+            name = request.match.group(1)
+            return 200, html, make_page(int(request.query.get('size', 0)), 'Page ' + name, name)
+
+        def submit(request):
+            fields = request.form if request.method != 'GET' else request.query
+            items = ''.join('<dt>{0}</dt><dd id="field-{0}">{1}</dd>'.format(escape(name), escape(value))
+                            for name, value in sorted(fields.items()))
+            items += ''.join('<dt>{0}</dt><dd id="file-{0}" data-size="{1}" data-type="{2}">{3}</dd>'.format(
+                escape(name), len(content), escape(content_type), escape(filename))
+                for name, (filename, content_type, content) in sorted(request.files.items()))
+            body = '<html><body><p id="method">{0}</p><dl>{1}</dl></body></html>'.format(request.method, items)
+            return 200, html, body.encode('utf-8')
+
+        def redirect(request):
+            count = int(request.match.group(1))
+            location = '/redirect/{0}'.format(count - 1) if count > 1 else '/page/index'
+            return int(request.query.get('status', 302)), [('Location', location), ('Content-Length', '0')], b''
+
+        def set_cookies(request):
+            headers = [('Location', '/cookies'), ('Content-Length', '0')]
+            for name, value in sorted(request.query.items()):
+                headers.append(('Set-Cookie', '{0}={1}; Path=/'.format(name, value)))
+            return 302, headers, b''
+
+        def delete_cookies(request):
+            headers = [('Location', '/cookies'), ('Content-Length', '0')]
+            for name in sorted(request.query):
+                headers.append(('Set-Cookie', '{0}=; Path=/; Expires=Thu, 01 Jan 1970 00:00:00 GMT'.format(name)))
+            return 302, headers, b''
+
+        def cookies(request):
+            items = ''.join('<li id="cookie-{0}">{1}</li>'.format(escape(name), escape(value))
+                            for name, value in sorted(request.cookies.items()))
+            return 200, html, '<html><body><ul>{0}</ul></body></html>'.format(items).encode('utf-8')
+
+        def cache(request):
+            name = request.match.group(1)
+            with self._lock:
+                version = self._cache_versions.get(name, 0)
+                last_modified = self._last_modified
+            etag = '"{0}-{1}"'.format(name, version)
+            max_age = request.query.get('max_age')
+            headers = [('ETag', etag), ('Last-Modified', last_modified),
+                       ('Cache-Control', 'max-age={0}'.format(max_age) if max_age else 'no-cache')]
+            if request.headers.get('If-None-Match') == etag or (
+                    not request.headers.get('If-None-Match') and
+                    request.headers.get('If-Modified-Since') == last_modified):
+                self._count('not_modified')
+                return 304, headers + [('Content-Length', '0')], b''
+            body = make_page(0, 'Cached {0} v{1}'.format(name, version), name)
+            return 200, html + headers, body
+
+        def large(request):
+            size = int(request.match.group(1))
+            binary = request.query.get('binary')
+
+            def chunks():
+                if binary:
+                    block = PNG[:8] + b'\x00' * 65528
+                else:
+                    block = make_page(65536)
+                    block = block[:block.rindex(b'</body>')]
+                sent = 0
+                while sent < size:
+                    chunk = block[:size - sent]
+                    sent += len(chunk)
+                    yield chunk
+                    if binary:
+                        block = b'\x00' * 65536
+            content_type = 'application/octet-stream' if binary else 'text/html; charset=utf-8'
+            return 200, [('Content-Type', content_type), ('Content-Length', str(size))], chunks()
+
+        def status(request):
+            return int(request.match.group(1)), [('Content-Length', '0')], b''
+
+        def static(request):
+            return 200, [('Content-Type', 'image/png')], PNG
+
+        for pattern, handler in (('/page/([^/]+)', page), ('/submit', submit), ('/redirect/(\\d+)', redirect),
+                                 ('/cookies/set', set_cookies), ('/cookies/delete', delete_cookies),
+                                 ('/cookies', cookies), ('/cache/([^/]+)', cache), ('/large/(\\d+)', large),
+                                 ('/status/(\\d+)', status), ('/static/.+', static)):
+            self.routes.append(Route(pattern, handler))
@@ -0,0 +1,117 @@
+"""This file contain the timing record of the browser
+
+Each response opened by the browser carries a ``Timing`` object, splitting the time spent on the request between the
+network (connection, server, download) and the browser itself (parsing, links, history)
+"""
+
+import time
+
+
+class Timing(object):
+
+    """Timing breakdown of a request, all values are in seconds
+
+    * ``acquire``: time spent waiting for a connection from the pool
+    * ``connect``: time spent opening new connections (tcp connect and tls handshake)
+    * ``ttfb``: time to first byte, from the request sent to the response headers received
+    * ``download``: time spent reading the body
+    * ``parse``: time spent parsing the html (or copying it from the parse cache)
+    * ``absolutize``: time spent making the links of the page absolute
+    * ``history``: time spent adding the response to the history
+    * ``total``: time of the whole browser call (``open_url``, ``submit_form``...)
+
+    ``acquire`` and ``connect`` are only measured by the ``octbrowser.transport.BrowserAdapter``, they are None if the
+    session doesn't use it. With redirections, network times are summed for all the requests
+
+    :param started: the timestamp of the start of the request
+    :type started: float
+    """
+
+    __slots__ = ('started', 'acquire', 'connect', 'ttfb', 'download', 'parse', 'absolutize', 'history', 'total')
+
+    #: names of the timed steps, in order
+    steps = ('acquire', 'connect', 'ttfb', 'download', 'parse', 'absolutize', 'history')
+
+    def __init__(self, started=None):
+        self.started = time.time() if started is None else started
+        self.acquire = None
+        self.connect = None
+        self.ttfb = 0.0
+        self.download = 0.0
+        self.parse = 0.0
+        self.absolutize = 0.0
+        self.history = 0.0
+        self.total = 0.0
+
+    @classmethod
+    def from_response(cls, response, started):
+        """Build the network part of the timing of a response returned by requests
+
+        The body is considered as downloaded when this method is called
+
+        :param response: the response, with its redirection history
+        :type response: requests.Response
+        :param started: the timestamp of the start of the request
+        :type started: float
+        :return: the timing record
+        :rtype: Timing
+        """
+        timing = cls(started)
+        elapsed = 0.0
+        for hop in list(getattr(response, 'history', None) or []) + [response]:
+            if getattr(hop, 'elapsed', None) is not None:
+                elapsed += hop.elapsed.total_seconds()
+            for step in ('acquire', 'connect'):
+                value = getattr(hop, step + '_time', None)
+                if value is not None:
+                    setattr(timing, step, (getattr(timing, step) or 0.0) + value)
+        timing.ttfb = max(elapsed - (timing.acquire or 0.0) - (timing.connect or 0.0), 0.0)
+        timing.download = max(time.time() - started - elapsed, 0.0)
+        timing.total = time.time() - started
+        return timing
+
+    def finish(self):
+        """Set the total time, from the start of the request to now
+
+        :return: the timing record
+        :rtype: Timing
+        """
+        self.total = time.time() - self.started
+        return self
+
+    @property
+    def network(self):
+        """Time spent on the network (acquire, connect, ttfb and download)
+
+        :rtype: float
+        """
+        return (self.acquire or 0.0) + (self.connect or 0.0) + self.ttfb + self.download
+
+    @property
+    def browser(self):
+        """Time spent by the browser itself (parse, absolutize and history)
+
+        :rtype: float
+        """
+        return self.parse + self.absolutize + self.history
+
+    def as_dict(self):
+        """Return the timing as a dict
+
+        :return: a dict with a key for each step and a ``total`` key
+        :rtype: dict
+        """
+        data = dict((step, getattr(self, step)) for step in self.steps)
+        data['total'] = self.total
+        return data
+
+    def __getstate__(self):
+        return dict((slot, getattr(self, slot)) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    def __repr__(self):
+        return '<Timing total={0:.4f}s network={1:.4f}s browser={2:.4f}s>'.format(self.total, self.network,
+                                                                                  self.browser)
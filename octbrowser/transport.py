@@ -0,0 +1,204 @@
+"""This file contain the transport adapter used by the browser
+
+It keeps the pooled connections of a requests session alive, count how many of them are reused and measure the time
+spent getting a connection from the pool and connecting it
+"""
+
+import threading
+import time
+import weakref
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_timings = threading.local()
+
+
+def _add_time(name, start):
+    """Add the time elapsed since start to the timing counter of the current thread
+
+    :param name: the name of the counter
+    :type name: str
+    :param start: the start timestamp
+    :type start: float
+    :return: None
+    """
+    setattr(_timings, name, getattr(_timings, name, 0.0) + time.time() - start)
+
+
+class TimedHTTPConnection(HTTPConnection):
+
+    """HTTP connection measuring its connect time
+    """
+
+    def connect(self):
+        start = time.time()
+        try:
+            super(TimedHTTPConnection, self).connect()
+        finally:
+            _add_time('connect', start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+
+    """HTTPS connection measuring its connect time, including the TLS handshake
+    """
+
+    def connect(self):
+        start = time.time()
+        try:
+            super(TimedHTTPSConnection, self).connect()
+        finally:
+            _add_time('connect', start)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+
+    """HTTP connection pool measuring the time spent waiting for a connection
+    """
+
+    ConnectionCls = TimedHTTPConnection
+
+    def _get_conn(self, timeout=None):
+        start = time.time()
+        try:
+            return super(TimedHTTPConnectionPool, self)._get_conn(timeout)
+        finally:
+            _add_time('acquire', start)
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+
+    """HTTPS connection pool measuring the time spent waiting for a connection
+    """
+
+    ConnectionCls = TimedHTTPSConnection
+
+    def _get_conn(self, timeout=None):
+        start = time.time()
+        try:
+            return super(TimedHTTPSConnectionPool, self)._get_conn(timeout)
+        finally:
+            _add_time('acquire', start)
+
+
+class BrowserAdapter(HTTPAdapter):
+
+    """A requests transport adapter keeping track of connection reuse
+
+    Each time a request is sent, the adapter looks at the urllib3 pool that served it and compares its
+    ``num_connections`` counter with the last known value. This way we can tell if the request needed a new
+    connection (and so a new TCP / TLS handshake) or if it reused an already opened one.
+
+    :param pool_connections: the number of hosts to keep a connection pool for
+    :type pool_connections: int
+    :param pool_maxsize: the maximum number of connections to keep open per host
+    :type pool_maxsize: int
+    :param pool_block: if True, wait for a free connection when the pool is full instead of opening a new one
+    :type pool_block: bool
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, **kwargs):
+        self._stats_lock = threading.Lock()
+        self._known_pools = weakref.WeakKeyDictionary()
+        self.requests_sent = 0
+        self.new_connections = 0
+        super(BrowserAdapter, self).__init__(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                             pool_block=pool_block, **kwargs)
+
+    def __setstate__(self, state):
+        self._stats_lock = threading.Lock()
+        self._known_pools = weakref.WeakKeyDictionary()
+        self.requests_sent = 0
+        self.new_connections = 0
+        super(BrowserAdapter, self).__setstate__(state)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        """Initialize the pool manager with pools measuring connection times
+
+        :return: None
+        """
+        super(BrowserAdapter, self).init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
+
+    def send(self, request, **kwargs):
+        """Send the request and update the connection counters
+
+        The time spent getting a connection from the pool and connecting it are set on the response, as
+        ``acquire_time`` and ``connect_time`` properties (in seconds)
+
+        :param request: the request to send
+        :type request: requests.PreparedRequest
+        :return: the Response object
+        :rtype: requests.Response
+        """
+        _timings.acquire = 0.0
+        _timings.connect = 0.0
+        response = super(BrowserAdapter, self).send(request, **kwargs)
+        response.acquire_time = _timings.acquire
+        response.connect_time = _timings.connect
+        self._update_stats(getattr(response.raw, '_pool', None))
+        return response
+
+    def _update_stats(self, pool):
+        """Update counters from the pool that served the last request
+
+        :param pool: the urllib3 connection pool or None if unknown
+        :return: None
+        """
+        with self._stats_lock:
+            self.requests_sent += 1
+            if pool is None:
+                self.new_connections += 1
+                return
+            last = self._known_pools.get(pool, 0)
+            current = pool.num_connections
+            self.new_connections += max(current - last, 0)
+            self._known_pools[pool] = current
+
+    @property
+    def reused_connections(self):
+        """Number of requests served by an already opened connection
+
+        :return: the number of reused connections
+        :rtype: int
+        """
+        return max(self.requests_sent - self.new_connections, 0)
+
+    @property
+    def stats(self):
+        """Connection usage counters of this adapter
+
+        :return: a dict with ``requests``, ``new_connections`` and ``reused_connections`` keys
+        :rtype: dict
+        """
+        with self._stats_lock:
+            return {
+                'requests': self.requests_sent,
+                'new_connections': self.new_connections,
+                'reused_connections': max(self.requests_sent - self.new_connections, 0)
+            }
+
+    def reset_stats(self):
+        """Reset all connection counters
+
+        :return: None
+        """
+        with self._stats_lock:
+            self.requests_sent = 0
+            self.new_connections = 0
+            self._known_pools = weakref.WeakKeyDictionary()
+
+    def mount_on(self, session):
+        """Mount the adapter on the http and https prefixes of the given session
+
+        :param session: the session to use this adapter with
+        :type session: requests.Session
+        :return: None
+        """
+        session.mount('http://', self)
+        session.mount('https://', self)
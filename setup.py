@@ -35,6 +35,10 @@ setup(
         'lxml',
         'cssselect',
         'tinycss',
-        'six'
-    ]
+        'six',
+        'futures; python_version < "3.0"'
+    ],
+    extras_require={
+        'async': ['aiohttp']
+    }
 )
@@ -0,0 +1,222 @@
+import os
+import unittest
+import asyncio
+import threading
+try:
+    # Python 2
+    import SocketServer as socketserver
+except ImportError:
+    # Python 3
+    import socketserver
+try:
+    # Python 2
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+except ImportError:
+    # Python 3
+    from http.server import SimpleHTTPRequestHandler
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from octbrowser.async_browser import AsyncBrowser
+from octbrowser.history.cached import CachedHistory
+from octbrowser.exceptions import LinkNotFound
+from octbrowser.metrics import Metrics
+from octbrowser.testserver import LocalServer
+from octbrowser.timing import Timing
+
+PORT = 8083
+BASE_URL = "http://localhost:{}".format(PORT)
+
+
+class CookieRequestHandler(SimpleHTTPRequestHandler):
+    """Serve test files and set a cookie on the basic page
+    """
+
+    def end_headers(self):
+        if self.path.endswith('basic_page.html'):
+            self.send_header('Set-Cookie', 'visited=yes; Path=/')
+        SimpleHTTPRequestHandler.end_headers(self)
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is required for the AsyncBrowser')
+class TestAsyncBrowserFunctions(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.chdir(os.path.dirname(__file__) or '.')
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        socketserver.ThreadingTCPServer.daemon_threads = True
+        cls.httpd = socketserver.ThreadingTCPServer(("", PORT), CookieRequestHandler)
+        t = threading.Thread(target=cls.httpd.serve_forever)
+        t.daemon = True
+        t.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+    def run_async(self, coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def test_navigation(self):
+        """Testing the AsyncBrowser navigation
+        """
+        async def scenario():
+            async with AsyncBrowser(base_url=BASE_URL, history=CachedHistory(), parse_in_executor=True) as br:
+                br.add_header('foo', 'bar')
+                r0 = await br.open_url(BASE_URL + '/html_test.html')
+                self.assertIsInstance(r0, requests.Response)
+                self.assertEqual(r0.status_code, 200)
+                self.assertEqual(r0.request.headers['foo'], 'bar')
+                self.assertIsNotNone(r0.html)
+
+                with self.assertRaises(LinkNotFound):
+                    await br.follow_link('#nonsense')
+                r1 = await br.follow_link('#test_link', url_regex='.*Basic.*')
+                self.assertEqual(r1.url, BASE_URL + '/basic_page.html')
+                self.assertEqual(br.session.cookies.get('visited'), 'yes')
+
+                back = await br.back()
+                self.assertIs(back, r0)
+                forward = await br.forward()
+                self.assertIs(forward, r1)
+                refreshed = await br.refresh()
+                self.assertEqual(refreshed.content, r1.content)
+
+                # cookies from the server are sent with next requests
+                r2 = await br.open_url(BASE_URL + '/basic_page2.html')
+                self.assertEqual(r2.request.headers['Cookie'], 'visited=yes')
+
+                # form submission
+                await br.open_url(BASE_URL + '/html_test.html')
+                br.get_form('#testform')
+                br.form_data['test'] = 'octbrowser'
+                r = await br.submit_form()
+                self.assertEqual(r.status_code, 404)
+                self.assertEqual(r.request.url, BASE_URL + '/nothing.html?test=octbrowser&ver=py3')
+                self.assertIsNone(r.request.body)
+                self.assertFalse(br._form_waiting)
+                self.assertEqual(len(br.history), 5)
+
+        self.run_async(scenario())
+
+    def test_timing_metrics(self):
+        """Testing the timing of the AsyncBrowser responses and the metrics
+        """
+        metrics = Metrics()
+
+        async def scenario():
+            async with AsyncBrowser(base_url=BASE_URL, history=CachedHistory(), metrics=metrics) as br:
+                r = await br.open_url(BASE_URL + '/html_test.html', transaction='home')
+                self.assertIsInstance(r.timing, Timing)
+                self.assertGreater(r.timing.ttfb, 0)
+                self.assertGreater(r.timing.parse, 0)
+                self.assertGreater(r.timing.history, 0)
+                self.assertGreaterEqual(r.timing.total, r.timing.network + r.timing.browser)
+                r = await br.follow_link('#test_link', transaction='link')
+                self.assertGreater(r.timing.total, 0)
+                r = await br.refresh(transaction='link')
+                self.assertGreater(r.timing.total, 0)
+                await br.open_url(BASE_URL + '/html_test.html')
+                br.get_form('#testform')
+                r = await br.submit_form(transaction='submit')
+                self.assertGreater(r.timing.ttfb, 0)
+                results = await br.download_resources('img', 'tmp_async_timing', workers=2)
+                self.assertTrue(all(result.timing.total > 0 for result in results if result.ok))
+
+        os.mkdir('tmp_async_timing')
+        try:
+            self.run_async(scenario())
+        finally:
+            for name in os.listdir('tmp_async_timing'):
+                os.remove(os.path.join('tmp_async_timing', name))
+            os.rmdir('tmp_async_timing')
+        self.assertEqual(metrics.names, ['/html_test.html', 'home', 'link', 'submit'])
+        self.assertEqual(metrics.histogram('link').samples, 2)
+
+    def test_redirect_cookies(self):
+        """Testing the cookies set on redirects
+        """
+        server = LocalServer().start()
+        server.add_route('/login$', status=302, headers={'Location': '/cookies', 'Set-Cookie': 'sid=abc; Path=/'})
+        other_host = server.url.replace('127.0.0.1', 'localhost')
+        server.add_route('/away$', status=302, headers={'Location': other_host + '/cookies'})
+
+        async def scenario():
+            async with AsyncBrowser(base_url=server.url, history=None) as br:
+                r = await br.open_url(server.url + '/login', data={'user': 'alice'})
+                self.assertEqual(r.url, server.url + '/cookies')
+                self.assertEqual(r.request.method, 'GET')
+                self.assertEqual([h.status_code for h in r.history], [302])
+                self.assertEqual([e.text for e in br.get_html_elements('#cookie-sid')], ['abc'])
+
+                r = await br.open_url(server.url + '/cookies/set?lang=fr')
+                self.assertEqual(r.request.headers['Cookie'], 'sid=abc; lang=fr')
+
+                # cookies aren't sent to another host
+                r = await br.open_url(server.url + '/away')
+                self.assertEqual(r.url, other_host + '/cookies')
+                self.assertNotIn('Cookie', r.request.headers)
+
+        try:
+            self.run_async(scenario())
+        finally:
+            server.stop()
+
+    def test_concurrent_users(self):
+        """Testing many AsyncBrowser sharing a transport in one event loop
+        """
+        async def user(transport):
+            br = AsyncBrowser(base_url=BASE_URL, history=None, transport=transport)
+            r = await br.open_url(BASE_URL + '/html_test.html')
+            await br.close()
+            return r.status_code
+
+        async def scenario():
+            async with aiohttp.ClientSession(cookie_jar=aiohttp.DummyCookieJar()) as transport:
+                codes = await asyncio.gather(*[user(transport) for i in range(20)])
+                self.assertFalse(transport.closed)
+            return codes
+
+        self.assertEqual(self.run_async(scenario()), [200] * 20)
+
+    def test_get_resource(self):
+        """Testing the AsyncBrowser resources download
+        """
+        outdir = 'tmp_async'
+        if not os.path.isdir(outdir):
+            os.mkdir(outdir)
+
+        async def scenario():
+            async with AsyncBrowser(base_url=BASE_URL, history=None) as br:
+                await br.open_url(BASE_URL + '/html_test.html')
+                results = await br.download_resources('img', outdir, workers=2, chunk_size=64)
+                cnt = await br.get_resource('#python-logo', outdir)
+            return results, cnt
+
+        try:
+            results, cnt = self.run_async(scenario())
+            self.assertEqual([r.ok for r in results], [True, True, False])
+            self.assertEqual(results[0].size, os.path.getsize('python-logo.png'))
+            self.assertEqual(cnt, 1)
+        finally:
+            for f in os.listdir(outdir):
+                os.remove(os.path.join(outdir, f))
+            os.rmdir(outdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
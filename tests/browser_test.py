@@ -1,4 +1,6 @@
 import os
+import shutil
+import tempfile
 import unittest
 from collections import deque
 import threading
@@ -22,9 +24,17 @@ from octbrowser import __version__ as ob_version
 from octbrowser.browser import Browser
 from octbrowser.history.cached import CachedHistory
 from octbrowser.history.base import BaseHistory
+from octbrowser.history.record import HistoryRecord
+from octbrowser.history.disk import DiskHistory
+from octbrowser.transport import BrowserAdapter
+from octbrowser.cache import HttpCache, ParseCache
+from octbrowser.timing import Timing
+from octbrowser.metrics import Metrics
+from octbrowser.seen import SeenIndex
+from octbrowser.testserver import LocalServer
 from octbrowser.exceptions import (
     EndOfHistory, NoPreviousPage, HistoryIsNone, HistoryIsEmpty, NoFormWaiting,
-    FormNotFoundException, NoUrlOpen, LinkNotFound
+    FormNotFoundException, NoUrlOpen, NotHtmlResponse, LinkNotFound
 )
 
 PORT = 8081
@@ -280,7 +290,8 @@ class TestBrowserFunctions(unittest.TestCase):
         # Verify user-agent and post data in response
         self.assertIn('User-Agent',  r.request.headers)
         self.assertEqual(r.request.headers['User-Agent'], user_agent)
-        self.assertEqual(r.request.body, 'test=octbrowser&ver=py3')
+        self.assertEqual(r.request.url, BASE_URL + '/nothing.html?test=octbrowser&ver=py3')
+        self.assertIsNone(r.request.body)
 
     def test_get_elements(self):
         """Testing the get_html_element(s) methods
@@ -360,6 +371,19 @@ class TestBrowserFunctions(unittest.TestCase):
         cnt = self.browser.get_resource('#missing-resource', outdir)
         self.assertEqual(cnt, 0, msg)
 
+        # Concurrent downloads with the browser session
+        self.browser.add_header('foo', 'bar')
+        results = self.browser.download_resources('img', outdir, workers=4, chunk_size=64)
+        self.assertEqual([r.status_code for r in results], [200, 200, 404])
+        self.assertEqual([r.ok for r in results], [True, True, False])
+        self.assertEqual(results[0].size, os.path.getsize('python-logo.png'))
+        self.assertEqual(results[0].path, os.path.join(outdir, 'python-logo.png'))
+        self.assertTrue(all(r.elapsed > 0 for r in results))
+        self.assertTrue(all(r.timing.ttfb > 0 for r in results))
+        self.assertAlmostEqual(results[0].timing.total, results[0].elapsed, places=2)
+        cnt = self.browser.get_resource('img', outdir, workers=4)
+        self.assertEqual(cnt, 2, msg)
+
         # Cleanup test tmp folder
         try:
             for f in os.listdir(outdir):
@@ -368,6 +392,322 @@ class TestBrowserFunctions(unittest.TestCase):
         except OSError:
             pass
 
+    def test_get_links(self):
+        """Testing the get_links method
+        """
+        self.assertRaises(NoUrlOpen, Browser().get_links)
+        self.browser.open_url(BASE_URL + '/html_test.html')
+        self.assertEqual(self.browser.get_links(), [BASE_URL + '/basic_page.html', BASE_URL + '/missing.html'])
+        self.assertEqual(self.browser.get_links('a', url_regex='Missing'), [BASE_URL + '/missing.html'])
+        self.assertEqual(self.browser.get_links('img', attribute='src')[0], BASE_URL + '/python-logo.png')
+
+        browser = Browser(base_url=BASE_URL, history=None, lazy_links=True)
+        browser.open_url(BASE_URL + '/html_test.html')
+        self.assertEqual(browser.get_links('#test_link'), [BASE_URL + '/basic_page.html'])
+        browser.session.close()
+
+    def test_form_index(self):
+        """Testing the form lookups with the form index
+        """
+        self.browser.open_url(BASE_URL + '/html_test.html')
+        forms = self.browser.forms
+        self.assertIs(self.browser.forms, forms)
+        self.assertEqual(len(forms), 2)
+        self.browser.get_form(action='/nothing.html')
+        self.assertEqual(self.browser.form.get('id'), 'testform')
+        self.assertEqual(self.browser.get_select_values(), {'ver': ['py2', 'py3']})
+        self.browser.get_form(nr=1)
+        self.assertEqual(self.browser.form.get('id'), 'testform2')
+        self.assertEqual(self.browser.form.action, self.browser._url)
+        self.assertRaises(FormNotFoundException, self.browser.get_form, nr=2)
+        self.assertRaises(FormNotFoundException, self.browser.get_form, action='/missing.html')
+        self.assertRaises(FormNotFoundException, self.browser.get_form, 'body', nr=2)
+
+        self.browser.get_form('#testform')
+        self.browser.form_data['test'] = 'changed'
+        self.browser.get_form('#testform')
+        self.assertEqual(self.browser.form_data['test'], 'OK')
+
+        # a new page has a new index
+        self.browser.open_url(BASE_URL + '/basic_page.html')
+        self.assertIsNot(self.browser.forms, forms)
+
+    def test_extract(self):
+        """Testing the extraction of many fields
+        """
+        self.assertRaises(NoUrlOpen, Browser().extract, {'links': 'a'})
+        self.browser.open_url(BASE_URL + '/html_test.html')
+        result = self.browser.extract({'links': ('a', '@href'), 'bad': ('#bad_link', 'text', True), 'p': 'p.paraf'})
+        self.assertEqual(result['links'], [BASE_URL + '/basic_page.html', BASE_URL + '/missing.html'])
+        self.assertEqual(result['bad'], 'Missing Page')
+        self.assertEqual(result['p'], self.browser.get_html_elements('p.paraf'))
+
+    def test_seen(self):
+        """Testing the links skipped with a seen index
+        """
+        browser = Browser(base_url=BASE_URL, history=None, seen=SeenIndex())
+        browser.open_url(BASE_URL + '/html_test.html')
+        browser.open_url(BASE_URL + '/basic_page.html#top')
+        browser.open_url(BASE_URL + '/html_test.html')
+        self.assertIn(BASE_URL + '/basic_page.html', browser.seen)
+        self.assertEqual(browser.follow_link('a').url, BASE_URL + '/missing.html')
+        browser.open_url(BASE_URL + '/html_test.html')
+        self.assertRaises(LinkNotFound, browser.follow_link, 'a')
+        self.assertEqual(len(browser.seen), 3)
+        browser.session.close()
+
+    def test_lazy_parse(self):
+        """Testing the lazy parsing of responses
+        """
+        browser = Browser(base_url=BASE_URL, history=None, lazy_parse=True)
+        r = browser.open_url(BASE_URL + '/html_test.html')
+        self.assertFalse(hasattr(r, 'html'))
+
+        # parsed on first access, then memoized
+        html = browser._html
+        self.assertIsNotNone(html)
+        self.assertIs(r.html, html)
+        self.assertIs(browser._html, html)
+
+        # links are still made absolute
+        r = browser.follow_link('#test_link')
+        self.assertEqual(r.url, BASE_URL + '/basic_page.html')
+        self.assertFalse(hasattr(r, 'html'))
+        browser.session.close()
+
+    def test_lazy_links(self):
+        """Testing the on demand links resolution
+        """
+        browser = Browser(base_url=BASE_URL, history=None, lazy_links=True)
+        browser.open_url(BASE_URL + '/html_test.html')
+        link = browser.get_html_elements('#test_link')[0]
+        self.assertEqual(link.get('href'), 'basic_page.html')
+
+        # resolved links are written back in the element
+        self.assertEqual(browser._resolve_link(link, 'href'), BASE_URL + '/basic_page.html')
+        self.assertEqual(link.get('href'), BASE_URL + '/basic_page.html')
+        self.assertEqual(browser.get_html_elements('#bad_link')[0].get('href'), 'missing.html')
+
+        r = browser.follow_link('#test_link', url_regex='.*Basic.*')
+        self.assertEqual(r.url, BASE_URL + '/basic_page.html')
+
+        # form actions
+        browser.open_url(BASE_URL + '/html_test.html')
+        browser.get_form('#testform')
+        self.assertEqual(browser.form.get('action'), BASE_URL + '/nothing.html')
+        browser.get_form('#testform2')
+        self.assertEqual(browser.form.action, browser._url)
+
+        # base tag takes precedence
+        r = requests.Response()
+        r._content = b'<html><head><base href="/sub/"></head><body><a href="page.html">a</a></body></html>'
+        browser._process_response(r)
+        self.assertEqual(browser._resolve_link(browser.get_html_elements('a')[0], 'href'),
+                         BASE_URL + '/sub/page.html')
+        browser.session.close()
+
+    def test_http_cache(self):
+        """Testing the browser with an http cache
+        """
+        cache = HttpCache()
+        browser = Browser(base_url=BASE_URL, http_cache=cache)
+        self.assertIs(browser.http_cache, cache)
+        r1 = browser.open_url(BASE_URL + '/html_test.html')
+        self.assertEqual(r1.status_code, 200)
+        self.assertEqual(cache.stats['misses'], 1)
+
+        # the test server sends Last-Modified and answers 304
+        r2 = browser.open_url(BASE_URL + '/html_test.html')
+        self.assertIsNot(r2, r1)
+        self.assertIsNot(r2.html, r1.html)
+        self.assertEqual(r2.content, r1.content)
+        self.assertEqual(cache.stats['revalidations'], 1)
+        r3 = browser.refresh()
+        self.assertEqual(r3.content, r1.content)
+        self.assertEqual(cache.stats['revalidations'], 2)
+        self.assertEqual(len(browser.history), 2)
+
+        # browsers sharing the cache get their own responses and trees
+        other = Browser(base_url=BASE_URL, http_cache=cache)
+        r4 = other.open_url(BASE_URL + '/html_test.html')
+        self.assertIsNot(r4, r3)
+        self.assertIsNot(r4.timing, r3.timing)
+        self.assertIsNot(r4.html, r3.html)
+        other.session.close()
+
+        # not cacheable
+        browser.open_url(BASE_URL + '/missing.html')
+        browser.open_url(BASE_URL + '/missing.html')
+        self.assertEqual(cache.stats['misses'], 3)
+        self.assertEqual(len(cache), 1)
+        browser.session.close()
+
+    def test_parse_cache(self):
+        """Testing the browser with a parse cache
+        """
+        cache = ParseCache()
+        browser = Browser(base_url=BASE_URL, history=None, parse_cache=cache, lazy_links=True)
+        r1 = browser.open_url(BASE_URL + '/html_test.html')
+        r2 = browser.refresh()
+        self.assertEqual(cache.stats['hits'], 1)
+        self.assertIsNot(r1.html, r2.html)
+        browser.get_form('#testform2')
+        self.assertEqual(browser.form.action, BASE_URL + '/html_test.html')
+        r = browser.follow_link('#test_link')
+        self.assertEqual(r.url, BASE_URL + '/basic_page.html')
+        self.assertEqual(cache.stats['misses'], 2)
+        browser.session.close()
+
+    def test_timing(self):
+        """Testing the timing breakdown of the responses
+        """
+        browser = Browser(base_url=BASE_URL)
+        r = browser.open_url(BASE_URL + '/html_test.html')
+        timing = r.timing
+        self.assertIsInstance(timing, Timing)
+        self.assertIsNone(timing.acquire)
+        self.assertIsNone(timing.connect)
+        self.assertGreater(timing.ttfb, 0)
+        self.assertGreater(timing.parse, 0)
+        self.assertGreater(timing.absolutize, 0)
+        self.assertGreater(timing.history, 0)
+        self.assertGreaterEqual(timing.total, timing.network + timing.browser)
+        self.assertEqual(sorted(timing.as_dict()), sorted(Timing.steps + ('total',)))
+
+        r = browser.follow_link('#test_link')
+        self.assertGreater(r.timing.parse, 0)
+        r = browser.refresh()
+        self.assertGreater(r.timing.total, 0)
+        self.assertEqual(r.timing.history, 0)
+
+        browser.open_url(BASE_URL + '/html_test.html')
+        browser.get_form('#testform')
+        r = browser.submit_form()
+        self.assertGreater(r.timing.ttfb, 0)
+        self.assertGreater(r.timing.history, 0)
+
+        # stream parsing and lazy links
+        browser = Browser(base_url=BASE_URL, history=None, stream_parse=True, lazy_links=True)
+        r = browser.open_url(BASE_URL + '/html_test.html')
+        self.assertGreater(r.timing.parse, 0)
+        self.assertEqual(r.timing.absolutize, 0)
+        self.assertEqual(r.timing.history, 0)
+
+        # fresh http cache hits don't touch the network
+        cache = HttpCache()
+        browser = Browser(base_url=BASE_URL, history=None, http_cache=cache)
+        r1 = browser.open_url(BASE_URL + '/html_test.html')
+        ttfb = r1.timing.ttfb
+        cache.lookup(BASE_URL + '/html_test.html').expires_at = float('inf')
+        r2 = browser.open_url(BASE_URL + '/html_test.html')
+        self.assertIsNot(r1, r2)
+        self.assertEqual(r2.timing.ttfb, 0)
+        self.assertEqual(r1.timing.ttfb, ttfb)
+        self.assertNotEqual(ttfb, 0)
+
+    def test_metrics(self):
+        """Testing the latency metrics of the browser
+        """
+        metrics = Metrics(templates=['/{page}_page.html', '/{page}_page2.html'])
+        browser = Browser(base_url=BASE_URL, history=None, metrics=metrics)
+        self.assertIs(browser.metrics, metrics)
+        browser.open_url(BASE_URL + '/html_test.html')
+        browser.follow_link('#test_link')
+        browser.open_url(BASE_URL + '/basic_page2.html')
+        browser.open_url(BASE_URL + '/html_test.html', transaction='home')
+        browser.refresh()
+        browser.get_form('#testform')
+        browser.submit_form(transaction='submit')
+        self.assertEqual(metrics.names,
+                         ['/html_test.html', '/{page}_page.html', '/{page}_page2.html', 'home', 'submit'])
+        self.assertEqual(metrics.histogram('/{page}_page.html').samples, 1)
+        self.assertEqual(metrics.histogram('/html_test.html').samples, 2)
+        self.assertEqual(metrics.total().samples, 6)
+        browser.session.close()
+
+    def test_stream_parse(self):
+        """Testing the parsing of streamed responses
+        """
+        browser = Browser(base_url=BASE_URL, history=None, stream_parse=True, stream_chunk_size=64)
+        r = browser.open_url(BASE_URL + '/html_test.html')
+        self.assertEqual(r.content, open('html_test.html', 'rb').read())
+        self.assertFalse(r.stream_stopped)
+        self.assertEqual(len(browser.get_html_elements('.paraf')), 4)
+        self.assertEqual(browser.get_html_elements('#test_link')[0].get('href'), BASE_URL + '/basic_page.html')
+        r = browser.follow_link('#test_link')
+        self.assertEqual(r.url, BASE_URL + '/basic_page.html')
+        browser.session.close()
+
+        # stop once the form has been parsed
+        browser = Browser(base_url=BASE_URL, history=None, stream_chunk_size=64)
+        r = browser.open_url(BASE_URL + '/html_test.html', stop_selector='#testform')
+        self.assertTrue(r.stream_stopped)
+        self.assertLess(len(r.content), len(open('html_test.html', 'rb').read()))
+        self.assertEqual(browser.get_html_elements('.paraf'), [])
+        browser.get_form('#testform')
+        self.assertEqual(browser.form_data['test'], 'OK')
+        self.assertEqual(browser.form.action, BASE_URL + '/nothing.html')
+
+        # the stop selector can depend on the ancestors of the element
+        r = browser.open_url(BASE_URL + '/html_test.html', stop_selector='body form#testform')
+        self.assertTrue(r.stream_stopped)
+        self.assertEqual(browser.get_html_elements('.paraf'), [])
+
+        # selector not found
+        r = browser.open_url(BASE_URL + '/html_test.html', stop_selector='#nothing')
+        self.assertFalse(r.stream_stopped)
+        self.assertEqual(len(browser.get_html_elements('.paraf')), 4)
+        browser.session.close()
+
+    def test_content_handling(self):
+        """Testing the non html bodies and the body size limit
+        """
+        browser = Browser(base_url=BASE_URL, history=None)
+        r = browser.open_url(BASE_URL + '/python-logo.png')
+        self.assertIsNone(r.html)
+        with self.assertRaises(NotHtmlResponse) as raised:
+            browser.get_html_elements('a')
+        self.assertIn('image/png', str(raised.exception))
+        self.assertRaises(NoUrlOpen, browser.get_form)
+        self.assertRaises(NotHtmlResponse, browser.follow_link, 'a')
+
+        # lazy and stream modes
+        browser = Browser(base_url=BASE_URL, history=None, lazy_parse=True)
+        r = browser.open_url(BASE_URL + '/python-logo.png')
+        self.assertIsNone(browser._html)
+        self.assertIsNone(r.html)
+        browser = Browser(base_url=BASE_URL, history=None, stream_parse=True)
+        r = browser.open_url(BASE_URL + '/python-logo.png')
+        self.assertIsNone(r.html)
+        self.assertEqual(r.content, open('python-logo.png', 'rb').read())
+
+        # sniffing disabled
+        browser = Browser(base_url=BASE_URL, history=None, sniff_content=False)
+        r = browser.open_url(BASE_URL + '/python-logo.png')
+        self.assertIsNotNone(r.html)
+
+        # big bodies are written to a file
+        outdir = 'tmp_sink'
+        if not os.path.isdir(outdir):
+            os.mkdir(outdir)
+        try:
+            browser = Browser(base_url=BASE_URL, history=None, max_body_size=2048, body_sink_dir=outdir,
+                              stream_chunk_size=512)
+            r = browser.open_url(BASE_URL + '/python-logo.png')
+            self.assertEqual(r.content, b'')
+            self.assertIsNone(r.html)
+            self.assertEqual(os.path.dirname(r.body_path), os.path.abspath(outdir))
+            self.assertEqual(open(r.body_path, 'rb').read(), open('python-logo.png', 'rb').read())
+
+            r = browser.open_url(BASE_URL + '/html_test.html')
+            self.assertFalse(hasattr(r, 'body_path'))
+            self.assertEqual(len(browser.get_html_elements('.paraf')), 4)
+        finally:
+            for f in os.listdir(outdir):
+                os.remove(os.path.join(outdir, f))
+            os.rmdir(outdir)
+        browser.session.close()
+
     def tearDown(self):
         self.browser.session.close()
 
@@ -437,10 +777,114 @@ class TestCachedHistoryFunctions(unittest.TestCase):
             self.browser.open_url(BASE_URL + '/html_test.html')
         self.assertEqual(len(self.browser.history), self.maxlen)
 
+    def test_compact_history(self):
+        """Testing the compact records and bytes budget of the cached history
+        """
+        history = CachedHistory(compact=True)
+        self.browser = Browser(base_url=BASE_URL, history=history)
+        resp0 = self.browser.open_url(BASE_URL + '/html_test.html')
+        resp1 = self.browser.open_url(BASE_URL + '/basic_page.html')
+        self.assertIsInstance(history.history[0], HistoryRecord)
+        self.assertLess(history.history[0].size, len(resp0.content))
+        self.assertEqual(history.size, sum(item.size for item in history.history))
+
+        # records are rebuilt and parsed again
+        back = self.browser.back()
+        self.assertIsNot(back, resp0)
+        self.assertEqual(back.url, resp0.url)
+        self.assertEqual(back.content, resp0.content)
+        self.assertEqual(back.headers['Content-Type'], resp0.headers['Content-Type'])
+        self.assertEqual(back.request, resp0.request)
+        self.assertIsNotNone(back.html)
+        self.browser.get_form('#testform')
+        self.assertEqual(self.browser.forward().content, resp1.content)
+        self.assertEqual(self.browser.refresh().content, resp1.content)
+        self.assertEqual(history.get_current_item().url, resp1.url)
+
+        # bytes budget
+        budget = history.history[0].size + history.history[1].size
+        history = CachedHistory(max_bytes=budget, compact=True)
+        self.browser = Browser(base_url=BASE_URL, history=history)
+        for i in range(3):
+            self.browser.open_url(BASE_URL + '/html_test.html')
+            self.browser.open_url(BASE_URL + '/basic_page.html')
+        self.assertEqual(len(history.history), 2)
+        self.assertLessEqual(history.size, budget)
+        self.assertEqual(history.current, 1)
+
+        # bytes budget with full responses
+        history = CachedHistory(maxlen=3, max_bytes=len(resp1.content) * 2)
+        self.browser = Browser(base_url=BASE_URL, history=history)
+        for i in range(3):
+            self.browser.open_url(BASE_URL + '/basic_page.html')
+        self.assertEqual(len(history.history), 2)
+        self.assertEqual(history.size, len(resp1.content) * 2)
+        self.browser.back()
+        self.browser.open_url(BASE_URL + '/basic_page.html')
+        self.assertEqual(history.size, len(resp1.content) * 2)
+        self.browser.clear_history()
+        self.assertEqual(history.size, 0)
+
     def tearDown(self):
         self.browser.session.close()
 
 
+class TestDiskHistoryFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.history = DiskHistory(hot_window=1)
+        self.browser = Browser(base_url=BASE_URL, history=self.history)
+
+    def test_disk_history(self):
+        """Testing the browser disk history
+        """
+        self.assertEqual(len(self.browser.history), 0)
+        self.assertRaises(HistoryIsEmpty, self.history.get_current_item)
+        # the database isn't synced to the disk on each page
+        self.assertEqual(self.history._db.execute('PRAGMA synchronous').fetchone()[0], 0)
+        resp0 = self.browser.open_url(BASE_URL + '/html_test.html')
+        self.assertIs(resp0, self.history.get_current_item())
+        self.assertRaises(NoPreviousPage, self.browser.back)
+        self.assertRaises(EndOfHistory, self.browser.forward)
+        resp1 = self.browser.open_url(BASE_URL + '/basic_page.html')
+        resp2 = self.browser.open_url(BASE_URL + '/basic_page2.html')
+        self.assertEqual([r.url for r in self.browser.history], [resp0.url, resp1.url, resp2.url])
+
+        # hot window keeps the items around the current one
+        self.assertIs(self.browser.back(), resp1)
+        resp0_hist = self.browser.back()
+        self.assertIsNot(resp0_hist, resp0)
+        self.assertEqual(resp0_hist.content, resp0.content)
+        self.assertEqual(resp0_hist.request.url, resp0.request.url)
+        self.assertIsNotNone(self.browser.get_html_element('#myparaf'))
+        self.assertIs(self.browser.forward(), resp1)
+
+        # newer history is forgotten on append
+        resp3 = self.browser.open_url(BASE_URL)
+        self.assertEqual([r.url for r in self.browser.history], [resp0.url, resp1.url, resp3.url])
+        self.assertRaises(EndOfHistory, self.browser.forward)
+
+        # out of sync
+        self.history.current = 99
+        self.assertRaises(NoPreviousPage, self.browser.back)
+        self.assertRaises(EndOfHistory, self.browser.forward)
+
+        # after submit_form
+        self.browser.open_url(BASE_URL + "/html_test.html")
+        self.browser.get_form('.form')
+        r = self.browser.submit_form()
+        self.assertEqual(self.history.get_current_item(), r)
+
+        self.browser.clear_history()
+        self.assertEqual(len(self.browser.history), 0)
+        self.assertEqual(self.history.current, 0)
+
+    def tearDown(self):
+        self.browser.session.close()
+        self.history.close()
+        self.assertFalse(os.path.exists(self.history.path))
+
+
 class TestBaseHistoryFunctions(unittest.TestCase):
 
     def setUp(self):
@@ -472,5 +916,139 @@ class TestBaseHistoryFunctions(unittest.TestCase):
     def tearDown(self):
         self.browser.session.close()
 
+
+class TestKeepAliveFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer(static_dir=os.path.dirname(os.path.abspath(__file__))).start()
+        self.url = self.server.url
+
+    def test_keep_alive(self):
+        """Testing the keep-alive connection reuse
+        """
+        browser = Browser(base_url=self.url, history=None, keep_alive=True, pool_maxsize=2, pool_block=True)
+        self.assertEqual(browser.session.get_adapter(self.url).poolmanager.connection_pool_kw['maxsize'], 2)
+        for i in range(5):
+            r = browser.open_url(self.url + '/html_test.html')
+            self.assertEqual(r.status_code, 200)
+        self.assertEqual(browser.connection_stats, {'requests': 5, 'new_connections': 1, 'reused_connections': 4})
+        self.assertEqual(self.server.stats['connections'], 1)
+        self.assertEqual(self.server.stats['requests'], 5)
+        self.assertEqual(r.timing.connect, 0)
+        self.assertGreaterEqual(r.timing.acquire, 0)
+
+        # adapter survives a session cleaning
+        browser.clean_session()
+        browser.open_url(self.url + '/html_test.html')
+        self.assertEqual(browser.connection_stats['requests'], 6)
+        browser.session.close()
+
+        # default behaviour closes the connection after each request
+        browser = Browser(base_url=self.url, history=None)
+        self.assertIsNone(browser.connection_stats['requests'])
+        browser = Browser(base_url=self.url, history=None, adapter=BrowserAdapter())
+        for i in range(3):
+            r = browser.open_url(self.url + '/html_test.html')
+            self.assertGreater(r.timing.connect, 0)
+        self.assertEqual(browser.connection_stats, {'requests': 3, 'new_connections': 3, 'reused_connections': 0})
+        browser.session.close()
+
+    def tearDown(self):
+        self.server.stop()
+
+
+class TestResourceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer().start()
+        self.outdir = tempfile.mkdtemp()
+
+    def test_same_names(self):
+        """Testing the download of resources with the same file name
+        """
+        images = ''.join('<img src="/static/{0}/logo.png"/>'.format(i) for i in range(20))
+        self.server.add_route('/images$', body='<html><body>{0}</body></html>'.format(images).encode('utf-8'),
+                              headers={'Content-Type': 'text/html'})
+        self.server.add_route(r'/static/(\d+)/logo.png$', lambda request: request.match.group(1).encode('utf-8'))
+        browser = Browser(base_url=self.server.url, history=None)
+        browser.open_url(self.server.url + '/images')
+        results = browser.download_resources('img', self.outdir, workers=8)
+        self.assertEqual(len(set(r.path for r in results)), 20)
+        self.assertEqual(len(os.listdir(self.outdir)), 20)
+        for i, result in enumerate(results):
+            with open(result.path, 'rb') as f:
+                self.assertEqual(f.read(), str(i).encode('utf-8'))
+
+        # the same url is downloaded once
+        self.server.add_route('/twice$', body=b'<html><body><img src="/static/1/logo.png"/>'
+                                              b'<img src="/static/1/logo.png"/></body></html>',
+                              headers={'Content-Type': 'text/html'})
+        browser.open_url(self.server.url + '/twice')
+        requests_count = self.server.stats['requests']
+        results = browser.download_resources('img', self.outdir, workers=2)
+        self.assertEqual(self.server.stats['requests'], requests_count + 1)
+        self.assertEqual([r.path for r in results], [os.path.join(self.outdir, 'logo.png')] * 2)
+        browser.session.close()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.outdir)
+
+
+class TestSharedTreeFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer().start()
+        body = (b'<html><body><a id="next" href="next">next</a><form id="f" action="" method="post">'
+                b'<input type="text" name="q" value="v"/></form></body></html>')
+        for path in ('/a', '/b'):
+            self.server.add_route(path + '$', body=body, headers={'Content-Type': 'text/html'}, methods=['GET'])
+
+    def test_shared_tree(self):
+        """Testing the pages sharing a tree of the parse cache
+        """
+        for lazy_links in (False, True):
+            cache = ParseCache(copy=False)
+            browser = Browser(base_url=self.server.url + '/', history=None, parse_cache=cache, lazy_links=lazy_links)
+            r1 = browser.open_url(self.server.url + '/a')
+            browser.get_form('#f')
+            self.assertEqual(browser.form.action, self.server.url + '/a')
+            self.assertEqual(browser.follow_link('#next').status_code, 404)
+            r2 = browser.open_url(self.server.url + '/b')
+            self.assertIs(r2.html, r1.html)
+            browser.get_form('#f')
+            self.assertEqual(browser.form.action, self.server.url + '/b')
+            r = browser.submit_form()
+            self.assertEqual(r.request.url, self.server.url + '/b')
+            self.assertEqual(r1.html.forms[0].get('action'), '' if lazy_links else self.server.url + '/')
+            self.assertEqual(r1.html.get_element_by_id('next').get('href'),
+                             'next' if lazy_links else self.server.url + '/next')
+            browser.session.close()
+
+    def tearDown(self):
+        self.server.stop()
+
+
+class TestSeenFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer().start()
+
+    def test_bad_links(self):
+        """Testing the malformed links skipped with a seen index
+        """
+        self.server.add_route('/links$', body=b'<html><body><a href="http://h:abc/">bad</a><a href="/page/a">a</a>'
+                                              b'<a href="/page/b">b</a></body></html>',
+                              headers={'Content-Type': 'text/html'})
+        browser = Browser(base_url=self.server.url, history=None, seen=SeenIndex())
+        browser.open_url(self.server.url + '/page/a')
+        browser.open_url(self.server.url + '/links')
+        self.assertEqual(browser.follow_link('a').url, self.server.url + '/page/b')
+        browser.session.close()
+
+    def tearDown(self):
+        self.server.stop()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,195 @@
+import unittest
+from email.utils import formatdate
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import lxml.html as lh
+
+from octbrowser.browser import Browser
+from octbrowser.cache import HttpCache, ParseCache, freshness_lifetime
+from octbrowser.testserver import LocalServer
+
+
+def make_response(status_code=200, content=b'<html></html>', method='GET', **headers):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers = CaseInsensitiveDict(headers)
+    response.request = requests.Request(method, 'http://localhost/').prepare()
+    return response
+
+
+class FakeServer(object):
+    """Record sent headers and return the given responses
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def __call__(self, headers):
+        self.sent.append(headers)
+        return self.responses.pop(0)
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = HttpCache(max_entries=2)
+
+    def test_freshness(self):
+        """Testing the freshness lifetime computation
+        """
+        self.assertEqual(freshness_lifetime({'Cache-Control': 'public, max-age=60'}), 60)
+        self.assertEqual(freshness_lifetime({'Cache-Control': 'max-age=60', 'Age': '20'}), 40)
+        self.assertEqual(freshness_lifetime({'Cache-Control': 'no-cache, max-age=60'}), 0)
+        self.assertEqual(freshness_lifetime({'Cache-Control': 's-maxage=60'}), 0)
+        now = 1000000000
+        headers = {'Date': formatdate(now, usegmt=True), 'Expires': formatdate(now + 30, usegmt=True)}
+        self.assertEqual(freshness_lifetime(headers), 30)
+        self.assertEqual(freshness_lifetime({'Expires': '0'}), 0)
+        self.assertEqual(freshness_lifetime({}), 0)
+
+    def test_fetch(self):
+        """Testing cache hits, revalidations and misses
+        """
+        url = 'http://localhost/'
+        fresh = make_response(**{'Cache-Control': 'max-age=60'})
+        server = FakeServer(fresh)
+        self.assertIs(self.cache.fetch(url, server), fresh)
+        fresh.timing = 'timing'
+        fresh.html = lh.fromstring('<html><body><a href="/">a</a></body></html>')
+        hit = self.cache.fetch(url, server)
+        self.assertIsNot(hit, fresh)
+        self.assertEqual(hit.content, fresh.content)
+        self.assertFalse(hasattr(hit, 'timing'))
+        self.assertIsNot(hit.html, fresh.html)
+        self.assertEqual(lh.tostring(hit.html), lh.tostring(fresh.html))
+        self.assertEqual(server.sent, [{}])
+        self.assertEqual(self.cache.stats['hits'], 1)
+
+        # forced revalidation with a 304
+        self.cache.store(url, make_response(ETag='"v1"', **{'Last-Modified': 'Sat, 01 Jan 2000 00:00:00 GMT'}))
+        stored = self.cache.lookup(url).response
+        server = FakeServer(make_response(304, b'', ETag='"v2"'), make_response(200, b'new', ETag='"v3"'))
+        revalidated = self.cache.revalidate(url, server)
+        self.assertIsNot(revalidated, stored)
+        self.assertEqual(revalidated.headers, stored.headers)
+        self.assertEqual(server.sent[0], {'If-None-Match': '"v1"',
+                                          'If-Modified-Since': 'Sat, 01 Jan 2000 00:00:00 GMT'})
+        self.assertEqual(self.cache.lookup(url).etag, '"v2"')
+
+        # changed content
+        response = self.cache.fetch(url, server)
+        self.assertEqual(response.content, b'new')
+        self.assertEqual(server.sent[1]['If-None-Match'], '"v2"')
+        self.assertIs(self.cache.lookup(url).response, response)
+        self.assertEqual(self.cache.stats, {'hits': 1, 'revalidations': 1, 'misses': 2, 'entries': 1, 'size': 3})
+
+    def test_store(self):
+        """Testing which responses are stored and the LRU eviction
+        """
+        self.assertIsNone(self.cache.store('a', make_response()))
+        self.assertIsNone(self.cache.store('a', make_response(404, ETag='"x"')))
+        self.assertIsNone(self.cache.store('a', make_response(method='POST', ETag='"x"')))
+        self.assertIsNone(self.cache.store('a', make_response(ETag='"x"', **{'Cache-Control': 'no-store'})))
+        self.assertIsNone(self.cache.store('a', make_response(ETag='"x"', Vary='Cookie')))
+        response = make_response(ETag='"x"')
+        response.history = [make_response(302)]
+        self.assertIsNone(self.cache.store('a', response))
+        response = make_response(ETag='"x"')
+        response.stream_stopped = True
+        self.assertIsNone(self.cache.store('a', response))
+        self.assertIsNone(self.cache.store('a', make_response(ETag='"x"', **{'Cache-Control': 'private'})))
+        self.assertIsNone(self.cache.store('a', make_response(ETag='"x"', **{'Set-Cookie': 'sid=abc'})))
+        response = make_response(ETag='"x"')
+        response.request.headers['Authorization'] = 'Basic YTpi'
+        self.assertIsNone(self.cache.store('a', response))
+        response.headers['Cache-Control'] = 'public'
+        self.assertIsNotNone(self.cache.store('a', response))
+        self.assertIsNotNone(self.cache.store('a', make_response(ETag='"x"', Vary='Accept-Encoding')))
+        self.assertEqual(len(self.cache), 1)
+
+        self.cache.store('b', make_response(ETag='"x"'))
+        self.cache.lookup('a')
+        self.cache.store('c', make_response(ETag='"x"'))
+        self.assertIsNone(self.cache.lookup('b'))
+        self.assertIsNotNone(self.cache.lookup('a'))
+
+        cache = HttpCache(max_bytes=30)
+        cache.store('a', make_response(content=b'a' * 20, ETag='"x"'))
+        cache.store('b', make_response(content=b'b' * 20, ETag='"x"'))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.size, 20)
+        cache.clear()
+        self.assertEqual(cache.stats, {'hits': 0, 'revalidations': 0, 'misses': 0, 'entries': 0, 'size': 0})
+
+    def test_shared(self):
+        """Testing two users sharing the cache
+        """
+        server = LocalServer().start()
+
+        def login(request):
+            return 200, {'Set-Cookie': 'user={0}; Path=/'.format(request.query['user']),
+                         'Cache-Control': 'max-age=60', 'Content-Type': 'text/html'}, b'<html></html>'
+
+        def me(request):
+            body = '<html><body><p id="u">{0}</p></body></html>'.format(request.cookies.get('user'))
+            return 200, {'Cache-Control': 'private, max-age=60', 'Content-Type': 'text/html'}, body.encode('utf-8')
+
+        server.add_route('/login$', login)
+        server.add_route('/me$', me)
+        try:
+            alice = Browser(base_url=server.url, history=None, http_cache=self.cache)
+            bob = Browser(base_url=server.url, history=None, http_cache=self.cache)
+            for browser, name in ((alice, 'alice'), (bob, 'bob')):
+                browser.open_url(server.url + '/login?user=' + name)
+                browser.open_url(server.url + '/me')
+                self.assertEqual(browser.get_html_elements('#u')[0].text, name)
+            self.assertEqual(len(self.cache), 0)
+        finally:
+            server.stop()
+
+
+class TestParseCache(unittest.TestCase):
+
+    def test_parse(self):
+        """Testing the parse cache hits, copies and eviction
+        """
+        cache = ParseCache(max_entries=2)
+        body = b'<html><body><a href="page.html">a</a></body></html>'
+
+        def build(content):
+            tree = lh.fromstring(content)
+            tree.make_links_absolute('http://localhost/')
+            return tree
+
+        tree1 = cache.parse(body, build, 'http://localhost/')
+        tree2 = cache.parse(body, build, 'http://localhost/')
+        self.assertIsNot(tree1, tree2)
+        self.assertEqual(lh.tostring(tree1), lh.tostring(tree2))
+        self.assertEqual(tree2.xpath('//a')[0].get('href'), 'http://localhost/page.html')
+
+        # copies are independent
+        tree2.xpath('//a')[0].set('href', 'changed')
+        self.assertEqual(cache.parse(body, build, 'http://localhost/').xpath('//a')[0].get('href'),
+                         'http://localhost/page.html')
+
+        # context is part of the key
+        cache.parse(body, build, 'http://other/')
+        stats = cache.stats
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 2, 2))
+        self.assertGreaterEqual(stats['saved_time'], 0)
+        cache.parse(b'<p>other</p>', build)
+        self.assertEqual(len(cache), 2)
+
+        # shared read only trees
+        cache = ParseCache(copy=False)
+        self.assertIs(cache.parse(body, build), cache.parse(body, build))
+        cache.clear()
+        self.assertEqual(cache.stats, {'hits': 0, 'misses': 0, 'entries': 0, 'saved_time': 0.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
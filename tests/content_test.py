@@ -0,0 +1,44 @@
+import unittest
+
+from octbrowser.content import is_html, looks_binary, looks_like_markup, media_type
+
+
+class TestContentDetection(unittest.TestCase):
+
+    def test_media_type(self):
+        """Testing the Content-Type parsing
+        """
+        self.assertEqual(media_type('Text/HTML; charset=utf-8'), 'text/html')
+        self.assertEqual(media_type(None), '')
+
+    def test_sniffing(self):
+        """Testing the detection of binary and markup bodies
+        """
+        self.assertTrue(looks_binary(b'\x89PNG\r\n\x1a\n....'))
+        self.assertTrue(looks_binary(b'%PDF-1.4'))
+        self.assertTrue(looks_binary(b'abc\x00def'))
+        self.assertFalse(looks_binary(b'\xff\xfe<\x00h\x00'))
+        self.assertFalse(looks_binary(b'<html></html>'))
+        self.assertTrue(looks_like_markup(b'\xef\xbb\xbf  <!DOCTYPE html>'))
+        self.assertFalse(looks_like_markup(b'{"a": 1}'))
+
+    def test_is_html(self):
+        """Testing the parse decision
+        """
+        self.assertTrue(is_html('text/html; charset=utf-8', b'<html>'))
+        self.assertTrue(is_html('text/html', b'no markup at all'))
+        self.assertTrue(is_html('application/xhtml+xml', b'<html>'))
+        self.assertTrue(is_html('application/atom+xml', b'<feed>'))
+        self.assertFalse(is_html('text/html', b'\x89PNG\r\n\x1a\n'))
+        self.assertFalse(is_html('application/json', b'<p>not really json</p>'))
+        self.assertFalse(is_html('image/png', b''))
+        self.assertFalse(is_html('application/pdf', b'%PDF-1.4'))
+        self.assertTrue(is_html(None, b'  <p>hello</p>'))
+        self.assertTrue(is_html('text/plain', b'<html>'))
+        self.assertFalse(is_html('text/plain', b'hello'))
+        self.assertFalse(is_html(None, b'{"a": 1}'))
+        self.assertFalse(is_html('application/octet-stream', b'GIF89a<'))
+
+
+if __name__ == '__main__':
+    unittest.main()
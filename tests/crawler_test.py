@@ -0,0 +1,127 @@
+import threading
+import time
+import unittest
+
+from octbrowser.crawler import Crawler, CrawlResult, normalize_url
+from octbrowser.seen import SeenIndex, BloomFilter
+from octbrowser.testserver import LocalServer
+
+
+class TestCrawler(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer().start()
+        self.url = self.server.url
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_normalize_url(self):
+        """Testing the url normalization
+        """
+        self.assertEqual(normalize_url('HTTP://Example.COM:80/a?b=1#top'), 'http://example.com/a?b=1')
+        self.assertEqual(normalize_url('https://example.com:443'), 'https://example.com/')
+        self.assertEqual(normalize_url('https://user:pw@example.com:8443/'), 'https://user:pw@example.com:8443/')
+        self.assertEqual(normalize_url('http://example.com/?b=1&a=2'), 'http://example.com/?b=1&a=2')
+
+    def test_crawl(self):
+        """Testing the depth, pages and domains limits
+        """
+        crawler = Crawler(self.url + '/page/index?size=2000', max_depth=2, workers=4)
+        results = list(crawler.crawl())
+        urls = [r.url for r in results]
+        self.assertEqual(len(urls), len(set(urls)))
+        self.assertEqual(sorted(set(r.depth for r in results)), [0, 1, 2])
+        self.assertTrue(all(isinstance(r, CrawlResult) and r.ok for r in results))
+        self.assertTrue(all(r.links == [] for r in results if r.depth == 2))
+        self.assertEqual(crawler.stats['fetched'], len(results))
+        self.assertEqual(self.server.stats['requests'], len(results))
+        child = [r for r in results if r.depth == 1][0]
+        self.assertEqual(child.parent, self.url + '/page/index?size=2000')
+
+        crawler = Crawler([self.url + '/page/index'], max_depth=None, max_pages=7, workers=3)
+        self.assertEqual(len(list(crawler)), 7)
+
+        crawler = Crawler(self.url + '/page/index', url_regex=r'.*/page/index(-next)*$')
+        self.assertEqual([r.depth for r in crawler], [0, 1, 2])
+
+        crawler = Crawler(self.url + '/page/index', allowed_domains=['example.com'])
+        self.assertEqual(list(crawler), [])
+
+        # errors don't stop the crawl
+        self.server.add_route('/page/index-next', status=500)
+        crawler = Crawler(self.url + '/page/index', max_depth=1)
+        results = list(crawler)
+        self.assertEqual(crawler.stats['errors'], 1)
+        self.assertEqual(len([r for r in results if r.ok]), len(results) - 1)
+
+    def test_errors(self):
+        """Testing invalid links and lazy parsing
+        """
+        self.server.add_route('/bad', body=b'<html><body><a href="http://host:abc/">bad</a>'
+                                           b'<a href="/page/index">good</a></body></html>')
+        results = list(Crawler(self.url + '/bad', max_depth=1))
+        self.assertEqual(sorted(r.url for r in results), [self.url + '/bad', self.url + '/page/index'])
+
+        results = list(Crawler(self.url + '/bad', max_depth=1, lazy_parse=True))
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(r.ok for r in results))
+        root = [r for r in results if r.depth == 0][0]
+        self.assertIn(self.url + '/page/index', root.links)
+
+    def test_seen(self):
+        """Testing a crawl resumed with the seen index of a previous crawl
+        """
+        crawler = Crawler(self.url + '/page/index?size=2000', max_depth=1)
+        first = set(r.url for r in crawler)
+        self.assertIsInstance(crawler.seen, SeenIndex)
+        self.assertEqual(crawler.stats['seen'], len(crawler.seen))
+
+        crawler = Crawler(self.url + '/page/index?size=2000', max_depth=2, seen=crawler.seen)
+        self.assertEqual(list(crawler), [])
+
+        seen = BloomFilter(1000, 0.001)
+        seen.add(self.url + '/page/index-next')
+        crawler = Crawler(self.url + '/page/index?size=2000', max_depth=1, seen=seen)
+        self.assertEqual(set(r.url for r in crawler), first - set([self.url + '/page/index-next']))
+
+    def test_politeness(self):
+        """Testing the per host concurrency and delay
+        """
+        lock = threading.Lock()
+        counters = {'current': 0, 'max': 0}
+        page = [r for r in self.server.routes if r.pattern == '/page/([^/]+)'][0].handler
+
+        def slow_page(request):
+            with lock:
+                counters['current'] += 1
+                counters['max'] = max(counters['max'], counters['current'])
+            time.sleep(0.05)
+            with lock:
+                counters['current'] -= 1
+            return page(request)
+
+        self.server.add_route('/page/([^/]+)', slow_page)
+        crawler = Crawler(self.url + '/page/index?size=2000', max_depth=1, workers=6, per_host=2)
+        self.assertGreater(len(list(crawler)), 4)
+        self.assertEqual(counters['max'], 2)
+
+        start = time.time()
+        crawler = Crawler(self.url + '/page/index', max_pages=4, workers=4, per_host=4, delay=0.1)
+        list(crawler)
+        self.assertGreaterEqual(time.time() - start, 0.3)
+
+    def test_stop(self):
+        """Testing an interrupted crawl
+        """
+        crawler = Crawler(self.url + '/page/index', max_depth=None, workers=2)
+        results = crawler.crawl()
+        for i in range(5):
+            next(results)
+        results.close()
+        self.assertLessEqual(crawler.stats['fetched'], 7)
+        self.assertEqual(crawler.pool.stats['in_use'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+import lxml.html as lh
+
+from octbrowser.extractor import Extractor, Field
+from octbrowser.selector_cache import SelectorCache
+
+
+class TestExtractor(unittest.TestCase):
+
+    def setUp(self):
+        self.html = lh.fromstring(
+            '<html><head><title>Products</title></head><body>'
+            '<h1 id="title">Products <small>(2)</small></h1>'
+            '<div class="product"><a href="/p/1" class="item link">First</a><span class="price">10</span></div>'
+            '<div class="product new"><a href="/p/2" class="item">Second</a><span class="price">12</span></div>'
+            '<a class="item">No link</a>'
+            '</body></html>')
+
+    def test_extract(self):
+        """Testing the fields and projections
+        """
+        cache = SelectorCache()
+        extractor = Extractor({
+            'title': ('h1', 'text', True),
+            'links': ('a.item', '@href'),
+            'first_link': ('.product a', '@href', True),
+            'prices': ('.price', lambda e: int(e.text)),
+            'products': 'div.product',
+            'new': Field('div.new', 'html', first=True),
+            'missing': ('table', 'text', True),
+            'none': ('table', '@href'),
+        }, cache=cache)
+        result = extractor.extract(self.html)
+        self.assertEqual(result['title'], 'Products (2)')
+        self.assertEqual(result['links'], ['/p/1', '/p/2'])
+        self.assertEqual(result['first_link'], '/p/1')
+        self.assertEqual(result['prices'], [10, 12])
+        self.assertEqual([e.tag for e in result['products']], ['div', 'div'])
+        self.assertTrue(result['new'].startswith('<div class="product new">'))
+        self.assertIsNone(result['missing'])
+        self.assertEqual(result['none'], [])
+
+        # the expressions are compiled once
+        misses = cache.stats['misses']
+        Extractor({'links': ('a.item', '@href')}, cache=cache).extract(self.html)
+        self.assertEqual(cache.stats['misses'], misses)
+
+        self.assertRaises(ValueError, Field, 'a', 'href')
+        self.assertRaises(ValueError, Field, 'a', '@')
+
+    def test_class_translation(self):
+        """Testing the class selectors translation
+        """
+        cache = SelectorCache()
+        html = lh.fromstring('<div><p class="a b">1</p><p class=" a">2</p><p class="ab">3</p><p class="a">4</p>'
+                             '<p>5</p><p class="b&#10;a">6</p></div>')
+        self.assertEqual([e.text for e in cache.select(html, 'p.a')], ['1', '2', '4', '6'])
+        self.assertEqual([e.text for e in cache.select(html, '[class~="b"]', translator='html')], ['1', '6'])
+        self.assertEqual([e.text for e in cache.select(html, 'p.a.b')], ['1', '6'])
+
+
+if __name__ == '__main__':
+    unittest.main()
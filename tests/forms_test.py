@@ -0,0 +1,201 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import lxml.html as lh
+
+from octbrowser.browser import Browser
+from octbrowser.forms import FormIndex, FormInfo, MultipartStream
+from octbrowser.testserver import LocalServer
+
+
+class TestFormIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.html = lh.fromstring(
+            '<html><body>'
+            '<form id="login" name="auth" action="/login" method="post">'
+            '<input type="hidden" name="csrf" value="t0k3n"/>'
+            '<input type="text" name="user" value="bob"/>'
+            '<input type="password" name="password"/>'
+            '<input type="checkbox" name="opts" value="a" checked/><input type="checkbox" name="opts" value="b"/>'
+            '<input type="radio" name="plan" value="free"/><input type="radio" name="plan" value="pro" checked/>'
+            '<select name="lang"><option value="en">en</option><option value="fr" selected>fr</option></select>'
+            '<select name="tags" multiple><option selected>x</option><option>y</option></select>'
+            '<textarea name="bio">hi</textarea>'
+            '</form>'
+            '<form name="search" action="/search"><input name="q"/></form>'
+            '<form name="auth" action="/other"></form>'
+            '</body></html>')
+        self.index = FormIndex(self.html)
+
+    def test_lookup(self):
+        """Testing the lookup by position, id, name and action
+        """
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual([info.position for info in self.index], [0, 1, 2])
+        self.assertIs(self.index[1].form, self.html.forms[1])
+        self.assertIs(self.index.by_id['login'], self.index[0])
+        self.assertIs(self.index.get(name='search'), self.index[1])
+        self.assertIs(self.index.get(action='/search'), self.index[1])
+        self.assertIs(self.index.get(name='auth'), self.index[0])
+        self.assertIs(self.index.get(name='auth', action='/other'), self.index[2])
+        self.assertIsNone(self.index.get(form_id='login', action='/search'))
+        self.assertIsNone(self.index.get(name='nothing'))
+        self.assertIs(self.index.get(), self.index[0])
+        self.assertIs(self.index.info(self.html.forms[2]), self.index[2])
+
+        index = FormIndex(self.html, lambda form: 'http://localhost' + form.get('action'))
+        self.assertIs(index.get(action='http://localhost/login'), index[0])
+
+    def test_fields(self):
+        """Testing the precomputed fields
+        """
+        info = self.index[0]
+        self.assertEqual(info.method, 'POST')
+        self.assertEqual(info.hidden, {'csrf': 't0k3n'})
+        self.assertEqual(info.types, {'csrf': 'hidden', 'user': 'text', 'password': 'password', 'opts': 'checkbox',
+                                      'plan': 'radio', 'lang': 'select', 'tags': 'select', 'bio': 'textarea'})
+        self.assertEqual(info.select_values(), {'lang': ['en', 'fr'], 'tags': ['x', 'y']})
+        self.assertEqual(info.values, {'csrf': 't0k3n', 'user': 'bob', 'password': None, 'opts': set(['a']),
+                                       'plan': 'pro', 'lang': 'fr', 'tags': set(['x']), 'bio': 'hi'})
+
+        # form data are copies, the index and the tree are unchanged
+        data = info.form_data()
+        data['opts'].add('b')
+        data['user'] = 'alice'
+        self.assertEqual(info.values['opts'], set(['a']))
+        self.assertEqual(info.form_data()['user'], 'bob')
+        self.assertEqual(set(self.html.forms[0].fields['opts']), set(['a']))
+
+        info.form.fields = data
+        self.assertEqual(set(self.html.forms[0].fields['opts']), set(['a', 'b']))
+
+
+    def test_encode(self):
+        """Testing the encoding of the form data
+        """
+        info = self.index[0]
+        data = info.form_data()
+        data['password'] = 'secret'
+        data['opts'] = set(['b', 'a'])
+        data['tags'] = set(['y', 'x'])
+        data['extra'] = 1
+        fields, files = info.encode(data)
+        self.assertEqual(fields, [('csrf', 't0k3n'), ('user', 'bob'), ('password', 'secret'), ('opts', 'a'),
+                                  ('opts', 'b'), ('plan', 'pro'), ('lang', 'fr'), ('tags', 'x'), ('tags', 'y'),
+                                  ('bio', 'hi'), ('extra', 1)])
+        self.assertEqual(files, [])
+
+        # same values as lxml, without buttons and disabled fields
+        form = lh.fromstring('<form><input name="a" value="1"/><input name="b" value="2" disabled/>'
+                             '<input type="submit" name="go" value="Go"/><input type="file" name="f"/>'
+                             '<select name="s"><option>x</option></select></form>')
+        info = FormInfo(form, 0)
+        self.assertEqual(info.encode(info.form_data())[0], form.form_values())
+        self.assertEqual(info.encode(info.form_data())[1], [('f', None)])
+        del form.inputs['b'].attrib['disabled']
+        self.assertEqual(FormInfo(form, 0).encode({'b': '3'})[0], [('b', '3')])
+
+    def test_multipart_stream(self):
+        """Testing the multipart body
+        """
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'data.txt')
+            with open(path, 'wb') as f:
+                f.write(b'x' * 10000)
+            handle = io.BytesIO(b'skip:abc')
+            handle.seek(5)
+            stream = MultipartStream([('name', u'caf\xe9'), ('quote"d', 1)],
+                                     [('doc', path), ('raw', ('r.bin', handle, 'application/x-raw')), ('empty', None)],
+                                     boundary='XyZ', chunk_size=1024)
+            self.assertEqual(stream.content_type, 'multipart/form-data; boundary=XyZ')
+            body = stream.read()
+            self.assertEqual(len(body), len(stream))
+            self.assertTrue(body.startswith(b'--XyZ\r\nContent-Disposition: form-data; name="name"\r\n\r\n'
+                                            b'caf\xc3\xa9\r\n'))
+            self.assertIn(b'name="quote%22d"\r\n\r\n1\r\n', body)
+            self.assertIn(b'name="doc"; filename="data.txt"\r\nContent-Type: text/plain\r\n\r\n' + b'x' * 10000 +
+                          b'\r\n', body)
+            self.assertIn(b'filename="r.bin"\r\nContent-Type: application/x-raw\r\n\r\nabc\r\n', body)
+            self.assertIn(b'name="empty"; filename=""\r\nContent-Type: application/octet-stream\r\n\r\n\r\n', body)
+            self.assertTrue(body.endswith(b'--XyZ--\r\n'))
+            self.assertEqual(stream.read(), b'')
+
+            # files are read chunk by chunk, and the stream can be rewound
+            stream.seek(0)
+            chunks = iter(lambda: stream.read(4096), b'')
+            sizes = [len(chunk) for chunk in chunks]
+            self.assertEqual(sum(sizes), len(body))
+            self.assertLessEqual(max(sizes), 1024 + 100)
+            self.assertRaises(io.UnsupportedOperation, stream.seek, 10)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_submit(self):
+        """Testing the form submission, with file uploads
+        """
+        tmp_dir = tempfile.mkdtemp()
+        server = LocalServer().start()
+        upload = ('<html><body><form action="/submit" method="post" enctype="multipart/form-data" id="upload">'
+                  '<input type="hidden" name="csrf" value="t0k3n"/><input type="file" name="doc"/>'
+                  '<input type="submit" name="send" value="Send"/></form></body></html>')
+        server.add_route('/upload', body=upload.encode('utf-8'), headers={'Content-Type': 'text/html'})
+        browser = Browser(base_url=server.url, history=None, keep_alive=True)
+        try:
+            path = os.path.join(tmp_dir, 'big.bin')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(1024) * 2048)
+
+            browser.open_url(server.url + '/upload')
+            browser.get_form('#upload')
+            browser.form_data['doc'] = path
+            r = browser.submit_form()
+            self.assertTrue(r.request.headers['Content-Type'].startswith('multipart/form-data; boundary='))
+            self.assertEqual(browser.get_html_elements('#field-csrf')[0].text, 't0k3n')
+            self.assertEqual(browser.get_html_elements('#field-send'), [])
+            uploaded = browser.get_html_elements('#file-doc')[0]
+            self.assertEqual((uploaded.text, uploaded.get('data-size')), ('big.bin', str(2 * 1024 * 1024)))
+
+            # url encoded forms use the same connection
+            browser.open_url(server.url + '/page/index')
+            browser.get_form('#login')
+            browser.form_data['password'] = 'secret'
+            r = browser.submit_form()
+            self.assertEqual(r.request.headers['Content-Type'], 'application/x-www-form-urlencoded')
+            self.assertEqual(browser.get_html_elements('#field-password')[0].text, 'secret')
+            self.assertEqual(server.stats['connections'], 1)
+
+            # the multipart body is sent again
+            browser.open_url(server.url + '/upload')
+            browser.get_form('#upload')
+            browser.form_data['doc'] = path
+            browser.submit_form()
+            r = browser.refresh()
+            self.assertEqual(r.status_code, 200)
+            uploaded = browser.get_html_elements('#file-doc')[0]
+            self.assertEqual(uploaded.get('data-size'), str(2 * 1024 * 1024))
+
+            # get forms send their fields in the query string
+            search = (b'<html><body><form action="/submit" id="search"><input type="text" name="q" value="a"/>'
+                      b'</form></body></html>')
+            server.add_route('/search$', body=search, headers={'Content-Type': 'text/html'})
+            browser.open_url(server.url + '/search')
+            browser.get_form('#search')
+            browser.form_data['q'] = 'octopus'
+            r = browser.submit_form()
+            self.assertEqual(r.url, server.url + '/submit?q=octopus')
+            self.assertIsNone(r.request.body)
+            self.assertEqual(browser.get_html_elements('#method')[0].text, 'GET')
+            self.assertEqual(browser.get_html_elements('#field-q')[0].text, 'octopus')
+        finally:
+            browser.session.close()
+            server.stop()
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
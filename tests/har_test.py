@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+
+from octbrowser.browser import Browser, _call_args
+from octbrowser.har import HarRecorder, Replayer, load_har, format_time, parse_time
+from octbrowser.testserver import LocalServer
+
+
+class TestHar(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer().start()
+        self.tokens = []
+
+        def csrf(request):
+            if request.method == 'POST':
+                if not self.tokens or request.form.get('csrf') != self.tokens[-1]:
+                    return 403, {'Content-Type': 'text/html'}, b'<html><body>Invalid token</body></html>'
+                return ('<html><body><p id="comment">{0}</p></body></html>'.format(request.form.get('comment'))
+                        .encode('utf-8'))
+            self.tokens.append(uuid.uuid4().hex)
+            return ('<html><body><form id="post" action="/csrf" method="post">'
+                    '<input type="hidden" name="csrf" value="{0}"/><input type="text" name="comment"/>'
+                    '</form></body></html>'.format(self.tokens[-1]).encode('utf-8'))
+
+        self.server.add_route('/csrf$', csrf)
+        self.recorder = HarRecorder(content=True)
+        self.browser = Browser(base_url=self.server.url, recorder=self.recorder)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.browser.session.close()
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def record(self):
+        browser = self.browser
+        browser.open_url(self.server.url + '/csrf')
+        browser.get_form('#post')
+        browser.form_data['comment'] = 'hello'
+        browser.submit_form(transaction='comment')
+        browser.open_url(self.server.url + '/redirect/2')
+        browser.follow_link('#next')
+        browser.back()
+        browser.refresh()
+
+    def test_record(self):
+        """Testing the recorded actions and entries
+        """
+        self.record()
+        self.assertEqual([a['action'] for a in self.recorder.actions],
+                         ['open_url', 'get_form', 'submit_form', 'open_url', 'follow_link', 'back', 'refresh'])
+        submit = self.recorder.actions[2]
+        self.assertEqual(submit['args'], {'transaction': 'comment', 'changes': {'comment': 'hello'}})
+        self.assertEqual(self.recorder.actions[1]['entries'], [])
+        # the redirections are entries of the action, back doesn't send any request
+        self.assertEqual(len(self.recorder.actions[3]['entries']), 3)
+        self.assertEqual(len(self.recorder.entries), 7)
+
+        entry = self.recorder.entries[submit['entries'][0]]
+        self.assertEqual(entry['request']['method'], 'POST')
+        params = dict((p['name'], p['value']) for p in entry['request']['postData']['params'])
+        self.assertEqual(params, {'csrf': self.tokens[0], 'comment': 'hello'})
+        self.assertIn('hello', entry['response']['content']['text'])
+        self.assertGreaterEqual(entry['timings']['wait'], 0)
+        self.assertIn('parse', entry['_browser'])
+
+        # failed actions without requests are not recorded
+        self.assertRaises(Exception, self.browser.follow_link, '#nothing')
+        self.assertEqual(len(self.recorder.actions), 7)
+
+        path = os.path.join(self.tmp_dir, 'scenario.har')
+        self.recorder.save(path)
+        har = load_har(path)
+        self.assertEqual(har['log']['version'], '1.2')
+        self.assertEqual(len(har['log']['entries']), 7)
+        self.assertEqual(har['log']['_actions'], json.loads(json.dumps(self.recorder.actions)))
+
+        self.recorder.clear()
+        self.assertEqual(self.recorder.to_har()['log']['entries'], [])
+
+    def test_replay_actions(self):
+        """Testing the replay of the recorded actions, with fresh forms
+        """
+        self.record()
+        replayer = Replayer(self.recorder.to_har(), base_url=self.server.url)
+        results = replayer.run()
+        self.assertEqual(len(results), 7)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(results[2].status_code, 200)
+        self.assertEqual(replayer.browser.get_html_elements('#comment'), [])
+        self.assertEqual(len(self.tokens), 2)
+
+    def test_replay_entries(self):
+        """Testing the replay of requests, with the hidden fields correlation
+        """
+        self.record()
+        har = self.recorder.to_har()
+        del har['log']['_actions']
+        replayer = Replayer(har, url_regex=r'.*/csrf')
+        results = replayer.run()
+        self.assertEqual([r.status_code for r in results], [200, 200])
+        self.assertEqual(replayer.variables['csrf'], self.tokens[-1])
+
+        # without correlation the recorded token is refused
+        replayer = Replayer(har, url_regex=r'.*/csrf')
+        replayer._extract = lambda response: None
+        results = replayer.run()
+        self.assertEqual([r.status_code for r in results], [200, 403])
+        self.assertFalse(results[1].ok)
+
+    def test_extractors(self):
+        """Testing the extractors and the placeholders
+        """
+        self.record()
+        har = {'log': {'entries': [
+            {'request': {'method': 'GET', 'url': self.server.url + '/csrf', 'headers': []}},
+            {'request': {'method': 'POST', 'url': self.server.url + '/csrf', 'headers': [],
+                         'postData': {'mimeType': 'application/x-www-form-urlencoded',
+                                      'text': 'csrf={{token}}&comment={{user}}'}}},
+        ]}}
+        replayer = Replayer(har, extractors={'token': r'name="csrf" value="(\w+)"'})
+        replayer.variables['user'] = 'bob'
+        results = replayer.run()
+        self.assertEqual(results[1].status_code, 200)
+        self.assertIn(b'bob', results[1].response.content)
+
+        replayer = Replayer(har, extractors={'token': ('input[name=csrf]', 'value'),
+                                             'user': lambda response: 'alice'})
+        self.assertEqual(replayer.run()[1].status_code, 200)
+        self.assertEqual(replayer.variables['token'], self.tokens[-1])
+        self.assertEqual(replayer.substitute('{{user}} {{missing}}'), 'alice {{missing}}')
+
+    def test_call_args(self):
+        """Testing the recorded arguments, like with inspect.getcallargs
+        """
+        def action(a, b=1, *args, **kwargs):
+            pass
+
+        self.assertEqual(_call_args(action, 0), {'a': 0, 'b': 1, 'args': (), 'kwargs': {}})
+        self.assertEqual(_call_args(action, 0, 2, 3, c=4), {'a': 0, 'b': 2, 'args': (3,), 'kwargs': {'c': 4}})
+        self.assertRaises(TypeError, _call_args, action)
+
+    def test_time(self):
+        """Testing the HAR dates
+        """
+        self.assertEqual(format_time(0.25), '1970-01-01T00:00:00.250Z')
+        self.assertEqual(parse_time('1970-01-01T00:00:00.250Z'), 0.25)
+        self.assertEqual(parse_time('1970-01-01T02:00:00+02:00'), 0)
+        self.assertEqual(parse_time('1970-01-01T00:00:00-0100'), 3600)
+        self.assertRaises(ValueError, parse_time, 'yesterday')
+
+
+if __name__ == '__main__':
+    unittest.main()
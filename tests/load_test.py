@@ -0,0 +1,103 @@
+import functools
+import time
+import unittest
+
+from six.moves import queue
+
+from octbrowser.load import LoadDriver, WorkerStats, ITERATION
+from octbrowser.metrics import Metrics
+from octbrowser.testserver import LocalServer
+
+
+def visit(url, browser, user):
+    browser.open_url(url + '/page/index', transaction='index')
+    if user % 2:
+        raise ValueError('odd user')
+    browser.follow_link('#next')
+
+
+def wait(browser, user):
+    time.sleep(0.05)
+
+
+class TestLoadDriver(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_run(self):
+        """Testing the users spread over processes and the aggregated results
+        """
+        reports = []
+        driver = LoadDriver(functools.partial(visit, self.server.url), users=4, processes=2, iterations=3,
+                            ramp_up=0.2, report_interval=0.1, on_report=reports.append,
+                            metrics={'templates': ['/page/{name}']}, base_url=self.server.url)
+        metrics = driver.run()
+        self.assertEqual(driver.stats['users'], 4)
+        self.assertEqual(driver.stats['iterations'], 12)
+        self.assertEqual(driver.stats['errors'], {'ValueError': 6})
+        self.assertEqual(driver.stats['failures'], {})
+        self.assertEqual(metrics.names, ['/page/{name}', 'index', ITERATION])
+        self.assertEqual(len(metrics.histogram('index')), 12)
+        self.assertEqual(len(metrics.histogram('/page/{name}')), 6)
+        self.assertEqual(len(metrics.histogram(ITERATION)), 6)
+        self.assertEqual(self.server.stats['requests'], 18)
+        self.assertTrue(reports)
+
+    def test_stop(self):
+        """Testing the duration and the graceful stop
+        """
+        self.assertRaises(ValueError, LoadDriver, wait)
+
+        start = time.time()
+        driver = LoadDriver(wait, users=3, processes=3, duration=0.5)
+        driver.run()
+        self.assertLess(time.time() - start, 5)
+        self.assertGreater(len(driver.metrics.histogram(ITERATION)), 3)
+
+        start = time.time()
+        driver = LoadDriver(wait, users=2, duration=60, report_interval=0.2, on_report=lambda d: d.stop())
+        driver.run()
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(driver.stats['failures'], {})
+        self.assertGreater(driver.stats['iterations'], 0)
+
+    def test_exited_workers(self):
+        """Testing the messages sent by the workers just before their exit
+        """
+        class Exited(object):
+            def __init__(self, exitcode):
+                self.exitcode = exitcode
+
+            def is_alive(self):
+                return False
+
+        class Results(object):
+            def __init__(self, messages):
+                self.messages = messages
+
+            def get(self, timeout):
+                raise queue.Empty
+
+            def get_nowait(self):
+                if not self.messages:
+                    raise queue.Empty
+                return self.messages.pop(0)
+
+        metrics = Metrics()
+        metrics.record(ITERATION, 0.1)
+        stats = WorkerStats(0)
+        stats.iterations = 1
+        driver = LoadDriver(wait, users=3, processes=3, iterations=1)
+        results = Results([('report', 0, (metrics, stats)), ('done', 0, None)])
+        driver._collect(results, set([0, 1, 2]), [Exited(0), Exited(0), Exited(-9)])
+        self.assertEqual(driver.stats['iterations'], 1)
+        self.assertEqual(len(driver.metrics.histogram(ITERATION)), 1)
+        self.assertEqual(driver.stats['failures'], {2: 'exit code -9'})
+
+
+if __name__ == '__main__':
+    unittest.main()
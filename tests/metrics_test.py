@@ -0,0 +1,123 @@
+import pickle
+import random
+import unittest
+
+from octbrowser.metrics import LatencyHistogram, Metrics, compile_template
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_percentiles(self):
+        """Testing the precision of the percentiles
+        """
+        histogram = LatencyHistogram()
+        rand = random.Random(42)
+        values = sorted(rand.expovariate(10) for i in range(20000))
+        for value in values:
+            histogram.record(value)
+        self.assertEqual(len(histogram), 20000)
+        for percentile in (50, 90, 99, 99.9):
+            expected = values[int(len(values) * percentile / 100.0) - 1]
+            self.assertAlmostEqual(histogram.percentile(percentile) / expected, 1, delta=0.01)
+        self.assertAlmostEqual(histogram.mean, sum(values) / len(values), places=4)
+        self.assertEqual(histogram.percentile(100), histogram.max / 1000000.0)
+
+        # memory doesn't depend on the number of values
+        size = len(histogram.counts)
+        histogram.record(3599)
+        histogram.record(10000)
+        self.assertEqual(len(histogram.counts), size)
+        self.assertEqual(histogram.percentile(100), 3600)
+
+        histogram.reset()
+        self.assertIsNone(histogram.percentile(50))
+        self.assertIsNone(histogram.summary()['p99'])
+
+    def test_small_values(self):
+        """Testing exact values in the linear part of the histogram
+        """
+        histogram = LatencyHistogram()
+        for value in (0.000001, 0.000002, 0.000100):
+            histogram.record(value)
+        self.assertEqual(histogram.percentile(0), 0.000001)
+        self.assertEqual(histogram.percentile(50), 0.000002)
+        self.assertEqual(histogram.percentile(100), 0.0001)
+
+    def test_coordinated_omission(self):
+        """Testing the correction of coordinated omission
+        """
+        histogram = LatencyHistogram()
+        histogram.record(1.0, expected_interval=0.1)
+        self.assertEqual(histogram.count, 10)
+        self.assertEqual(histogram.samples, 1)
+        self.assertAlmostEqual(histogram.percentile(50), 0.5, delta=0.005)
+        histogram.record(0.05, expected_interval=0.1)
+        self.assertEqual(histogram.count, 11)
+
+    def test_merge(self):
+        """Testing the merge of histograms
+        """
+        first = LatencyHistogram()
+        second = LatencyHistogram()
+        for i in range(1, 101):
+            first.record(i / 1000.0)
+            second.record(i / 100.0)
+        first.merge(pickle.loads(pickle.dumps(second)))
+        self.assertEqual(first.count, 200)
+        self.assertEqual(first.min, 1000)
+        self.assertEqual(first.max, 1000000)
+        self.assertAlmostEqual(first.percentile(50), 0.091, delta=0.001)
+        self.assertRaises(ValueError, first.merge, LatencyHistogram(precision_bits=4))
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_transaction_names(self):
+        """Testing the transaction names given by url templates
+        """
+        metrics = Metrics(templates=['/users/{id}', '/users/{id}/edit', '/a.php'])
+        self.assertEqual(metrics.transaction_name('http://localhost/users/12?page=2'), '/users/{id}')
+        self.assertEqual(metrics.transaction_name('http://localhost/users/12/edit'), '/users/{id}/edit')
+        self.assertEqual(metrics.transaction_name('http://localhost/users/'), '/users/')
+        self.assertEqual(metrics.transaction_name('http://localhost/aaphp'), '/aaphp')
+        self.assertEqual(metrics.transaction_name('http://localhost'), '/')
+        self.assertTrue(compile_template('/{a}-{b}/x').match('/1-2/x'))
+
+    def test_record(self):
+        """Testing the record and merge of metrics
+        """
+        metrics = Metrics(expected_interval=0.1)
+        metrics.record('home', 0.01)
+        metrics.record('home', 0.3)
+        metrics.record('login', 0.02, expected_interval=0)
+        metrics.record_scheduled('login', 100.0, 100.5)
+        self.assertEqual(metrics.names, ['home', 'login'])
+        self.assertEqual(metrics.histogram('home').count, 4)
+        self.assertEqual(metrics.histogram('nothing').count, 0)
+        self.assertAlmostEqual(metrics.histogram('login').percentile(100), 0.5, delta=0.005)
+
+        summary = metrics.summary()
+        self.assertEqual(summary['home']['count'], 2)
+        self.assertEqual(sorted(summary['login']),
+                         ['count', 'max', 'mean', 'min', 'p50', 'p90', 'p99', 'p99.9', 'throughput'])
+        self.assertEqual(metrics.total().samples, 4)
+
+        other = pickle.loads(pickle.dumps(metrics))
+        other.record('logout', 0.01)
+        metrics.merge(other)
+        self.assertEqual(metrics.histogram('home').samples, 4)
+        self.assertEqual(metrics.names, ['home', 'login', 'logout'])
+
+        drained = metrics.drain()
+        self.assertEqual(drained.names, ['home', 'login', 'logout'])
+        self.assertEqual(metrics.names, [])
+        self.assertEqual(drained.expected_interval, 0.1)
+        metrics.record('home', 0.01)
+        self.assertEqual(drained.histogram('home').samples, 4)
+
+        metrics.reset()
+        self.assertEqual(metrics.names, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
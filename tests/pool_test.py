@@ -0,0 +1,135 @@
+import os
+import threading
+import unittest
+try:
+    # Python 2
+    import SocketServer as socketserver
+except ImportError:
+    # Python 3
+    import socketserver
+try:
+    # Python 2
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+except ImportError:
+    # Python 3
+    from http.server import SimpleHTTPRequestHandler
+
+from octbrowser.pool import BrowserPool
+from octbrowser.history.cached import CachedHistory
+from octbrowser.exceptions import PoolExhausted
+
+PORT = 8084
+BASE_URL = "http://localhost:{}".format(PORT)
+
+
+class KeepAliveRequestHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBrowserPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.chdir(os.path.dirname(__file__) or '.')
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        socketserver.ThreadingTCPServer.daemon_threads = True
+        cls.httpd = socketserver.ThreadingTCPServer(("", PORT), KeepAliveRequestHandler)
+        t = threading.Thread(target=cls.httpd.serve_forever)
+        t.daemon = True
+        t.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+    def setUp(self):
+        self.pool = BrowserPool(size=2, base_url=BASE_URL, pool_maxsize=2,
+                                history_factory=lambda: CachedHistory(maxlen=3))
+
+    def test_isolation(self):
+        """Testing the browsers isolation and the shared adapter
+        """
+        br1 = self.pool.acquire()
+        br2 = self.pool.acquire()
+        self.assertIsNot(br1.session, br2.session)
+        self.assertIsNot(br1.history_object, br2.history_object)
+        self.assertEqual(br1.history_object.history.maxlen, 3)
+        self.assertIs(br1.session.get_adapter(BASE_URL), br2.session.get_adapter(BASE_URL))
+
+        br1.add_header('foo', 'bar')
+        br1.session.cookies.set('user', '1')
+        br1.open_url(BASE_URL + '/html_test.html')
+        br1.get_form('#testform')
+        self.assertNotIn('foo', br2.session.headers)
+        self.assertEqual(len(br2.session.cookies), 0)
+        self.assertIsNone(br2.form)
+        self.assertEqual(len(br2.history), 0)
+
+        # pool is full
+        self.assertRaises(PoolExhausted, self.pool.acquire, False)
+        self.assertRaises(PoolExhausted, self.pool.acquire, True, 0.05)
+
+        # released browsers are cleaned and reused
+        self.pool.release(br1)
+        br3 = self.pool.acquire()
+        self.assertIs(br3, br1)
+        self.assertNotIn('foo', br3.session.headers)
+        self.assertEqual(len(br3.session.cookies), 0)
+        self.assertIsNone(br3.form)
+        self.assertIsNone(br3._response)
+        self.assertIs(br3.session.get_adapter(BASE_URL), self.pool.adapter)
+        self.pool.release(br2)
+        self.pool.release(br3)
+        self.assertEqual(self.pool.stats['created'], 2)
+        self.assertEqual(self.pool.stats['idle'], 2)
+        self.assertEqual(self.pool.stats['in_use'], 0)
+
+    def test_threads(self):
+        """Testing many threads sharing the pool transport
+        """
+        errors = []
+
+        def user():
+            try:
+                for i in range(5):
+                    with self.pool.browser() as br:
+                        r = br.open_url(BASE_URL + '/html_test.html')
+                        self.assertEqual(r.status_code, 200)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=user) for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        stats = self.pool.stats
+        self.assertEqual(stats['requests'], 30)
+        self.assertLessEqual(stats['created'], 2)
+        self.assertLessEqual(stats['new_connections'], 2)
+        self.assertEqual(stats['reused_connections'], 30 - stats['new_connections'])
+
+    def test_browser_error(self):
+        """Testing the slots given back when a browser can't be created
+        """
+        def history_factory():
+            raise ValueError('bad history')
+
+        pool = BrowserPool(size=1, base_url=BASE_URL, history_factory=history_factory)
+        for i in range(3):
+            self.assertRaises(ValueError, pool.acquire, block=False)
+        self.assertEqual(pool.stats['in_use'], 0)
+        self.assertEqual(pool.stats['created'], 0)
+        pool.close()
+
+    def tearDown(self):
+        self.pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
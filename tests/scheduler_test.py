@@ -0,0 +1,112 @@
+import time
+import unittest
+
+from octbrowser.scheduler import RateProfile, Scheduler
+from octbrowser.testserver import LocalServer
+
+
+class TestRateProfile(unittest.TestCase):
+
+    def test_profiles(self):
+        """Testing the arrival times of the profiles
+        """
+        profile = RateProfile.constant(10, 1)
+        self.assertEqual([round(t, 6) for t in profile.arrivals()], [round(i * 0.1, 6) for i in range(1, 11)])
+
+        profile = RateProfile.ramp(0, 10, 2)
+        self.assertEqual(profile.count, 10)
+        self.assertAlmostEqual(profile.time_at(2.5), 1)
+        self.assertAlmostEqual(profile.time_at(10), 2)
+        self.assertIsNone(profile.time_at(10.1))
+        self.assertAlmostEqual(RateProfile.ramp(10, 0, 2).time_at(7.5), 1)
+
+        profile = RateProfile.steps([(1, 5), (1, 0), (1, 10)])
+        self.assertEqual((profile.duration, profile.count), (3, 15))
+        self.assertAlmostEqual(profile.time_at(6), 2.1)
+        self.assertEqual(profile.rate(1.5), 0)
+        self.assertEqual(len(list(profile.arrivals())), 15)
+
+        profile = RateProfile.ramp(0, 50, 30) + RateProfile.constant(50, 60)
+        self.assertEqual(profile.segments, [(30, 0, 50), (60, 50, 50)])
+        self.assertEqual(profile.rate(15), 25)
+        self.assertRaises(ValueError, RateProfile, [(1, -1, 0)])
+
+    def test_poisson(self):
+        """Testing the random arrivals
+        """
+        profile = RateProfile.constant(1000, 10)
+        arrivals = list(profile.arrivals(poisson=True, seed=42))
+        self.assertAlmostEqual(len(arrivals) / 10000.0, 1, delta=0.03)
+        intervals = [b - a for a, b in zip(arrivals, arrivals[1:])]
+        self.assertGreater(max(intervals), 0.005)
+        self.assertEqual(arrivals, list(profile.arrivals(poisson=True, seed=42)))
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer().start()
+        self.server.add_route('/slow', body=b'<html><body>slow</body></html>', ttfb=0.2)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_run(self):
+        """Testing the transactions started at the target rate
+        """
+        url = self.server.url + '/page/index'
+        results = []
+
+        def index(browser):
+            browser.open_url(url)
+
+        scheduler = Scheduler(index, RateProfile.constant(50, 1), max_in_flight=10, on_result=results.append)
+        start = time.time()
+        metrics = scheduler.run()
+        self.assertGreaterEqual(time.time() - start, 1)
+        self.assertEqual(scheduler.stats['completed'], 50)
+        self.assertEqual(scheduler.stats['errors'], 0)
+        self.assertEqual(scheduler.stats['in_flight'], 0)
+        self.assertEqual(len(metrics.histogram('index')), 50)
+        self.assertEqual(len(scheduler.lag), 50)
+        self.assertEqual(self.server.stats['requests'], 50)
+        intended = sorted(result.intended for result in results)
+        self.assertAlmostEqual(intended[-1] - intended[0], 0.98, delta=0.001)
+        self.assertTrue(all(result.started >= result.intended and result.ok for result in results))
+
+    def test_saturation(self):
+        """Testing the lag and the latencies when all transactions in flight are busy
+        """
+        url = self.server.url + '/slow'
+
+        def slow(browser):
+            browser.open_url(url)
+
+        results = []
+        scheduler = Scheduler(slow, RateProfile.constant(20, 0.5), max_in_flight=2, name='slow',
+                              on_result=results.append)
+        metrics = scheduler.run()
+        self.assertEqual(scheduler.stats['max_in_flight'], 2)
+        self.assertEqual(scheduler.stats['completed'], 10)
+        # requests wait for a slot: latencies include the queueing, not only the service time
+        self.assertGreater(scheduler.lag.max / 1000000.0, 0.25)
+        self.assertGreater(metrics.histogram('slow').percentile(100), 0.45)
+        self.assertLess(max(result.service_time for result in results), 0.4)
+
+    def test_stop(self):
+        """Testing the stop and the errors
+        """
+        def fail(browser):
+            raise ValueError('failed')
+
+        scheduler = Scheduler(fail, RateProfile.constant(100, 30), max_in_flight=4)
+        scheduler.on_result = lambda result: scheduler.stop() if scheduler.completed >= 5 else None
+        start = time.time()
+        scheduler.run()
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(scheduler.stats['errors'], scheduler.stats['completed'])
+        self.assertLess(scheduler.stats['scheduled'], 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
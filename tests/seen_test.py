@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from octbrowser.seen import SeenIndex, BloomFilter, canonicalize_url, url_hash
+
+
+class TestSeen(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_canonicalize_url(self):
+        """Testing the url canonicalization
+        """
+        self.assertEqual(canonicalize_url('HTTP://Example.COM:80/a?b=1&a=2#top'), 'http://example.com/a?a=2&b=1')
+        self.assertEqual(canonicalize_url('http://example.com/a?b=1&a=2', sort_query=False),
+                         'http://example.com/a?b=1&a=2')
+        self.assertEqual(canonicalize_url('https://example.com:443'), 'https://example.com/')
+        self.assertEqual(canonicalize_url('http://example.com:8080/%7euser/a%2fb'),
+                         'http://example.com:8080/~user/a%2Fb')
+        self.assertEqual(canonicalize_url('http://example.com/?a=&b'), 'http://example.com/?a=&b=')
+        self.assertEqual(canonicalize_url('http://[::1]:8080/a'), 'http://[::1]:8080/a')
+        self.assertEqual(canonicalize_url('HTTP://[FE80::1]:80'), 'http://[fe80::1]/')
+        self.assertRaises(ValueError, canonicalize_url, 'http://example.com:abc/')
+        self.assertNotEqual(url_hash('http://example.com/a'), url_hash('http://example.com/b'))
+
+    def test_seen_index(self):
+        """Testing the hashed seen urls index
+        """
+        index = SeenIndex(capacity=4)
+        self.assertTrue(index.add('http://example.com/a?x=1&y=2'))
+        self.assertFalse(index.add('http://EXAMPLE.com:80/a?y=2&x=1#part'))
+        self.assertIn('http://example.com/a?y=2&x=1', index)
+        self.assertNotIn('http://example.com/b', index)
+
+        # the table grows and keeps all the urls
+        urls = ['http://example.com/page/{0}'.format(i) for i in range(5000)]
+        self.assertTrue(all(index.add(url) for url in urls))
+        self.assertEqual(len(index), 5001)
+        self.assertTrue(all(url in index for url in urls))
+        self.assertLessEqual(index.nbytes, 5001 * 8 * 4)
+
+        path = os.path.join(self.tmp_dir, 'seen.idx')
+        index.save(path)
+        loaded = SeenIndex.load(path)
+        self.assertEqual(len(loaded), 5001)
+        self.assertTrue(all(url in loaded for url in urls))
+        self.assertFalse(loaded.add(urls[0]))
+        self.assertTrue(loaded.add('http://example.com/new'))
+
+        with open(path, 'rb+') as f:
+            f.truncate(100)
+        self.assertRaises(ValueError, SeenIndex.load, path)
+        self.assertRaises(ValueError, BloomFilter.load, path)
+
+        index.clear()
+        self.assertEqual(len(index), 0)
+        self.assertNotIn(urls[0], index)
+
+        raw = SeenIndex(canonicalize=False)
+        raw.add('http://example.com/a#top')
+        self.assertNotIn('http://example.com/a', raw)
+
+    def test_bloom_filter(self):
+        """Testing the bloom filter and its error rate
+        """
+        bloom = BloomFilter(capacity=10000, error_rate=0.01)
+        self.assertEqual(bloom.hashes, 7)
+        self.assertLess(bloom.nbytes, 12500)
+        self.assertTrue(bloom.add('http://example.com/a?x=1&y=2'))
+        self.assertFalse(bloom.add('http://example.com:80/a?y=2&x=1#top'))
+
+        for i in range(10000):
+            bloom.add('http://example.com/page/{0}'.format(i))
+        self.assertIn('http://example.com/page/42', bloom)
+        errors = sum('http://example.com/other/{0}'.format(i) in bloom for i in range(10000))
+        self.assertLess(errors, 200)
+
+        path = os.path.join(self.tmp_dir, 'seen.bloom')
+        bloom.save(path)
+        loaded = BloomFilter.load(path)
+        self.assertEqual((loaded.capacity, loaded.error_rate, len(loaded)), (10000, 0.01, len(bloom)))
+        self.assertIn('http://example.com/page/9999', loaded)
+        self.assertRaises(ValueError, SeenIndex.load, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import threading
+import unittest
+
+import lxml.html as lh
+
+from octbrowser.selector_cache import SelectorCache, match_xpath
+
+
+class TestSelectorCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SelectorCache(maxsize=2)
+        self.html = lh.fromstring('<div><p class="a">1</p><p class="b">2</p><P class="a">3</P></div>')
+
+    def test_cache(self):
+        """Testing the selector cache hits, misses and eviction
+        """
+        sel = self.cache.get('p.a')
+        self.assertIs(self.cache.get('p.a'), sel)
+        self.assertEqual(self.cache.stats, {'hits': 1, 'misses': 1, 'size': 1})
+
+        # translators are cached separately
+        self.assertIsNot(self.cache.get('p.a', translator='html'), sel)
+        self.assertEqual(len(self.cache.select(self.html, 'p.a', translator='html')), 2)
+
+        # least recently used selector is evicted
+        self.cache.get('p.a')
+        self.cache.get('p.b')
+        self.assertEqual(len(self.cache), 2)
+        self.assertIs(self.cache.get('p.a'), sel)
+        self.cache.get('p.a', translator='html')
+        self.assertEqual(self.cache.stats, {'hits': 4, 'misses': 4, 'size': 2})
+
+        self.cache.clear()
+        self.assertEqual(self.cache.stats, {'hits': 0, 'misses': 0, 'size': 0})
+
+    def test_matcher(self):
+        """Testing the element by element match of the selectors
+        """
+        html = lh.fromstring('<html><body><div id="a" class="x y"><p>1</p><p class="x">2</p><span>3</span></div>'
+                             '<p>4</p><ul><li><a href="/1">a</a></li><li class="last"><a>b</a></li></ul></body></html>')
+        self.assertEqual(match_xpath('div > p'), 'self::p[parent::div]')
+        for selector in ('p', 'div > p', 'body p', 'div p + span', 'p ~ span', '#a .x', '.x', 'li:last-child a',
+                         'a[href]', 'ul li:not(.last) > a', 'p:nth-child(2), span', 'P', 'div:empty'):
+            matcher = self.cache.matcher(selector)
+            expected = self.cache.select(html, selector, translator='html')
+            self.assertEqual([e for e in html.iter() if matcher(e)], expected, selector)
+        self.assertIsNone(self.cache.matcher('p::first-line'))
+        self.assertIs(self.cache.matcher('p'), self.cache.matcher('p'))
+
+    def test_threads(self):
+        """Testing the selector cache shared across threads
+        """
+        errors = []
+
+        def select():
+            try:
+                for i in range(200):
+                    self.assertEqual(len(self.cache.select(self.html, 'p.b')), 1)
+                    self.cache.get('p:nth-child({})'.format(i % 5 + 1))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=select) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.cache.hits + self.cache.misses, 1600)
+        self.assertLessEqual(len(self.cache), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
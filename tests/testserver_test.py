@@ -0,0 +1,124 @@
+import os
+import time
+import unittest
+
+import requests
+
+from octbrowser.browser import Browser
+from octbrowser.cache import HttpCache
+from octbrowser.testserver import LocalServer, make_page
+
+
+class TestLocalServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer(static_dir=os.path.dirname(os.path.abspath(__file__))).start()
+        self.url = self.server.url
+        self.browser = Browser(base_url=self.url, history=None, keep_alive=True)
+
+    def tearDown(self):
+        self.browser.session.close()
+        self.server.stop()
+
+    def test_pages(self):
+        """Testing the generated pages, forms and static files
+        """
+        self.assertGreaterEqual(len(make_page(50000)), 50000)
+        r = self.browser.open_url(self.url + '/page/index?size=30000')
+        self.assertGreaterEqual(len(r.content), 30000)
+        self.assertEqual(len(self.browser.get_html_elements('img.resource')), 2)
+        r = self.browser.follow_link('#next')
+        self.assertEqual(r.url, self.url + '/page/index-next')
+
+        self.browser.get_form('#login')
+        self.browser.form_data['password'] = 'secret'
+        self.browser.submit_form()
+        self.assertEqual(self.browser.get_html_elements('#method')[0].text, 'POST')
+        self.assertEqual(self.browser.get_html_elements('#field-password')[0].text, 'secret')
+
+        r = self.browser.open_url(self.url + '/html_test.html')
+        self.assertEqual(r.headers['Content-Type'], 'text/html; charset=utf-8')
+        self.assertEqual(self.browser.open_url(self.url + '/../setup.py').status_code, 404)
+        self.assertEqual(self.browser.open_url(self.url + '/status/503').status_code, 503)
+
+        stats = self.server.stats
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['requests'], 6)
+        self.assertEqual(stats['routes']['/page/([^/]+)'], 2)
+        self.assertEqual(self.server.history[-1].path, '/status/503')
+
+    def test_redirects_and_cookies(self):
+        """Testing the redirections and cookies routes
+        """
+        r = self.browser.open_url(self.url + '/redirect/3?status=301')
+        self.assertEqual(r.url, self.url + '/page/index')
+        self.assertEqual([h.status_code for h in r.history], [301, 302, 302])
+
+        self.browser.open_url(self.url + '/cookies/set?session=abc&lang=fr')
+        self.assertEqual(self.browser.get_html_elements('#cookie-session')[0].text, 'abc')
+        self.assertEqual(self.browser.session.cookies.get('lang'), 'fr')
+        self.browser.open_url(self.url + '/cookies/delete?session')
+        self.assertEqual(self.browser.get_html_elements('#cookie-session'), [])
+        self.assertEqual(len(self.browser.get_html_elements('#cookie-lang')), 1)
+
+    def test_cache(self):
+        """Testing the conditional responses
+        """
+        browser = Browser(base_url=self.url, history=None, http_cache=HttpCache())
+        browser.open_url(self.url + '/cache/news')
+        browser.refresh()
+        self.assertEqual(self.server.stats['not_modified'], 1)
+        self.server.touch('news')
+        r = browser.refresh()
+        self.assertEqual(r.status_code, 200)
+        self.assertIn(b'Cached news v1', r.content)
+        self.assertEqual(browser.http_cache.stats['revalidations'], 1)
+
+        browser.open_url(self.url + '/cache/fresh?max_age=60')
+        browser.open_url(self.url + '/cache/fresh?max_age=60')
+        self.assertEqual(browser.http_cache.stats['hits'], 1)
+
+    def test_large_bodies(self):
+        """Testing large bodies and the shaping settings
+        """
+        r = self.browser.open_url(self.url + '/large/500000')
+        self.assertEqual(len(r.content), 500000)
+        self.assertIsNotNone(r.html)
+        r = self.browser.open_url(self.url + '/large/200000?binary=1')
+        self.assertEqual(len(r.content), 200000)
+        self.assertIsNone(r.html)
+
+        self.server.shape('/large/(\\d+)', ttfb=0.1, delay=0.05, throughput=100000)
+        start = time.time()
+        r = self.browser.open_url(self.url + '/large/20000')
+        self.assertGreaterEqual(time.time() - start, 0.35)
+        self.assertGreaterEqual(r.timing.ttfb, 0.1)
+        self.assertGreaterEqual(r.timing.download, 0.2)
+        self.assertRaises(KeyError, self.server.shape, '/nothing')
+
+    def test_custom_routes(self):
+        """Testing custom routes and server wide settings
+        """
+        self.server.add_route('/hello', body=b'hello', headers={'Content-Type': 'text/plain'}, ttfb=0.05)
+        self.server.add_route('/echo', lambda request: request.body[::-1], methods=('POST',))
+        self.server.add_route('/error', lambda request: 1 / 0)
+        start = time.time()
+        r = requests.get(self.url + '/hello')
+        self.assertGreaterEqual(time.time() - start, 0.05)
+        self.assertEqual(r.text, 'hello')
+        self.assertEqual(requests.post(self.url + '/echo', data=b'abc').content, b'cba')
+        self.assertEqual(requests.get(self.url + '/echo').status_code, 404)
+        self.assertEqual(requests.get(self.url + '/error').status_code, 500)
+
+        self.server.reset_stats()
+        self.assertEqual(self.server.stats['requests'], 0)
+        self.assertEqual(len(self.server.history), 0)
+
+        with LocalServer(ttfb=0.05) as server:
+            start = time.time()
+            requests.get(server.url + '/page/index')
+            self.assertGreaterEqual(time.time() - start, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()